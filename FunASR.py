@@ -17,22 +17,1008 @@ os.environ["MODELSCOPE_CACHE"] = os.path.join(project_root, "models", "modelscop
 - 按回车开始录音
 - 对着麦克风说话
 - 再次按回车停止录音
+- 离线转写: python FunASR.py a.wav b.wav [--output result.jsonl]
 
 依赖库:
 - funasr
 - sounddevice
+- soundfile (离线转写)
 - numpy
+
+funasr/torch只在加载模型时导入，sounddevice只在打开音频流时导入，
+UI等导入本模块时不承担这些库的导入开销。
 """
 
-from funasr import AutoModel
-import sounddevice as sd
 import numpy as np
 import threading
 import time
 import queue
 import os
-import torch
-import torchaudio
+import gc
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait as futures_wait
+
+
+class AudioRingBuffer:
+    """
+    固定容量的音频环形缓冲区（默认float32，也可以存放int16原始采样）
+
+    特性：
+    - 存储预先分配，写入时不再重新分配内存（替代反复的np.append）
+    - 镜像存储（两倍容量），peek/consume总是返回连续视图，消费时不拷贝数据
+    - 写入超过剩余容量时丢弃最旧的数据，并累计丢弃的样本数
+
+    注意：peek/consume返回的是内部存储的视图。写入只使用空闲空间，
+    因此peek的视图在没有溢出（丢弃最旧数据）的写入之后仍然有效；
+    consume取出的样本所在空间最后才被复用，之后累计写入不超过 free - n 个样本（取出后计算）时视图仍然有效。
+    需要长期保留时请调用方自行copy。
+    """
+
+    def __init__(self, capacity, dtype=np.float32):
+        """
+        参数:
+            capacity: 最大样本数
+            dtype: 样本数据类型
+        """
+        self.capacity = int(capacity)
+        if self.capacity <= 0:
+            raise ValueError(f"环形缓冲区容量必须大于0: {capacity}")
+        self.dtype = np.dtype(dtype)
+        self._storage = np.zeros(self.capacity * 2, dtype=self.dtype)
+        self._read_pos = 0
+        self._size = 0
+        self.dropped_samples = 0  # 因容量不足而丢弃的样本数
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def free(self):
+        """剩余可写入的样本数"""
+        return self.capacity - self._size
+
+    @property
+    def nbytes(self):
+        """存储占用的字节数（含镜像区）"""
+        return self._storage.nbytes
+
+    def write(self, data):
+        """写入样本（任意形状的数组会被展平），返回写入的样本数"""
+        if data.__class__ is not np.ndarray or data.dtype != self.dtype:
+            data = np.asarray(data, dtype=self.dtype)
+        if data.ndim != 1:
+            data = data.reshape(-1)
+        n = data.shape[0]
+        if n == 0:
+            return 0
+
+        if n >= self.capacity:
+            # 单次写入就超过容量，只保留最新的部分
+            self.dropped_samples += self._size + n - self.capacity
+            data = data[-self.capacity:]
+            n = self.capacity
+            self._read_pos = 0
+            self._size = 0
+        elif n > self.free:
+            overflow = n - self.free
+            self.consume(overflow)
+            self.dropped_samples += overflow
+
+        capacity = self.capacity
+        storage = self._storage
+        write_pos = self._read_pos + self._size
+        if write_pos >= capacity:
+            write_pos -= capacity
+        # 同时写入主区和镜像区，保证任意位置起始的读取都是连续的
+        if write_pos + n <= capacity:
+            storage[write_pos:write_pos + n] = data
+            storage[write_pos + capacity:write_pos + capacity + n] = data
+        else:
+            first = capacity - write_pos
+            storage[write_pos:capacity] = data[:first]
+            storage[write_pos + capacity:] = data[:first]
+            storage[:n - first] = data[first:]
+            storage[capacity:capacity + n - first] = data[first:]
+        self._size += n
+        return n
+
+    def peek(self, n=None):
+        """查看最旧的n个样本（默认全部），不移动读指针"""
+        n = self._size if n is None else min(int(n), self._size)
+        return self._storage[self._read_pos:self._read_pos + n]
+
+    def peek_tail(self, n):
+        """查看最新的n个样本，不移动读指针"""
+        n = min(int(n), self._size)
+        end = self._read_pos + self._size
+        return self._storage[end - n:end]
+
+    def consume(self, n=None):
+        """取出最旧的n个样本（默认全部），返回视图"""
+        if n is None or n > self._size:
+            n = self._size
+        read_pos = self._read_pos
+        view = self._storage[read_pos:read_pos + n]
+        read_pos += n
+        if read_pos >= self.capacity:
+            read_pos -= self.capacity
+        self._read_pos = read_pos
+        self._size -= n
+        return view
+
+    def clear(self):
+        """清空缓冲区（不释放存储）"""
+        self._read_pos = 0
+        self._size = 0
+
+
+def to_float32(samples):
+    """把int16原始采样批量转换为[-1, 1)的float32，float32数据直接返回"""
+    if samples.dtype == np.int16:
+        return np.multiply(samples, 1.0 / 32768, dtype=np.float32)
+    return samples
+
+
+class AudioBlockQueue(queue.Queue):
+    """
+    有界音频块队列，元素为 (采集时间, 音频块)，None为唤醒信号
+
+    按积压的音频块数和/或音频时长限制队列，消费者（推理）跟不上实时时按过载策略处理新到的块：
+    - "block": 生产者等待队列有空位（适用于文件回放、feed等可以减速的来源；
+      在PortAudio回调中阻塞会导致输入溢出）
+    - "drop_oldest": 丢弃最旧的块
+    - "drop_non_speech": 丢弃最旧的非语音块（RMS低于speech_rms），全是语音时才丢弃最旧的块；
+      每块的RMS在offer时（锁外）计算一次，与块一起保存
+    - "merge": 把新块拼接到队尾的块上，减少队列操作，消费者一次处理更大的块；
+      队尾的块达到max_merge_seconds后不再合并，改为丢弃最旧的块（合并在采集回调中进行，需限制拷贝量和积压）
+
+    统计当前积压（秒）、丢弃/合并次数和积压的最高水位。
+    """
+
+    POLICIES = ("block", "drop_oldest", "drop_non_speech", "merge")
+
+    def __init__(self, max_blocks=0, max_seconds=None, policy="drop_oldest", sample_rate=16000,
+                 max_merge_seconds=1.0):
+        """
+        参数:
+            max_blocks: 最多缓存的音频块数，0表示不限
+            max_seconds: 最多缓存的音频时长（秒），None表示不限
+            policy: 过载策略，见POLICIES
+            sample_rate: 采样率(Hz)，用于把样本数换算成秒
+            max_merge_seconds: "merge"策略下合并后单个块的最大时长（秒）
+        """
+        if policy not in self.POLICIES:
+            raise ValueError(f"不支持的过载策略: {policy}")
+        super().__init__()  # 容量由offer按块数/时长自行判断
+        self.max_blocks = max_blocks
+        self.max_samples = int(max_seconds * sample_rate) if max_seconds else 0
+        self.policy = policy
+        self.sample_rate = sample_rate
+        self.max_merge_samples = int(max_merge_seconds * sample_rate)
+        self.speech_rms = 0.01  # 非语音块的RMS上限（FastLoadASR按VAD预门限的噪声底更新）
+        self.closed = False  # 关闭后"block"策略不再等待
+        self.queued_samples = 0
+        self.high_water_samples = 0
+        self.high_water_blocks = 0
+        self.dropped_blocks = 0
+        self.dropped_speech_blocks = 0  # 丢弃的块中被判为语音的块数
+        self.dropped_samples = 0
+        self.merged_blocks = 0
+        self.blocked_seconds = 0.0  # "block"策略下生产者等待的总时长
+
+    # 以下方法由queue.Queue在持有self.mutex时调用
+    def _init(self, maxsize):
+        super()._init(maxsize)
+        self.block_rms = deque()  # 与self.queue一一对应的各块RMS（仅"drop_non_speech"策略计算）
+
+    def _put(self, item, rms=0.0):
+        self.queue.append(item)
+        self.block_rms.append(rms)
+        if item is not None:
+            self.queued_samples += len(item[1])
+            self.high_water_samples = max(self.high_water_samples, self.queued_samples)
+        self.high_water_blocks = max(self.high_water_blocks, len(self.queue))
+
+    def _get(self):
+        item = self.queue.popleft()
+        self.block_rms.popleft()
+        if item is not None:
+            self.queued_samples -= len(item[1])
+        return item
+
+    def _is_full(self, n):
+        """再放入n个样本是否超出容量（队列为空时总能放入，避免超大块永远放不进去）"""
+        if not self.queue:
+            return False
+        return (0 < self.max_blocks <= len(self.queue)) or (
+            self.max_samples > 0 and self.queued_samples + n > self.max_samples)
+
+    def _drop_one(self):
+        """按策略丢弃一个块，返回是否丢弃成功"""
+        index = None
+        if self.policy == "drop_non_speech":
+            index = next((i for i, (item, rms) in enumerate(zip(self.queue, self.block_rms))
+                          if item is not None and rms < self.speech_rms), None)
+        if index is None:
+            index = next((i for i, item in enumerate(self.queue) if item is not None), None)
+            if index is None:
+                return False
+            if self.policy == "drop_non_speech":
+                self.dropped_speech_blocks += 1
+        item = self.queue[index]
+        del self.queue[index]
+        del self.block_rms[index]
+        self.queued_samples -= len(item[1])
+        self.dropped_blocks += 1
+        self.dropped_samples += len(item[1])
+        return True
+
+    def offer(self, item):
+        """
+        生产者入口：放入一个 (采集时间, 音频块)，队列已满时按过载策略处理
+
+        返回:
+            队列是否在容量内接收了新块（合并或丢弃旧块腾出空间也算）；
+            无块可丢、或"block"策略下队列已关闭仍放不下时，新块超出容量放入队列，返回False
+        """
+        n = len(item[1])
+        rms = 0.0
+        if self.policy == "drop_non_speech":
+            samples = to_float32(item[1])
+            rms = float(np.sqrt(np.dot(samples.ravel(), samples.ravel()) / max(samples.size, 1)))
+        with self.not_full:
+            if self.policy == "block":
+                wait_start = None
+                while self._is_full(n) and not self.closed:
+                    wait_start = wait_start or time.perf_counter()
+                    self.not_full.wait(timeout=0.1)
+                if wait_start is not None:
+                    self.blocked_seconds += time.perf_counter() - wait_start
+            elif (self.policy == "merge" and self._is_full(n) and self.queue[-1] is not None
+                  and len(self.queue[-1][1]) + n <= self.max_merge_samples):
+                capture_time, chunk = item
+                self.queue[-1] = (capture_time, np.concatenate([self.queue[-1][1], chunk]))
+                self.queued_samples += n
+                self.high_water_samples = max(self.high_water_samples, self.queued_samples)
+                self.merged_blocks += 1
+                self.not_empty.notify()
+                return True
+            else:
+                while self._is_full(n):
+                    if not self._drop_one():
+                        break
+            accepted = not self._is_full(n)
+            self._put(item, rms)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+        return accepted
+
+    def close(self):
+        """唤醒等待中的生产者（"block"策略），之后不再等待"""
+        with self.not_full:
+            self.closed = True
+            self.not_full.notify_all()
+
+    def get_stats(self):
+        """获取积压和过载统计"""
+        with self.mutex:
+            return {
+                "policy": self.policy,
+                "lag_seconds": round(self.queued_samples / self.sample_rate, 3),
+                "queued_blocks": len(self.queue),
+                "high_water_seconds": round(self.high_water_samples / self.sample_rate, 3),
+                "high_water_blocks": self.high_water_blocks,
+                "dropped_blocks": self.dropped_blocks,
+                "dropped_speech_blocks": self.dropped_speech_blocks,
+                "dropped_seconds": round(self.dropped_samples / self.sample_rate, 3),
+                "merged_blocks": self.merged_blocks,
+                "blocked_seconds": round(self.blocked_seconds, 3),
+            }
+
+
+class AudioSubscription:
+    """
+    采集中心的一个订阅者：有界的AudioBlockQueue，元素为 (采集时间, 只读音频块)
+
+    队列满时按过载策略处理（默认丢弃最旧的块），慢订阅者不会阻塞采集回调或影响其他订阅者。
+    """
+
+    def __init__(self, name, maxsize, policy="drop_oldest", max_seconds=None, sample_rate=16000):
+        self.name = name
+        self.queue = AudioBlockQueue(max_blocks=maxsize, max_seconds=max_seconds, policy=policy,
+                                     sample_rate=sample_rate)
+        self.delivered = 0  # 送达的块数
+
+    @property
+    def dropped(self):
+        """因队列已满丢弃的块数"""
+        return self.queue.dropped_blocks
+
+    def put(self, item):
+        """在采集回调中调用：放入队列，队列满时按过载策略处理"""
+        self.queue.offer(item)
+        self.delivered += 1
+
+    def get(self, timeout=None):
+        """取出下一个 (采集时间, 音频块)，超时抛出queue.Empty"""
+        return self.queue.get(timeout=timeout)
+
+    def get_stats(self):
+        """获取订阅者统计"""
+        return dict(self.queue.get_stats(), delivered=self.delivered, dropped=self.dropped,
+                    queued=self.queue.qsize())
+
+
+class AudioCaptureHub:
+    """
+    共享的麦克风采集中心
+
+    只打开一个sd.InputStream，每个音频块在回调中拷贝一次（PortAudio会复用indata）并设为只读，
+    同一个数组分发给所有订阅者（ASR、音量表、录音等），订阅者之间不再拷贝。
+    """
+
+    def __init__(self, sample_rate=16000, device=None, blocksize=0, clock=None, dtype="float32", latency=None):
+        """
+        参数:
+            sample_rate: 采样率(Hz)
+            device: 输入设备索引，None表示默认设备
+            blocksize: 每次回调的样本数，0表示由PortAudio决定（通常是较小且可变的块）
+            clock: 采集时间戳使用的时钟，应与订阅者（如FastLoadASR.clock）一致
+            dtype: 采样格式，"float32"或"int16"（int16的回调拷贝和队列数据量减半）
+            latency: PortAudio建议的输入延迟，"low"/"high"或秒数，None表示设备默认值
+        """
+        self.sample_rate = sample_rate
+        self.device = device
+        self.blocksize = blocksize
+        self.dtype = dtype
+        self.latency = latency
+        self.start_time = None  # 音频流打开的时间（time.perf_counter）
+        self.clock = clock or time.time
+        self.stream = None
+        self._subscribers = ()  # 回调中只读取，订阅变化时整体替换，无需加锁
+        self._lock = threading.Lock()
+        self._stream_lock = threading.Lock()  # ASR和音量表可能在不同线程中同时调用start
+        self.callback_count = 0
+        self.overflow_count = 0  # PortAudio报告的输入溢出次数
+
+    @property
+    def running(self):
+        return self.stream is not None
+
+    def subscribe(self, name, maxsize=64, policy="drop_oldest", max_seconds=None):
+        """
+        添加订阅者
+
+        参数:
+            name: 订阅者名称（用于统计）
+            maxsize: 队列最多缓存的音频块数，0表示不限
+            policy: 队列满时的过载策略（见AudioBlockQueue），采集回调中不应使用"block"
+            max_seconds: 队列最多缓存的音频时长（秒），None表示不限
+
+        返回:
+            AudioSubscription
+        """
+        subscription = AudioSubscription(name, maxsize, policy=policy, max_seconds=max_seconds,
+                                         sample_rate=self.sample_rate)
+        with self._lock:
+            self._subscribers = self._subscribers + (subscription,)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """移除订阅者"""
+        with self._lock:
+            self._subscribers = tuple(s for s in self._subscribers if s is not subscription)
+
+    def _callback(self, indata, frames, time_info, status):
+        """音频流回调：打时间戳后分发给所有订阅者"""
+        capture_time = self.clock()
+        if status and status.input_overflow:
+            self.overflow_count += 1
+        self.callback_count += 1
+        chunk = indata.copy()
+        chunk.flags.writeable = False  # 所有订阅者共享同一个数组
+        item = (capture_time, chunk)
+        for subscription in self._subscribers:
+            subscription.put(item)
+
+    def _open_stream(self, device):
+        import sounddevice as sd
+
+        stream = sd.InputStream(
+            callback=self._callback,
+            channels=1,
+            samplerate=self.sample_rate,
+            blocksize=self.blocksize,
+            dtype=self.dtype,
+            latency=self.latency,
+            device=device
+        )
+        stream.start()
+        self.start_time = time.perf_counter()
+        self.callback_count = 0
+        return stream
+
+    def start(self):
+        """打开音频流（已打开时直接返回），指定设备失败时尝试默认设备"""
+        with self._stream_lock:
+            return self._start_locked()
+
+    def _start_locked(self):
+        if self.stream is not None:
+            return True
+        try:
+            print(f"尝试打开音频流 (设备索引: {self.device})...")
+            self.stream = self._open_stream(self.device)
+            print("音频流已成功打开并开始。")
+            return True
+        except Exception as e:
+            print(f"打开音频流失败: {e}")
+            print("请检查您的麦克风是否连接并配置正确。")
+            if self.device is None:
+                return False
+        print("尝试使用默认输入设备...")
+        try:
+            self.stream = self._open_stream(None)
+            print("音频流已使用默认设备成功打开并开始。")
+            return True
+        except Exception as e:
+            print(f"使用默认设备打开音频流仍失败: {e}")
+            return False
+
+    def stop(self):
+        """停止并关闭音频流"""
+        with self._stream_lock:
+            if self.stream is None:
+                return
+            try:
+                if not self.stream.stopped:
+                    self.stream.stop()
+                self.stream.close()
+                print("录音设备已停止并关闭。")
+            except Exception as e:
+                print(f"停止或关闭录音设备时出错: {e}")
+            self.stream = None
+
+    def get_stats(self):
+        """获取采集统计：块大小、实际输入延迟、每秒回调次数，以及每个订阅者的送达/丢弃计数"""
+        elapsed = time.perf_counter() - self.start_time if self.start_time else 0.0
+        stream = self.stream
+        return {
+            "blocksize": self.blocksize,
+            "latency": stream.latency if stream is not None else self.latency,
+            "callbacks": self.callback_count,
+            "callbacks_per_second": round(self.callback_count / elapsed, 2) if elapsed > 0 else 0.0,
+            "overflows": self.overflow_count,
+            "subscribers": {
+                # 每个块一次put、一次get
+                s.name: dict(s.get_stats(), queue_ops_per_second=round(2 * s.delivered / elapsed, 2) if elapsed > 0 else 0.0)
+                for s in self._subscribers
+            },
+        }
+
+
+class AudioRecorder:
+    """采集中心的录音订阅者：在后台线程中把音频写入WAV文件"""
+
+    def __init__(self, hub, path, maxsize=256):
+        self.hub = hub
+        self.path = path
+        self.maxsize = maxsize
+        self.subscription = None
+        self.thread = None
+        self.running = False
+
+    def start(self):
+        import soundfile as sf
+
+        self.file = sf.SoundFile(self.path, mode="w", samplerate=self.hub.sample_rate, channels=1)
+        self.subscription = self.hub.subscribe("recorder", maxsize=self.maxsize)
+        self.running = True
+        self.thread = threading.Thread(target=self._write_loop)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _write_loop(self):
+        while self.running or not self.subscription.queue.empty():
+            try:
+                _, chunk = self.subscription.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            self.file.write(chunk)
+
+    def stop(self):
+        if not self.running:
+            return
+        self.hub.unsubscribe(self.subscription)
+        self.running = False
+        self.thread.join(timeout=2)
+        self.file.close()
+        print(f"录音已保存: {self.path} (丢弃 {self.subscription.dropped} 块)")
+
+
+class _OnnxStreamStates:
+    """
+    funasr_onnx的流式模型把部分状态（如在线前端的特征缓存）保存在模型实例的属性上。
+    为每个cache字典保存这些属性的独立副本，调用前换到模型上，
+    同一个模型实例可以被多个音频流共享（传入新的空cache字典即开始新的音频流）。
+    """
+
+    def __init__(self, model, attrs):
+        self.model = model
+        self._lock = threading.Lock()  # 换入状态和推理必须在一起完成
+        # 初始状态的模板，每个新的cache复制一份
+        self._initial = {name: getattr(model, name) for name in attrs if hasattr(model, name)}
+
+    def __call__(self, cache, **kwargs):
+        import copy
+
+        if "state" not in cache:
+            cache["state"] = {name: copy.deepcopy(value) for name, value in self._initial.items()}
+        with self._lock:
+            for name, value in cache["state"].items():
+                setattr(self.model, name, value)
+            return self.model(**kwargs)
+
+
+class OnnxStreamingASR:
+    """
+    onnxruntime版流式Paraformer，提供与AutoModel.generate相同的调用方式
+
+    流式状态保存在调用方传入的cache字典中（与torch版asr_cache语义一致：
+    传入新的空字典即开始新的句子，is_final=True时模型清理状态）。
+    """
+
+    def __init__(self, model_dir, chunk_size, quantize=False, intra_op_num_threads=4):
+        from funasr_onnx.paraformer_online_bin import Paraformer
+        self.model = Paraformer(model_dir, batch_size=1, quantize=quantize, chunk_size=chunk_size,
+                                intra_op_num_threads=intra_op_num_threads)
+        self._states = _OnnxStreamStates(self.model, ("frontend",))
+
+    def generate(self, input, cache=None, is_final=False, **kwargs):
+        if cache is None:
+            cache = {}
+        param_dict = cache.setdefault("param_dict", {"cache": {}})
+        param_dict["is_final"] = is_final
+        res = self._states(cache, audio_in=np.asarray(input, dtype=np.float32), param_dict=param_dict)
+        text = res[0]["preds"][0] if res and res[0].get("preds") else ""
+        if is_final:
+            cache.clear()
+        return [{"text": text}]
+
+
+class OnnxStreamingVAD:
+    """
+    onnxruntime版流式fsmn-vad，提供与AutoModel.generate相同的调用方式
+
+    funasr_onnx的在线VAD把前端特征和端点检测状态保存在模型实例的frontend和vad_scorer上，
+    这些状态按cache字典分别保存，与torch版vad_cache语义相同。
+    """
+
+    def __init__(self, model_dir, intra_op_num_threads=4):
+        from funasr_onnx import Fsmn_vad_online
+        self.model = Fsmn_vad_online(model_dir, intra_op_num_threads=intra_op_num_threads)
+        self._states = _OnnxStreamStates(self.model, ("frontend", "vad_scorer"))
+
+    def generate(self, input, cache=None, is_final=False, **kwargs):
+        if cache is None:
+            cache = {}
+        param_dict = cache.setdefault("param_dict", {"in_cache": []})
+        param_dict["is_final"] = is_final
+        segments = self._states(cache, audio_in=np.asarray(input, dtype=np.float32), param_dict=param_dict) or []
+        # 结果可能带有batch维度：[[[开始, 结束], ...]]
+        if segments and len(segments[0]) and isinstance(segments[0][0], (list, tuple)):
+            segments = segments[0]
+        if is_final:
+            cache.clear()
+        return [{"value": [list(segment) for segment in segments]}]
+
+
+class OnnxPunctuation:
+    """onnxruntime版ct-punc，提供与AutoModel.generate相同的调用方式"""
+
+    def __init__(self, model_dir, quantize=False, intra_op_num_threads=4):
+        from funasr_onnx import CT_Transformer
+        self.model = CT_Transformer(model_dir, quantize=quantize, intra_op_num_threads=intra_op_num_threads)
+
+    def generate(self, input, **kwargs):
+        res = self.model(input)
+        return [{"text": res[0] if res else ""}]
+
+
+SENTENCE_END_MARKS = "。？！.?!"
+CLAUSE_END_MARKS = "，、,；;：:"
+
+
+def normalize_sentence_end(text):
+    """
+    保证句子以句末标点结尾：末尾的逗号/顿号等改为句号，没有标点时补句号
+
+    句号按最后一个文字的书写系统选择：英文等ASCII字符后用"."，中文等其他字符后用"。"。
+    """
+    if not text or text[-1] in SENTENCE_END_MARKS:
+        return text
+    text = text.rstrip(CLAUSE_END_MARKS)
+    if not text:
+        return text
+    return text + ("." if text[-1].isascii() else "。")
+
+
+def split_punctuated_text(punctuated, originals):
+    """
+    把对拼接文本做标点恢复的结果按原始片段切分
+
+    逐字对齐（忽略空白和大小写），片段末尾紧跟的标点归入该片段；
+    ct-punc把拼接处当作句中位置时片段末尾是逗号或没有标点，切分后统一补成句末标点，
+    与逐句处理的结果一致。标点模型改动了文字导致无法对齐时返回None。
+    """
+    pieces = []
+    pos = 0
+    for original in originals:
+        chars = [c for c in original if not c.isspace()]
+        start = pos
+        i = 0
+        while i < len(chars):
+            if pos >= len(punctuated):
+                return None
+            c = punctuated[pos]
+            if c.lower() == chars[i].lower():
+                i += 1
+            elif c.isalnum():
+                return None
+            pos += 1
+        while pos < len(punctuated) and not punctuated[pos].isalnum() and not punctuated[pos].isspace():
+            pos += 1
+        pieces.append(normalize_sentence_end(punctuated[start:pos].strip()))
+    return pieces
+
+
+def export_onnx_model(model_name, quantize=False):
+    """
+    把FunASR模型导出为ONNX（只导出一次），返回包含model.onnx的模型目录
+
+    quantize为True时同时导出int8量化的model_quant.onnx。
+
+    导出的目录记录在FUNASR_CACHE下的onnx_models.json中，之后启动时无需再加载torch模型。
+    """
+    import json
+
+    index_path = os.path.join(os.environ["FUNASR_CACHE"], "onnx_models.json")
+    index = {}
+    if os.path.exists(index_path):
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+    onnx_file = "model_quant.onnx" if quantize else "model.onnx"
+    model_dir = index.get(model_name)
+    if model_dir and os.path.exists(os.path.join(model_dir, onnx_file)):
+        return model_dir
+
+    from funasr import AutoModel  # 只有导出时才需要torch版模型（funasr会导入torch）
+
+    print(f"导出ONNX模型 ({model_name}, {onnx_file})，仅首次需要...")
+    model_dir = AutoModel(model=model_name).export(type="onnx", quantize=quantize)
+    index[model_name] = model_dir
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    with open(index_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+    return model_dir
+
+
+def default_thread_budget(cpu_count=None):
+    """
+    按CPU核数计算默认的线程预算
+
+    为UI线程和edge-tts事件循环预留核心，ASR分得大部分算力，VAD和标点恢复各用少量线程，
+    避免三个模型与其他线程争抢核心导致ASR延迟抖动。
+
+    返回:
+        dict: asr/vad/punc的intra-op线程数，以及进程级的interop线程数
+    """
+    cpu_count = cpu_count or os.cpu_count() or 1
+    return {
+        "asr": max(1, min(4, cpu_count - 2)),
+        "vad": 1,
+        "punc": max(1, min(2, cpu_count // 4)),
+        "interop": 1,
+    }
+
+
+class BudgetedModel:
+    """
+    按线程预算调用torch模型的包装器
+
+    每次generate前把当前线程的torch intra-op线程数设置为该模型的预算，
+    并在torch.inference_mode下运行，提供与AutoModel.generate相同的调用方式。
+    """
+
+    def __init__(self, model, intra_op_threads):
+        self.model = model
+        self.intra_op_threads = intra_op_threads
+
+    def generate(self, *args, **kwargs):
+        import torch
+
+        if torch.get_num_threads() != self.intra_op_threads:
+            torch.set_num_threads(self.intra_op_threads)
+        with torch.inference_mode():
+            return self.model.generate(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+
+def quantize_automodel(automodel, model_name):
+    """
+    对AutoModel内部模型的线性层做int8动态量化（原地替换automodel.model）
+
+    量化后的完整模块缓存在FUNASR_CACHE/quantized下（按torch版本区分），
+    之后的启动直接加载缓存，不再重复转换。
+    """
+    import torch
+
+    cache_dir = os.path.join(os.environ["FUNASR_CACHE"], "quantized")
+    cache_path = os.path.join(cache_dir, f"{model_name}-int8-torch{torch.__version__}.pt")
+    if os.path.exists(cache_path):
+        try:
+            # 缓存的是整个量化模块而非state_dict，torch>=2.6默认的weights_only=True无法加载
+            automodel.model = torch.load(cache_path, map_location="cpu", weights_only=False)
+            automodel.model.eval()
+            return automodel
+        except Exception as e:
+            print(f"量化模型缓存加载失败，重新量化: {e}")
+
+    print(f"对 {model_name} 进行int8动态量化，仅首次需要...")
+    quantized = torch.quantization.quantize_dynamic(automodel.model, {torch.nn.Linear}, dtype=torch.qint8)
+    quantized.eval()
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = cache_path + ".tmp"
+    torch.save(quantized, tmp_path)
+    os.replace(tmp_path, cache_path)
+    automodel.model = quantized
+    return automodel
+
+
+def model_snapshots_supported():
+    """当前torch是否支持以mmap方式加载权重（torch>=2.1）"""
+    import inspect
+    import torch
+    return "mmap" in inspect.signature(torch.load).parameters
+
+
+def _snapshot_dir(model_name):
+    """模型快照目录（按funasr和torch版本区分，版本变化后自动重新生成）"""
+    import funasr
+    import torch
+    version = getattr(funasr, "__version__", "unknown")
+    return os.path.join(os.environ["FUNASR_CACHE"], "snapshots",
+                        f"{model_name}-funasr{version}-torch{torch.__version__}")
+
+
+def _snapshot_complete(snapshot_dir):
+    """快照目录中的文件是否都已存在"""
+    return all(os.path.exists(os.path.join(snapshot_dir, name))
+               for name in ("skeleton.pt", "weights.pt", "source.json"))
+
+
+def _snapshot_source(kwargs):
+    """
+    快照对应的源模型标识：模型目录、版本号，以及model.pt的路径、修改时间和大小
+
+    模型被重新下载或更新后这些值会变化，据此判断快照是否已过期。
+    """
+    init_param = kwargs.get("init_param")
+    source = {
+        "model_path": kwargs.get("model_path"),
+        "model_revision": kwargs.get("model_revision"),
+        "init_param": init_param,
+    }
+    if init_param and os.path.isfile(init_param):
+        stat = os.stat(init_param)
+        source["mtime_ns"] = stat.st_mtime_ns
+        source["size"] = stat.st_size
+    return source
+
+
+def _snapshot_valid(snapshot_dir):
+    """快照是否完整且与当前磁盘上的源模型一致"""
+    import json
+
+    if not _snapshot_complete(snapshot_dir):
+        return False
+    try:
+        with open(os.path.join(snapshot_dir, "source.json"), encoding="utf-8") as f:
+            source = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if not source.get("init_param") or "size" not in source:
+        return False  # 无法确认源模型，不信任快照
+    # 记录的kwargs即快照骨架中的kwargs，按其中的路径重新计算当前标识
+    return _snapshot_source(source) == source
+
+
+def save_model_snapshot(automodel, model_name):
+    """
+    把已加载的AutoModel写成快速加载快照
+
+    快照包含两个文件：
+    - skeleton.pt: 去掉权重的AutoModel对象（配置、分词器、前端和meta设备上的模块结构）
+    - weights.pt: 模型的全部参数和缓冲区，加载时通过mmap映射，不再逐个反序列化
+
+    - source.json: 源模型标识（模型目录、版本号、model.pt的修改时间和大小），加载前据此校验
+
+    多个进程可能同时首次加载同一模型：各自写入独立的临时目录再重命名，
+    快照已由其他进程写好时直接跳过，重命名时输给其他进程也视为成功。
+    源模型变化后旧快照失效，下次正常加载时整个替换。
+    """
+    import copy
+    import json
+    import shutil
+    import uuid
+    import torch
+
+    snapshot_dir = _snapshot_dir(model_name)
+    if _snapshot_valid(snapshot_dir):
+        return
+    model = automodel.model
+    tensors = dict(model.named_parameters(remove_duplicate=False))
+    tensors.update(model.named_buffers(remove_duplicate=False))
+    tensors = {name: tensor.detach() for name, tensor in tensors.items()}
+
+    tmp_dir = f"{snapshot_dir}.tmp-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    os.makedirs(tmp_dir)
+    try:
+        torch.save(tensors, os.path.join(tmp_dir, "weights.pt"))
+
+        # 复制模块结构时把每个参数/缓冲区替换为meta张量，骨架文件不包含权重，也不会临时复制一份权重
+        memo = {}
+        for tensor in list(model.parameters()) + list(model.buffers()):
+            meta = torch.empty_like(tensor, device="meta")
+            memo[id(tensor)] = torch.nn.Parameter(meta, requires_grad=False) if isinstance(
+                tensor, torch.nn.Parameter) else meta
+        automodel.model = copy.deepcopy(model, memo)
+        try:
+            torch.save(automodel, os.path.join(tmp_dir, "skeleton.pt"))
+        finally:
+            automodel.model = model
+        with open(os.path.join(tmp_dir, "source.json"), "w", encoding="utf-8") as f:
+            json.dump(_snapshot_source(automodel.kwargs), f, ensure_ascii=False, indent=2)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    if not _snapshot_valid(snapshot_dir):
+        shutil.rmtree(snapshot_dir, ignore_errors=True)  # 不完整或已过期的旧快照
+    try:
+        os.replace(tmp_dir, snapshot_dir)
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if _snapshot_valid(snapshot_dir):
+            return  # 其他进程已先写入快照
+        raise
+    print(f"已写入模型快照: {snapshot_dir}")
+
+
+def load_model_snapshot(model_name):
+    """
+    从快照加载AutoModel，权重以mmap方式映射（多个进程共享页缓存）
+
+    返回:
+        AutoModel，没有快照或快照与源模型不一致时返回None；快照损坏或torch不支持mmap加载时抛出异常
+    """
+    import torch
+
+    snapshot_dir = _snapshot_dir(model_name)
+    if not _snapshot_valid(snapshot_dir):
+        return None
+    skeleton_path = os.path.join(snapshot_dir, "skeleton.pt")
+    weights_path = os.path.join(snapshot_dir, "weights.pt")
+
+    automodel = torch.load(skeleton_path, map_location="cpu", weights_only=False)
+    tensors = torch.load(weights_path, map_location="cpu", mmap=True, weights_only=True)
+    model = automodel.model
+    for name, tensor in tensors.items():
+        module_name, _, leaf = name.rpartition(".")
+        module = model.get_submodule(module_name)
+        if leaf in module._parameters:
+            module._parameters[leaf] = torch.nn.Parameter(tensor, requires_grad=False)
+        else:
+            module._buffers[leaf] = tensor
+    for tensor in list(model.parameters()) + list(model.buffers()):
+        if tensor.is_meta:
+            raise RuntimeError("快照缺少部分权重")
+    device = automodel.kwargs.get("device", "cpu")
+    if device != "cpu":
+        model.to(device)
+    model.eval()
+    return automodel
+
+
+class ModelRegistry:
+    """
+    进程级的已加载模型登记表（按模型名称和加载选项共享模型对象）
+
+    特性：
+    - 相同键（模型类型、名称、后端、量化方式、线程数）的模型只加载一次，之后的实例直接复用
+    - 多个实例同时请求同一个尚未加载完成的模型时，只有第一个实际加载，其余等待其结果
+    - 引用计数：最后一个使用者释放后从登记表移除，模型内存随之回收
+    """
+
+    def __init__(self):
+        self._entries = {}  # 键 -> {"model", "refs", "future", "warmed"}
+        self._lock = threading.Lock()
+
+    def acquire(self, key, loader):
+        """
+        获取一个模型（引用计数加一），尚未加载时调用loader加载
+
+        参数:
+            key: 模型键，元组 (模型类型, 模型名称, 后端, 量化方式, 线程数)
+            loader: 无参数的加载函数，返回模型对象
+
+        返回:
+            (模型, 是否复用了已加载的模型)；加载失败时抛出loader的异常
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            is_loader = entry is None
+            if is_loader:
+                entry = {"model": None, "refs": 0, "future": Future(), "warmed": False}
+                self._entries[key] = entry
+            entry["refs"] += 1
+        if not is_loader:
+            return entry["future"].result(), True
+
+        try:
+            model = loader()
+        except Exception as e:
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+            entry["future"].set_exception(e)
+            raise
+        entry["model"] = model
+        entry["future"].set_result(model)
+        return model, False
+
+    def release(self, key):
+        """释放一个引用，最后一个引用释放时移除模型"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry["refs"] -= 1
+            if entry["refs"] > 0:
+                return
+            del self._entries[key]
+        print(f"释放模型: {key[1]}")
+        del entry
+        gc.collect()  # AutoModel内部有循环引用，立即回收权重占用的内存
+
+    def mark_warmed(self, key):
+        """记录模型已完成预热"""
+        with self._lock:
+            if key in self._entries:
+                self._entries[key]["warmed"] = True
+
+    def is_warmed(self, key):
+        """模型是否已由某个实例预热过"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry["warmed"]
+
+    def get_stats(self):
+        """
+        获取登记表状态
+
+        返回:
+            list: 每个模型的kind/model/backend/quantize/threads/refs/loaded/warmed
+        """
+        with self._lock:
+            return [{
+                "kind": key[0], "model": key[1], "backend": key[2], "quantize": key[3], "threads": key[4],
+                "refs": entry["refs"], "loaded": entry["model"] is not None, "warmed": entry["warmed"],
+            } for key, entry in self._entries.items()]
+
+
+model_registry = ModelRegistry()
 
 
 class FastLoadASR:
@@ -47,8 +1033,21 @@ class FastLoadASR:
     - 强制分段机制
     """
 
+    MODEL_LABELS = {"asr": "ASR", "vad": "VAD", "punc": "标点恢复"}
+    QUANTIZABLE_MODELS = ("asr", "punc")  # fsmn-vad很小，量化收益可以忽略
+    # 采集配置：块大小（样本数）和PortAudio输入延迟
+    CAPTURE_PROFILES = {
+        # 与200ms的VAD块对齐：每个VAD块只有一次回调和一次队列操作
+        "default": {"blocksize": 3200, "latency": "high"},
+        # 与100ms的静音检测帧对齐：音频更早进入流水线，回调次数加倍
+        "low_latency": {"blocksize": 1600, "latency": "low"},
+    }
+
     def __init__(self, use_vad=True, use_punc=True, disable_update=True, text_output_callback=None,
-                 max_segment_duration_seconds=3.0, input_device_index=None):
+                 max_segment_duration_seconds=3.0, input_device_index=None, clock=None,
+                 model_load_progress_callback=None, warmup=False, backend="torch", quantize=None,
+                 thread_budget=None, capture_hub=None, capture_dtype="float32", capture_profile="default",
+                 models=None, model_snapshots=True, audio_queue_policy="drop_non_speech", streaming=True):
         """
         初始化快速加载版语音识别系统
 
@@ -59,6 +1058,32 @@ class FastLoadASR:
             text_output_callback: 识别文本输出的回调函数
             max_segment_duration_seconds: 最大语音片段时长（秒），用于强制分段
             input_device_index: 输入设备的索引
+            clock: 时钟函数（返回秒），默认time.time；回放测试时可注入模拟时钟
+            model_load_progress_callback: 模型加载进度回调，参数为(模型类型, 状态, 详情)，
+                状态为loading/loaded/failed，详情为耗时（秒）或错误信息
+            warmup: 模型加载后是否先用合成音频预热一遍，使第一句话即达到稳定延迟
+            backend: 推理后端，"torch"（FunASR AutoModel）或"onnx"（onnxruntime，需要funasr_onnx）
+            quantize: 为"int8"时对paraformer和ct-punc的线性层做动态量化（仅CPU），
+                量化结果缓存在FUNASR_CACHE下，只转换一次
+            thread_budget: 线程预算，如{"asr": 4, "vad": 1, "punc": 1, "interop": 1}，
+                未指定的项使用default_thread_budget()的值
+            capture_hub: 共享的AudioCaptureHub（与音量表等共用一个音频流），
+                None表示start时自己创建（使用input_device_index）
+            capture_dtype: 采集及原始音频缓冲区的格式，"int16"时VAD缓冲区和静音检测累积器
+                保存int16采样，在取出VAD块/静音检测帧时才批量转换为float32
+            capture_profile: 采集配置（CAPTURE_PROFILES中的"default"或"low_latency"），
+                决定自己创建音频流时的capture_blocksize和capture_latency
+            models: 已加载的模型，如{"asr": ..., "vad": ..., "punc": ...}，与其他实例共享而不再加载；
+                流式状态（asr_cache/vad_cache）保存在各实例中，互不影响
+            model_snapshots: torch后端（未量化）是否使用模型快照：首次加载后在FUNASR_CACHE/snapshots下
+                写入快照，之后启动直接从快照加载，权重通过mmap映射（多个进程共享页缓存）；
+                model.pt更新后快照自动失效并重新生成
+            audio_queue_policy: 推理跟不上实时、音频队列积压超过audio_queue_max_seconds时的过载策略：
+                "drop_non_speech"（丢弃最旧的非语音块）、"drop_oldest"、
+                "merge"（合并成更大的块，单块达到audio_queue_max_merge_seconds后改为丢弃最旧的块）
+                或"block"（送入音频的调用方等待，仅适用于audio_callback/feed送入的音频）
+            streaming: 是否用于实时识别；为False时（只做离线文件转写）不预先加载流式ASR模型，
+                仅在离线识别模型加载失败时才按需加载它作为回退
 
         特性:
             - 动态静音检测：当音量下降80%并持续1秒时自动结束句子
@@ -72,6 +1097,34 @@ class FastLoadASR:
         self.text_output_callback = text_output_callback
         self.max_segment_duration_seconds = max_segment_duration_seconds  # 新增
         self.input_device_index = input_device_index  # 新增
+        self.clock = clock or time.time  # 所有分段判断使用的时钟
+        self.model_load_progress_callback = model_load_progress_callback
+        self.warmup_enabled = warmup
+        if backend not in ("torch", "onnx"):
+            raise ValueError(f"不支持的推理后端: {backend}")
+        self.backend = backend
+        if quantize not in (None, "int8"):
+            raise ValueError(f"不支持的量化方式: {quantize}")
+        self.quantize = quantize
+        if capture_dtype not in ("float32", "int16"):
+            raise ValueError(f"不支持的采集格式: {capture_dtype}")
+        self.capture_dtype = capture_dtype
+        if capture_profile not in self.CAPTURE_PROFILES:
+            raise ValueError(f"不支持的采集配置: {capture_profile}")
+        self.capture_profile = capture_profile
+        self.capture_blocksize = self.CAPTURE_PROFILES[capture_profile]["blocksize"]
+        self.capture_latency = self.CAPTURE_PROFILES[capture_profile]["latency"]
+        self.thread_budget = default_thread_budget()
+        self.thread_budget.update(thread_budget or {})
+        if self.backend == "torch":
+            import torch
+            try:
+                # interop线程数只能在进程开始并行计算之前设置一次
+                torch.set_num_interop_threads(self.thread_budget["interop"])
+            except RuntimeError:
+                pass
+        self.warmed_up = False
+        self.warmup_stats = {}  # 模型类型 -> 预热耗时（秒）
 
         # 语音识别参数设置
         self.sample_rate = 16000  # 采样率(Hz)
@@ -85,16 +1138,52 @@ class FastLoadASR:
         self.vad_chunk_duration_ms = 200  # VAD每个音频块的持续时间(毫秒)
         self.vad_chunk_samples = int(self.sample_rate * self.vad_chunk_duration_ms / 1000)
 
+        # VAD能量预门限：非说话状态下明显低于噪声底的块跳过VAD推理
+        self.vad_gate_enabled = True
+        self.vad_gate_energy_ratio = 2.0  # 块能量低于噪声底的该倍数时视为静音
+        self.vad_gate_zcr_threshold = 0.25  # 过零率高于该值时可能是清辅音，能量需更接近噪声底才跳过
+        self.vad_gate_hangover_chunks = 3  # 连续多少个静音块之后才开始跳过
+        self.vad_gate_preroll_chunks = 2  # 恢复推理时先补送的最近跳过的块数
+        self.vad_gate_min_floor = 3e-4  # 噪声底下限（约-70dBFS，低于实际麦克风的底噪），RMS更低的块视为数字静音
+        self.vad_gate_seed_chunks = 5  # 用最初多少个非数字静音块的RMS中位数初始化噪声底
+        self.vad_noise_floor = None  # 自适应噪声底（块RMS），每次start时重新初始化
+        self.vad_gate_seed_rms = []  # 初始化噪声底用的块RMS
+        self.vad_gate_quiet_chunks = 0  # 连续静音块数
+        self.vad_gate_skipping = False  # 当前是否在跳过VAD推理
+        self.vad_gate_preroll = deque(maxlen=self.vad_gate_preroll_chunks)  # 最近跳过的块
+        self.vad_gate_skipped = 0  # 跳过的VAD调用次数
+        self.vad_calls = 0  # 实际的VAD调用次数
+        self.vad_call_seconds = 0.0  # VAD推理总耗时
+
         # ASR参数
         self.asr_chunk_duration_ms = 600  # 每个ASR音频块的持续时间(毫秒)
         self.asr_chunk_samples = int(self.sample_rate * self.asr_chunk_duration_ms / 1000)
 
+        # 自适应ASR块大小：推理跟不上实时时每次generate送入多个600ms块，摊薄每次调用的固定开销
+        # chunk_size（编码器块配置）保持不变，FunASR在一次调用内按600ms逐块处理，asr_cache始终有效
+        self.adaptive_asr_chunks = backend == "torch"  # funasr_onnx的流式模型每次只接受一个块
+        self.asr_chunk_base_ms = self.asr_chunk_duration_ms
+        self.asr_chunk_multiples = (1, 2, 4)  # 可选的每次调用音频时长（600ms/1.2s/2.4s）
+        self.asr_chunk_level = 0  # 当前使用asr_chunk_multiples中的第几档
+        self.asr_rtf_window_seconds = 10.0  # 计算RTF的滑动窗口（音频秒数）
+        self.asr_rtf_high = 0.8  # RTF高于该值（或积压超过两个块）时切换到更大的块
+        self.asr_rtf_low = 0.4  # RTF低于该值且积压不足一个块时回到更小的块
+        self.asr_switch_min_calls = 3  # 切换后至少经过的调用次数，避免来回切换
+        self.asr_rtf_samples = deque()  # 滑动窗口内每次调用的 (音频秒数, 推理耗时)
+        self.asr_calls_since_switch = 0
+        self.asr_chunk_switches = deque(maxlen=100)  # 最近的切换记录
+
+        # 环形缓冲区参数
+        self.ring_buffer_seconds = 30.0  # VAD/语音缓冲区容量（秒），超出时丢弃最旧的音频
+        self.silence_check_samples = int(self.sample_rate * 0.1)  # 静音检测窗口（100ms）的样本数
+
         # 动态静音检测参数
         self.relative_silence_threshold = 0.8  # 相对静音阈值（音量下降80%时触发）
         self.silence_duration_threshold = 0.5  # 静音持续时间阈值（1秒）
         self.silence_start_time = None  # 静音开始时间
         self.is_in_silence = False  # 是否处于静音状态
         self.silence_check_interval = 0.1  # 静音检查间隔（100ms）
+        self.last_chunk_seconds = 0.0  # 最近一个音频块的时长，块间隔大于静音检查间隔时据此推迟静音填充
         self.last_silence_check_time = 0  # 上次静音检查时间
 
         # 音量跟踪（简化版）
@@ -103,106 +1192,459 @@ class FastLoadASR:
 
         # 运行时变量
         self.running = False
-        self.audio_queue = queue.Queue()
+        if audio_queue_policy not in AudioBlockQueue.POLICIES:
+            raise ValueError(f"不支持的过载策略: {audio_queue_policy}")
+        self.audio_queue_policy = audio_queue_policy
+        self.audio_queue_max_seconds = 10.0  # 音频队列最多积压的音频时长（秒），超出时按过载策略处理
+        self.audio_queue_max_merge_seconds = 1.0  # "merge"策略下合并后单个块的最大时长（秒）
+        self.audio_queue = self._new_audio_queue()
+        self.capture_hub = capture_hub
+        self._owns_capture_hub = False
+        self.audio_subscription = None  # 在采集中心的订阅
         self.complete_transcript = ""  # 每次识别会话（start->stop)的完整记录
         self.current_sentence_transcript = ""  # 当前正在形成的句子
         self.raw_transcript = ""
         self.is_speaking = False
-        self.speech_buffer = np.array([], dtype=np.float32)
+        self.speech_buffer = AudioRingBuffer(int(self.sample_rate * self.ring_buffer_seconds))
+        # 原始音频（VAD缓冲区、静音检测累积器）按采集格式保存，语音缓冲区总是float32
+        self.vad_buffer = AudioRingBuffer(int(self.sample_rate * self.ring_buffer_seconds), dtype=self.capture_dtype)
+        self.audio_accumulator = AudioRingBuffer(int(self.sample_rate * self.ring_buffer_seconds),
+                                                 dtype=self.capture_dtype)  # 按100ms帧做静音检测
+        self.accumulator_end_time = 0.0  # 累积器中最后一个样本的采集时间
+        self._silence_data = np.zeros(self.silence_check_samples, dtype=self.capture_dtype)  # 预分配的100ms静音数据
+        self.last_audio_time = 0  # 最后接收到音频的时间
+        self.processed_samples = 0  # 本次会话中已进入处理流程的样本数
+        self.last_capture_time = 0  # 最近一个已处理音频块的采集时间
+
+        # 延迟统计（每句话记录从采集到回调的各阶段时间戳）
+        self.callback_metadata = False  # 为True时以metadata关键字参数把本句的延迟记录传给回调
+        # 部分结果稳定前缀：为True时以stable/unstable/delta关键字参数传给回调，调用方只需增量更新
+        self.callback_partial_stability = False
+        self.partial_stability_window = 2  # 前缀在连续多少次部分结果中保持不变才视为稳定
+        self.partial_history = deque(maxlen=self.partial_stability_window)  # 本句最近的部分结果
+        self.partial_stable = ""  # 本句已确认稳定的前缀
+        self.partial_callbacks = 0  # 部分结果回调次数
+        self.partial_rollbacks = 0  # 稳定前缀被后续结果修改的次数
+        self.partial_full_chars = 0  # 整句重绘方式需要处理的字符数
+        self.partial_incremental_chars = 0  # 增量更新方式需要处理的字符数（delta+不稳定尾部）
+        self.latency_window = 1000  # 每项指标保留的最近样本数
+        self.current_utterance = None  # 正在形成的句子的时间戳记录
+        self.utterance_count = 0
+        self.completed_utterance_count = 0
+        self.utterance_history = deque(maxlen=100)  # 最近完成的句子记录
+        self.latency_samples = {}  # 指标名 -> 最近的耗时样本（秒）
+        self.stats_lock = threading.Lock()  # 处理线程、标点线程和输出线程都会记录统计，读取时可能在其他线程
         self.current_segment_start_time = None  # 新增：用于追踪当前（VAD定义的）语音片段开始时间
         self.last_forced_segment_time = 0  # 新增: 用于记录上次强制分段的时间
 
         # 模型变量
+        self.asr_model_name = "paraformer-zh-streaming"
+        self.vad_model_name = "fsmn-vad"
+        self.punc_model_name = "ct-punc"
         self.asr_model = None
         self.vad_model = None
         self.punc_model = None
         self.vad_cache = {}
         self.asr_cache = {}
+        self.offline_asr_model = None  # 离线批量转写使用的非流式模型（按需加载）
+
+        # 异步标点恢复：处理线程只把句子原文交给标点线程，不等待ct-punc完成
+        self.async_punc = True  # 仅在后台处理线程模式下生效，同步驱动（确定性回放）时仍在处理步骤中完成
+        self.punc_deadline_seconds = 1.0  # 从交给标点线程起超过该时长仍未完成时输出原文
+        self.punc_executor = None  # 单线程执行标点恢复
+        self._owns_punc_executor = False  # 多路识别时执行器由MultiStreamASR共享
+        self.punc_pending = deque()  # 已交给标点线程、尚未开始处理的句子
+        self.punc_output_queue = queue.Queue()  # 按句子顺序等待输出的句子
+        self.punc_output_thread = None
+        self.punc_timeouts = 0  # 因超时输出原文的句子数
+        self.punc_max_batch = 8  # 积压时一次标点恢复调用最多合并的句子数
+        self.punc_batch_sizes = {}  # 批大小 -> 调用次数
+        self.punc_batch_fallbacks = 0  # 合并结果无法按句子切分、改为逐句处理的次数
+        self.punc_total_seconds = 0.0  # 标点恢复总耗时
+
+        # 离线转写参数
+        self.offline_asr_model_name = "paraformer-zh"  # 支持批量解码的非流式模型，加载失败时回退到流式模型
+        self.offline_block_seconds = 10.0  # 读取音频文件及VAD分段的块长度（秒）
+        self.offline_batch_size_s = 60.0  # 每批送入识别模型的VAD片段总时长（秒）
+        self.offline_vad_lookback_seconds = 5.0  # 没有未结束的片段时，VAD缓冲区保留的最近音频（秒）
 
         # 设置环境变量以加快加载
         if self.disable_update:
             os.environ["FUNASR_DISABLE_UPDATE"] = "True"
 
-        # 异步预加载ASR模型
-        print("开始加载ASR模型...")
-        self.asr_load_thread = threading.Thread(target=self.load_asr_model)
-        self.asr_load_thread.daemon = True
-        self.asr_load_thread.start()
+        # 并行预加载所有需要的模型（冷启动时间约等于最慢的模型，而不是三者之和）
+        self.model_futures = {}  # 模型类型 -> Future
+        self.model_load_errors = {}  # 模型类型 -> 错误信息
+        self.model_load_times = {}  # 模型类型 -> 加载耗时（秒）
+        self.model_keys = {}  # 模型类型 -> 在model_registry中的键（由本实例持有引用）
+        self.use_model_snapshots = model_snapshots and self.backend == "torch" and model_snapshots_supported()
+        self.reused_models = set()  # 直接复用了其他实例已加载模型的类型
+        for kind, model in (models or {}).items():
+            setattr(self, f"{kind}_model", model)
+        models_to_load = [("asr", self.asr_model_name)] if streaming else []
+        if self.use_vad:
+            models_to_load.append(("vad", self.vad_model_name))
+        if self.use_punc:
+            models_to_load.append(("punc", self.punc_model_name))
+        models_to_load = [(kind, name) for kind, name in models_to_load if getattr(self, f"{kind}_model") is None]
+        if models_to_load:
+            print(f"开始并行加载模型: {', '.join(name for _, name in models_to_load)}...")
+            loader = ThreadPoolExecutor(max_workers=len(models_to_load), thread_name_prefix="model-loader")
+            for kind, model_name in models_to_load:
+                self.model_futures[kind] = loader.submit(self._load_model, kind, model_name)
+            loader.shutdown(wait=False)
+
+    def _report_model_progress(self, kind, status, detail=None):
+        """输出模型加载进度，并转发给进度回调"""
+        label = self.MODEL_LABELS.get(kind, kind)
+        if status == "loading":
+            print(f"加载{label}模型...")
+        elif status == "loaded":
+            print(f"{label}模型加载完成! ({detail:.1f}s)")
+        elif status == "failed":
+            print(f"{label}模型加载失败: {detail}")
+        if self.model_load_progress_callback:
+            try:
+                self.model_load_progress_callback(kind, status, detail)
+            except Exception as e:
+                print(f"模型加载进度回调出错: {e}")
+
+    def _model_key(self, kind, model_name):
+        """模型在model_registry中的键：相同名称和加载选项的模型可以共享"""
+        quantize = self.quantize if kind in self.QUANTIZABLE_MODELS + ("offline",) else None
+        if kind == "offline":  # 离线识别模型总是使用torch后端
+            return (kind, model_name, "torch", quantize, self.thread_budget["asr"])
+        return (kind, model_name, self.backend, quantize, self.thread_budget[kind])
+
+    def _create_model(self, kind, model_name):
+        """从磁盘加载一个流式模型（由model_registry在首次请求时调用）"""
+        if self.backend == "onnx":
+            model = self._load_onnx_model(kind, model_name)  # 已导出时不导入funasr/torch
+        elif self.quantize and kind in self.QUANTIZABLE_MODELS:
+            from funasr import AutoModel
+
+            model = AutoModel(model=model_name, device="cpu")  # 动态量化只支持CPU推理
+            quantize_automodel(model, model_name)
+        else:
+            model = self._load_automodel(model_name)
+        if self.backend == "torch":
+            model = BudgetedModel(model, self.thread_budget[kind])
+        return model
+
+    def _load_automodel(self, model_name):
+        """加载AutoModel：优先从快照加载（权重mmap），没有快照时正常加载并写入快照"""
+        if self.use_model_snapshots:
+            try:
+                model = load_model_snapshot(model_name)
+                if model is not None:
+                    return model
+            except Exception as e:
+                print(f"模型快照加载失败，改为正常加载: {e}")
+        from funasr import AutoModel
+
+        model = AutoModel(model=model_name)
+        if self.use_model_snapshots:
+            try:
+                save_model_snapshot(model, model_name)
+            except Exception as e:
+                print(f"写入模型快照失败（不影响识别）: {e}")
+        return model
 
-    def load_asr_model(self):
-        """加载ASR模型的线程函数"""
+    def _load_model(self, kind, model_name):
+        """
+        加载一个模型并赋值给对应属性（在加载线程中运行）
+
+        进程中已有相同名称和选项的模型时直接复用，不再从磁盘加载。
+
+        参数:
+            kind: 模型类型（asr/vad/punc）
+            model_name: FunASR模型名称
+
+        返回:
+            加载的模型，失败时抛出异常（由Future保存）
+        """
+        self._report_model_progress(kind, "loading")
+        load_start = time.perf_counter()
+        key = self._model_key(kind, model_name)
         try:
-            # 使用与FunASR.py相同的加载方式
-            self.asr_model = AutoModel(model="paraformer-zh-streaming")
-            print("ASR模型加载完成!")
+            model, reused = model_registry.acquire(key, lambda: self._create_model(kind, model_name))
         except Exception as e:
-            print(f"ASR模型加载失败: {e}")
+            self.model_load_errors[kind] = str(e)
+            self._report_model_progress(kind, "failed", str(e))
+            raise
+        self.model_keys[kind] = key
+        if reused:
+            self.reused_models.add(kind)
+        self.model_load_times[kind] = time.perf_counter() - load_start
+        self.model_load_errors.pop(kind, None)
+        setattr(self, f"{kind}_model", model)
+        self._report_model_progress(kind, "loaded", self.model_load_times[kind])
+        return model
+
+    def release_models(self):
+        """
+        释放本实例从model_registry获取的模型（不再使用该实例时调用）
 
-    def ensure_asr_model_loaded(self):
-        """确保ASR模型已加载"""
-        if self.asr_model is None:
-            print("等待ASR模型加载完成...")
-            if hasattr(self, 'asr_load_thread'):
-                self.asr_load_thread.join()
+        其他实例仍在使用的模型保留在内存中，最后一个使用者释放后才会回收。
+        """
+        futures_wait(list(self.model_futures.values()))
+        for kind, key in self.model_keys.items():
+            model_registry.release(key)
+            setattr(self, "offline_asr_model" if kind == "offline" else f"{kind}_model", None)
+        self.model_keys = {}
+        self.reused_models = set()
+        self.warmed_up = False
+
+    def _load_onnx_model(self, kind, model_name):
+        """加载onnxruntime版模型（首次使用时导出ONNX）"""
+        quantize = bool(self.quantize) and kind in self.QUANTIZABLE_MODELS
+        model_dir = export_onnx_model(model_name, quantize=quantize)
+        if kind == "asr":
+            # funasr_onnx的chunk_size以[左看, 块, 右看]的60ms帧数表示，与流式torch模型一致
+            return OnnxStreamingASR(model_dir, chunk_size=[5, self.asr_chunk_size[1], self.asr_chunk_size[2]],
+                                    quantize=quantize, intra_op_num_threads=self.thread_budget["asr"])
+        if kind == "vad":
+            return OnnxStreamingVAD(model_dir, intra_op_num_threads=self.thread_budget["vad"])
+        if kind == "punc":
+            return OnnxPunctuation(model_dir, quantize=quantize, intra_op_num_threads=self.thread_budget["punc"])
+        raise ValueError(f"ONNX后端不支持的模型类型: {kind}")
+
+    def _wait_model_future(self, kind, timeout=None):
+        """等待后台加载任务结束（忽略其异常，错误已记录在model_load_errors中）"""
+        future = self.model_futures.get(kind)
+        if future is not None:
+            try:
+                future.result(timeout=timeout)
+            except Exception:
+                pass
 
-            # 如果线程结束后模型仍未加载，再次尝试加载
-            if self.asr_model is None:
-                print("重新尝试加载ASR模型...")
-                try:
-                    self.asr_model = AutoModel(model="paraformer-zh-streaming")
-                    print("ASR模型加载完成!")
-                except Exception as e:
-                    print(f"ASR模型加载失败: {e}")
-                    return False
-        return True
+    def _load_model_with_retry(self, kind, model_name, timeout=None):
+        """
+        等待后台加载；若失败则同步重试一次，返回是否加载成功
 
-    def load_vad_model_if_needed(self):
-        """仅在需要时加载VAD模型"""
-        if self.use_vad and self.vad_model is None:
-            print("加载VAD模型...")
-            try:
-                self.vad_model = AutoModel(model="fsmn-vad")
-                print("VAD模型加载完成!")
+        参数:
+            timeout: 最长等待时间（秒），None表示一直等待；超时（仍在加载或已无时间重试）时返回False
+        """
+        if getattr(self, f"{kind}_model") is not None:
+            return True
+        wait_start = time.perf_counter()
+        future = self.model_futures.get(kind)
+        if future is not None:
+            print(f"等待{self.MODEL_LABELS[kind]}模型加载完成...")
+            self._wait_model_future(kind, timeout=timeout)
+            if getattr(self, f"{kind}_model") is not None:
                 return True
-            except Exception as e:
-                print(f"VAD模型加载失败: {e}")
-                return False
+        if (future is not None and not future.done()) or (
+                timeout is not None and time.perf_counter() - wait_start >= timeout):
+            print(f"等待{self.MODEL_LABELS[kind]}模型加载超时")
+            self.model_load_errors[kind] = "加载超时"
+            return False
+        if future is not None:
+            print(f"重新尝试加载{self.MODEL_LABELS[kind]}模型...")
+        try:
+            self._load_model(kind, model_name)
+            return True
+        except Exception:
+            return False
+
+    def ensure_asr_model_loaded(self, timeout=None):
+        """确保ASR模型已加载"""
+        return self._load_model_with_retry("asr", self.asr_model_name, timeout=timeout)
+
+    def load_vad_model_if_needed(self, timeout=None):
+        """仅在需要时加载VAD模型"""
+        if self.use_vad:
+            return self._load_model_with_retry("vad", self.vad_model_name, timeout=timeout)
         return True
 
-    def load_punc_model_if_needed(self):
+    def load_punc_model_if_needed(self, timeout=None):
         """仅在需要时加载标点恢复模型"""
-        if self.use_punc and self.punc_model is None:
-            print("加载标点恢复模型...")
+        if self.use_punc:
+            return self._load_model_with_retry("punc", self.punc_model_name, timeout=timeout)
+        return True
+
+    def ensure_models_loaded(self, timeout=None):
+        """
+        等待所有需要的模型并行加载完成（失败的模型会同步重试一次）
+
+        参数:
+            timeout: 等待后台加载的最长时间（秒），None表示一直等待
+
+        返回:
+            是否所有需要的模型都已加载（超时时返回False）；失败原因汇总在model_load_errors中
+        """
+        wait_start = time.perf_counter()
+
+        def remaining():
+            if timeout is None:
+                return None
+            return max(0.0, timeout - (time.perf_counter() - wait_start))
+
+        futures_wait(list(self.model_futures.values()), timeout=timeout)
+        ok = self.ensure_asr_model_loaded(timeout=remaining())
+        ok = self.load_vad_model_if_needed(timeout=remaining()) and ok
+        ok = self.load_punc_model_if_needed(timeout=remaining()) and ok
+        if ok:
+            times = ", ".join(f"{self.MODEL_LABELS[k]} {t:.1f}s" for k, t in self.model_load_times.items())
+            print(f"所有模型加载完成，等待 {time.perf_counter() - wait_start:.1f}s（{times}）")
+            if self.warmup_enabled and not self.warmed_up:
+                if self.model_keys and all(model_registry.is_warmed(key) for key in self.model_keys.values()):
+                    self.warmed_up = True  # 复用的模型已由其他实例预热
+                else:
+                    self.warmup()
+        else:
+            errors = "; ".join(f"{self.MODEL_LABELS.get(k, k)}: {e}" for k, e in self.model_load_errors.items())
+            print(f"部分模型加载失败: {errors}")
+        return ok
+
+    def _synthetic_warmup_audio(self, num_samples):
+        """生成预热用的合成音频：前半段静音，后半段带噪声的谐波音"""
+        t = np.arange(num_samples, dtype=np.float32) / self.sample_rate
+        tone = 0.1 * np.sin(2 * np.pi * 220 * t) + 0.05 * np.sin(2 * np.pi * 660 * t)
+        tone += 0.01 * np.random.default_rng(0).standard_normal(num_samples)
+        tone[:num_samples // 2] = 0.0
+        return tone.astype(np.float32)
+
+    def warmup(self):
+        """
+        用合成的静音和音调片段预热已加载的模型（使用一次性缓存，不影响识别状态）
+
+        首次generate调用会触发torch/FunASR内部的内存分配和延迟初始化，
+        预热后第一句真实语音即可达到稳定延迟。
+
+        返回:
+            总预热耗时（秒）
+        """
+        warmup_start = time.perf_counter()
+        self.warmup_stats = {}
+        try:
+            if self.vad_model is not None:
+                t0 = time.perf_counter()
+                audio = self._synthetic_warmup_audio(self.vad_chunk_samples * 4)
+                vad_cache = {}
+                for i in range(4):
+                    self.vad_model.generate(
+                        input=audio[i * self.vad_chunk_samples:(i + 1) * self.vad_chunk_samples],
+                        cache=vad_cache,
+                        is_final=i == 3,
+                        chunk_size=self.vad_chunk_duration_ms
+                    )
+                self.warmup_stats["vad"] = time.perf_counter() - t0
+
+            if self.asr_model is not None:
+                t0 = time.perf_counter()
+                audio = self._synthetic_warmup_audio(self.asr_chunk_samples * 2)
+                asr_cache = {}
+                for i in range(2):
+                    self.asr_model.generate(
+                        input=audio[i * self.asr_chunk_samples:(i + 1) * self.asr_chunk_samples],
+                        cache=asr_cache,
+                        is_final=i == 1,
+                        chunk_size=self.asr_chunk_size,
+                        encoder_chunk_look_back=self.encoder_chunk_look_back,
+                        decoder_chunk_look_back=self.decoder_chunk_look_back
+                    )
+                self.warmup_stats["asr"] = time.perf_counter() - t0
+
+            if self.punc_model is not None:
+                t0 = time.perf_counter()
+                self.punc_model.generate(input="你好欢迎使用实时语音识别系统今天天气很好")
+                self.warmup_stats["punc"] = time.perf_counter() - t0
+        except Exception as e:
+            print(f"模型预热出错（不影响识别）: {e}")
+
+        self.warmed_up = True
+        for key in self.model_keys.values():
+            model_registry.mark_warmed(key)
+        total = time.perf_counter() - warmup_start
+        details = ", ".join(f"{self.MODEL_LABELS[k]} {t:.2f}s" for k, t in self.warmup_stats.items())
+        print(f"模型预热完成，用时 {total:.2f}s（{details}）")
+        return total
+
+    def _create_offline_asr_model(self):
+        """从磁盘加载离线识别模型（由model_registry在首次请求时调用）"""
+        from funasr import AutoModel
+
+        if self.quantize:
+            model = AutoModel(model=self.offline_asr_model_name, device="cpu")
+            quantize_automodel(model, self.offline_asr_model_name)
+        else:
+            model = self._load_automodel(self.offline_asr_model_name)
+        return BudgetedModel(model, self.thread_budget["asr"])
+
+    def load_offline_asr_model_if_needed(self):
+        """仅在需要时加载离线批量识别模型"""
+        if self.offline_asr_model is None and self.offline_asr_model_name:
+            print(f"加载离线识别模型 ({self.offline_asr_model_name})...")
+            key = self._model_key("offline", self.offline_asr_model_name)
             try:
-                self.punc_model = AutoModel(model="ct-punc")
-                print("标点恢复模型加载完成!")
-                return True
+                self.offline_asr_model, _ = model_registry.acquire(key, self._create_offline_asr_model)
+                self.model_keys["offline"] = key
+                print("离线识别模型加载完成!")
             except Exception as e:
-                print(f"标点恢复模型加载失败: {e}")
+                print(f"离线识别模型加载失败，将使用流式模型逐段识别: {e}")
+                self.offline_asr_model_name = None
                 return False
-        return True
+        return self.offline_asr_model is not None
+
+    def _to_capture_dtype(self, chunk):
+        """把格式与capture_dtype不同的音频块（如回放送入的float32）转换为采集格式"""
+        if chunk.dtype == self.capture_dtype:
+            return chunk
+        if self.capture_dtype == "int16":
+            return np.clip(np.rint(chunk * 32768), -32768, 32767).astype(np.int16)
+        return to_float32(chunk)
+
+    def _new_audio_queue(self):
+        """创建由audio_callback/feed送入音频时使用的有界音频队列"""
+        return AudioBlockQueue(max_seconds=self.audio_queue_max_seconds, policy=self.audio_queue_policy,
+                               sample_rate=self.sample_rate, max_merge_seconds=self.audio_queue_max_merge_seconds)
 
     def audio_callback(self, indata, frames, time, status):
         """音频流回调函数"""
         if status:
             print(f"音频状态: {status}")
-        # 将音频数据放入队列
-        self.audio_queue.put(indata.copy())
+        # 将音频数据连同采集时间放入队列（积压超过上限时按过载策略处理）
+        self.audio_queue.offer((self.clock(), indata.copy()))
 
-    def check_silence(self, audio_chunk):
+    def analyze_silence_frames(self):
         """
-        检查音频块是否为相对静音（基于说话音量与当前音量的对比）
+        对累积器中所有完整的100ms帧做动态静音检测
 
-        参数:
-            audio_chunk: 音频数据块
+        一次NumPy运算求出所有帧的RMS，再逐帧更新说话音量和静音状态，
+        每帧使用其最后一个样本的采集时间，结果与音频块到达的节奏无关。
+        某一帧触发静音超时时立即返回，其后的帧留在累积器中，由调用方重置状态后继续分析。
 
         返回:
             是否触发了静音超时
         """
-        # 计算音频块的RMS（均方根）能量
-        audio_energy = np.sqrt(np.mean(audio_chunk ** 2))
+        frame = self.silence_check_samples
+        n = len(self.audio_accumulator) // frame
+        if n == 0:
+            return False
+        frames = to_float32(self.audio_accumulator.peek(n * frame)).reshape(n, frame)
+        energies = np.sqrt(np.einsum("ij,ij->i", frames, frames) / frame)
+        frame_seconds = frame / self.sample_rate
+        # 最后一个完整帧结束时的采集时间
+        last_end = self.accumulator_end_time - (len(self.audio_accumulator) - n * frame) / self.sample_rate
+        for i, energy in enumerate(energies):
+            if self.check_silence(float(energy), last_end - (n - 1 - i) * frame_seconds):
+                self.audio_accumulator.consume((i + 1) * frame)
+                return True
+        self.audio_accumulator.consume(n * frame)
+        return False
+
+    def check_silence(self, audio_energy, current_time):
+        """
+        检查一帧音频是否为相对静音（基于说话音量与当前音量的对比）
 
-        current_time = time.time()
+        参数:
+            audio_energy: 帧的RMS能量
+            current_time: 帧的采集时间
+
+        返回:
+            是否触发了静音超时
+        """
 
         # 如果正在说话且音量不是特别小，更新说话音量
         if self.is_speaking and audio_energy > 0.005:
@@ -252,176 +1694,773 @@ class FastLoadASR:
 
         return False
 
+    def next_deadline(self):
+        """
+        计算处理线程在没有新音频时需要主动醒来的时间点
+
+        返回:
+            最早的截止时间（self.clock()时间戳），None表示只需等待音频到达
+        """
+        if not self.is_speaking:
+            return None
+
+        deadlines = []
+        # 相对静音超时
+        if self.is_in_silence and self.silence_start_time:
+            deadlines.append(self.silence_start_time + self.silence_duration_threshold)
+        # 长时间没有新音频时需要填充静音数据
+        if len(self.audio_accumulator) < self.silence_check_samples:
+            deadlines.append(self.last_audio_time + self._silence_padding_interval())
+        # 强制分段（与两次强制分段之间的最小间隔取较晚者）
+        if self.current_segment_start_time is not None:
+            deadlines.append(max(self.current_segment_start_time + self.max_segment_duration_seconds,
+                                 self.last_forced_segment_time + self.max_segment_duration_seconds / 2.0))
+        return min(deadlines) if deadlines else None
+
+    def _silence_padding_interval(self):
+        """
+        没有新音频多久之后填充静音数据
+
+        采集块（如3200样本=200ms）长于静音检查间隔时，两个块之间的正常间隔不能当作音频中断，
+        否则说话过程中会被插入静音帧；按两个块的时长留出回调抖动的余量。
+        """
+        return max(self.silence_check_interval, 2 * self.last_chunk_seconds)
+
     def process_audio_thread(self):
         """
         音频处理线程
 
         功能：
-        - 处理音频队列中的数据
+        - 阻塞等待音频队列中的数据（无音频时只在静音超时/强制分段的截止时间醒来）
+        - 调用process_audio_step完成VAD、动态静音检测、ASR和强制分段
+        """
+        while self.running:
+            try:
+                # 阻塞等待：音频到达或下一个截止时间（静音超时/强制分段）到期时才唤醒
+                deadline = self.next_deadline()
+                # 注入的时钟可能比真实时间快（加速回放），等待时间按倍速换算
+                clock_rate = getattr(self.clock, "rate", 1.0)
+                timeout = None if deadline is None else max(0.0, deadline - self.clock()) / clock_rate + 0.001
+                try:
+                    pending_chunks = [self.audio_queue.get(timeout=timeout)]
+                except queue.Empty:
+                    pending_chunks = []  # 截止时间到达，没有新音频
+                self.process_queued_audio(pending_chunks)
+            except Exception as e:
+                print(f"\n音频处理错误: {e}")
+                if not self.running: break
+                time.sleep(0.1)  # Avoid busy loop on other errors
+
+    def process_queued_audio(self, pending_chunks=None):
+        """
+        取出音频队列中已积压的全部音频并执行一次处理步骤（非阻塞）
+
+        处理线程和同步驱动（如回放测试）共用此入口。
+
+        参数:
+            pending_chunks: 已从队列中取出的音频块
+        """
+        pending_chunks = [] if pending_chunks is None else pending_chunks
+        while True:
+            try:
+                pending_chunks.append(self.audio_queue.get_nowait())
+            except queue.Empty:
+                break
+        if self.running:
+            self.process_audio_step(pending_chunks)
+
+    def process_audio_step(self, pending_chunks):
+        """
+        处理一批音频块（可以为空，用于截止时间到达时的检查）
+
+        功能：
         - 执行VAD检测
         - 执行动态静音检测
         - 触发ASR处理
         - 管理强制分段
+
+        所有时间判断都使用self.clock()，便于注入模拟时钟进行确定性回放。
         """
-        vad_buffer = np.array([], dtype=np.float32)
-        audio_accumulator = np.array([], dtype=np.float32)  # 用于累积音频进行静音检测
-        last_audio_time = time.time()  # 记录最后接收到音频的时间
+        for item in pending_chunks:
+            if item is None:  # stop()发送的唤醒信号
+                continue
+            capture_time, chunk = item
+            chunk = self._to_capture_dtype(chunk)
+            self.last_capture_time = capture_time
+            self.last_audio_time = self.clock()  # 更新最后音频时间
+            self.last_chunk_seconds = len(chunk) / self.sample_rate
+            self.processed_samples += len(chunk)
+
+            # 累积音频用于静音检测
+            self.audio_accumulator.write(chunk)
+            self.accumulator_end_time = capture_time
+
+            if self.use_vad:
+                self.vad_buffer.write(chunk)
+            else:
+                # 不使用VAD时，直接将音频块添加到语音缓冲区
+                self.speech_buffer.write(to_float32(chunk))
+                if self.current_segment_start_time is None:  # For non-VAD, start timing on first audio
+                    self.current_segment_start_time = self.clock()
+                    self._begin_utterance(capture_time - len(chunk) / self.sample_rate)
+
+        # 动态静音检测 - 即使没有新音频也要检查
+        current_time = self.clock()
+
+        # 如果正在说话且处于相对静音状态，检查是否超时
+        if self.is_speaking and self.is_in_silence and self.silence_start_time:
+            silence_duration = current_time - self.silence_start_time
+            if silence_duration > self.silence_duration_threshold and len(self.speech_buffer) > 0:
+                print(f"\n相对静音超时触发 ({silence_duration:.2f}s > {self.silence_duration_threshold}s)...")
+                self.process_asr_buffer(is_final=True)
+                # 重置状态
+                self.is_speaking = False
+                self.current_segment_start_time = None
+                self.is_in_silence = False
+                self.silence_start_time = None
+                self.audio_accumulator.clear()  # 清空累积器
+                self.speaking_volume = 0.0  # 重置说话音量
+
+        # 如果有音频累积，逐帧进行动态静音检测
+        if len(self.audio_accumulator) >= self.silence_check_samples:
+            while self.analyze_silence_frames():
+                # 相对静音超时触发句子结束
+                print("\n动态静音检测触发ASR最终处理...")
+                self.process_asr_buffer(is_final=True)
+                # 重置状态
+                self.is_speaking = False
+                self.current_segment_start_time = None
+                self.is_in_silence = False
+                self.silence_start_time = None
+                self.speaking_volume = 0.0  # 重置说话音量
+
+        # 如果长时间没有新音频，填充静音数据进行检测（确保能检测到持续的静音）
+        elif current_time - self.last_audio_time > self._silence_padding_interval() and self.is_speaking:
+            # 填充100ms的静音数据
+            self.audio_accumulator.write(self._silence_data)
+            self.accumulator_end_time = current_time
+            self.last_audio_time = current_time
+
+        # 使用VAD处理
+        if self.use_vad and self.vad_model is not None:
+            while len(self.vad_buffer) >= self.vad_chunk_samples and self.running:
+                # 提取一个VAD音频块
+                vad_chunk = to_float32(self.vad_buffer.consume(self.vad_chunk_samples))
+
+                if self.vad_gate_enabled and not self.is_speaking:
+                    if self._vad_gate_should_skip(vad_chunk):
+                        self.vad_gate_preroll.append(vad_chunk.copy())
+                        self.vad_gate_skipped += 1
+                        continue
+                    if self.vad_gate_skipping:
+                        # 恢复推理：VAD从新状态开始，先补送最近跳过的块，使模型看到连续的音频
+                        self.vad_gate_skipping = False
+                        self.vad_cache = {}
+                        preroll = list(self.vad_gate_preroll)
+                        self.vad_gate_preroll.clear()
+                        for i, chunk in enumerate(preroll):
+                            samples_after = len(self.vad_buffer) + len(vad_chunk) * (len(preroll) - i)
+                            self._run_vad_chunk(chunk, samples_after)
+
+                self._run_vad_chunk(vad_chunk, len(self.vad_buffer))
+        else:
+            # 不使用VAD时，总是处于"说话"状态
+            if len(self.speech_buffer) > 0 and self.current_segment_start_time is None:
+                self.current_segment_start_time = self.clock()  # Start timing if buffer has data
+            self.is_speaking = True
+
+        # 如果语音缓冲区足够大，进行ASR处理
+        if len(self.speech_buffer) >= self.asr_chunk_samples:
+            self.process_asr_buffer()
+
+        # Max segment duration check (only if speaking or if no VAD and buffer exists)
+        if self.is_speaking and self.current_segment_start_time is not None:
+            current_time = self.clock()
+            segment_duration = current_time - self.current_segment_start_time
+            # Also consider time since last forced segment to avoid rapid successive forced cuts
+            time_since_last_force = current_time - self.last_forced_segment_time
+
+            if segment_duration > self.max_segment_duration_seconds and time_since_last_force > self.max_segment_duration_seconds / 2.0:  # Ensure not too close forced cuts
+                print(
+                    f"\n片段达到最大时长 ({segment_duration:.2f}s > {self.max_segment_duration_seconds}s)，强制结束当前片段...")
+                if len(self.speech_buffer) > 0:
+                    self.process_asr_buffer(is_final=True)  # Process current buffer as final
+                # Reset timing for the *next* segment, which starts now conceptually
+                self.current_segment_start_time = self.clock()
+                self._begin_utterance(self.last_capture_time)
+                self.last_forced_segment_time = current_time
+                # 重置静音状态
+                self.is_in_silence = False
+                self.silence_start_time = None
+                self.speaking_volume = 0.0  # 重置说话音量
+                # If using VAD, is_speaking might still be true. We don't reset it here,
+                # VAD should eventually detect silence or another forced cut will occur.
+                # If not using VAD, this effectively restarts the segment timer.
+
+    def _vad_gate_should_skip(self, chunk):
+        """
+        能量/过零率预门限：判断非说话状态下的VAD块能否跳过推理，并更新自适应噪声底
 
-        while self.running:
-            try:
-                audio_chunk_processed_this_loop = False
-                while not self.audio_queue.empty() and self.running:
-                    chunk = self.audio_queue.get_nowait()
-                    audio_chunk_processed_this_loop = True
-                    last_audio_time = time.time()  # 更新最后音频时间
-
-                    # 累积音频用于静音检测
-                    audio_accumulator = np.append(audio_accumulator, chunk.flatten())
-
-                    if self.use_vad:
-                        vad_buffer = np.append(vad_buffer, chunk.flatten())
-                    else:
-                        # 不使用VAD时，直接将音频块添加到语音缓冲区
-                        self.speech_buffer = np.append(self.speech_buffer, chunk.flatten())
-                        if self.current_segment_start_time is None:  # For non-VAD, start timing on first audio
-                            self.current_segment_start_time = time.time()
-
-                # 动态静音检测 - 即使没有新音频也要检查
-                current_time = time.time()
-
-                # 如果正在说话且处于相对静音状态，检查是否超时
-                if self.is_speaking and self.is_in_silence and self.silence_start_time:
-                    silence_duration = current_time - self.silence_start_time
-                    if silence_duration > self.silence_duration_threshold and len(self.speech_buffer) > 0:
-                        print(f"\n相对静音超时触发 ({silence_duration:.2f}s > {self.silence_duration_threshold}s)...")
-                        self.process_asr_buffer(is_final=True)
-                        # 重置状态
-                        self.is_speaking = False
-                        self.current_segment_start_time = None
+        连续vad_gate_hangover_chunks个静音块之后才开始跳过，
+        高过零率（可能是清辅音）的块只有在能量非常接近噪声底时才跳过。
+        """
+        n = len(chunk)
+        rms = float(np.sqrt(np.dot(chunk, chunk) / n))
+        zcr = np.count_nonzero(np.signbit(chunk[1:]) != np.signbit(chunk[:-1])) / n
+        if rms < self.vad_gate_min_floor:
+            # 数字静音（设备刚打开或静音时的全零块）直接视为静音，不参与噪声底跟踪，
+            # 否则噪声底会停在下限附近，之后按每块1%的速度上升需要很久才能恢复
+            return self._vad_gate_count_quiet(True)
+        if self.vad_noise_floor is None:
+            # 噪声底由一个窗口的块初始化，而不是只看第一个块
+            self.vad_gate_seed_rms.append(rms)
+            if len(self.vad_gate_seed_rms) < self.vad_gate_seed_chunks:
+                return self._vad_gate_count_quiet(False)
+            self.vad_noise_floor = float(np.median(self.vad_gate_seed_rms))
+            self.vad_gate_seed_rms = []
+        floor = max(self.vad_noise_floor, self.vad_gate_min_floor)
+        quiet = rms <= floor * self.vad_gate_energy_ratio and (
+            zcr <= self.vad_gate_zcr_threshold or rms <= floor * 1.2)
+
+        # 噪声底遇到更安静的块时快速下降，在静音块上缓慢跟踪，其余时间缓慢上升以适应环境噪声变大
+        if rms < floor:
+            floor = 0.5 * floor + 0.5 * rms
+        elif quiet:
+            floor = 0.95 * floor + 0.05 * rms
+        else:
+            floor *= 1.01
+        self.vad_noise_floor = max(floor, self.vad_gate_min_floor)
+        # 音频队列过载时按同一噪声底判断哪些积压块是非语音
+        self.audio_queue.speech_rms = self.vad_noise_floor * self.vad_gate_energy_ratio
+        return self._vad_gate_count_quiet(quiet)
+
+    def _vad_gate_count_quiet(self, quiet):
+        """累计连续静音块数，超过hangover后返回True（跳过VAD推理）"""
+        if not quiet:
+            self.vad_gate_quiet_chunks = 0
+            return False
+        self.vad_gate_quiet_chunks += 1
+        if self.vad_gate_quiet_chunks > self.vad_gate_hangover_chunks:
+            self.vad_gate_skipping = True
+            return True
+        return False
+
+    def _run_vad_chunk(self, vad_chunk, samples_after):
+        """
+        对一个VAD块执行VAD推理并处理语音开始/结束
+
+        参数:
+            vad_chunk: VAD音频块
+            samples_after: 采集顺序上位于该块之后、尚未处理的样本数（用于计算首个样本的采集时间）
+        """
+        # 使用VAD模型处理
+        vad_timer = time.perf_counter()
+        vad_res = self.vad_model.generate(
+            input=vad_chunk,
+            cache=self.vad_cache,
+            is_final=False,
+            chunk_size=self.vad_chunk_duration_ms
+        )
+        self.vad_calls += 1
+        self.vad_call_seconds += time.perf_counter() - vad_timer
+
+        # 处理VAD结果
+        if len(vad_res[0]["value"]):
+            # 有语音活动检测结果
+            for segment_info in vad_res[0]["value"]:
+                if segment_info[0] != -1 and segment_info[1] == -1:
+                    # 检测到语音开始
+                    if not self.is_speaking:  # Check to only set start_time once per segment
+                        self.is_speaking = True
+                        self.current_segment_start_time = self.clock()
+                        # 重置静音状态
                         self.is_in_silence = False
                         self.silence_start_time = None
-                        audio_accumulator = np.array([], dtype=np.float32)  # 清空累积器
                         self.speaking_volume = 0.0  # 重置说话音量
-
-                # 如果有音频累积，进行动态静音检测
-                silence_check_samples = int(self.sample_rate * 0.1)  # 100ms的样本数
-                if len(audio_accumulator) >= silence_check_samples:
-                    # 检查最近的音频块
-                    recent_audio = audio_accumulator[-silence_check_samples:]
-                    silence_triggered = self.check_silence(recent_audio)
-
-                    if silence_triggered:
-                        # 相对静音超时触发句子结束
-                        print("\n动态静音检测触发ASR最终处理...")
-                        self.process_asr_buffer(is_final=True)
-                        # 重置状态
+                        # 当前VAD块首个样本的采集时间 = 最新块的采集时间 - 该块及其后音频的时长
+                        first_sample_time = self.last_capture_time - (
+                            samples_after + len(vad_chunk)) / self.sample_rate
+                        self._begin_utterance(first_sample_time, vad_speech_start=self.clock())
+                        print("\n检测到语音开始 (VAD)...")
+                elif segment_info[0] == -1 and segment_info[1] != -1:
+                    # 检测到语音结束
+                    if self.is_speaking:  # Process only if we were speaking
                         self.is_speaking = False
-                        self.current_segment_start_time = None
+                        self.current_segment_start_time = None  # Reset segment start time
+                        # 重置静音状态
                         self.is_in_silence = False
                         self.silence_start_time = None
                         self.speaking_volume = 0.0  # 重置说话音量
+                        print("\n检测到语音结束 (VAD)...")
+                        if len(self.speech_buffer) > 0:
+                            print("VAD结束，处理剩余ASR缓冲区...")
+                            self.process_asr_buffer(is_final=True)
+        # 如果正在说话，将当前块添加到语音缓冲区
+        if self.is_speaking:
+            self.speech_buffer.write(vad_chunk)
+
+    def _begin_utterance(self, first_sample_time, vad_speech_start=None):
+        """开始记录一句话的延迟时间戳"""
+        self.utterance_count += 1
+        self.current_utterance = {
+            "id": self.utterance_count,
+            "first_sample_time": first_sample_time,  # 首个样本的采集时间
+            "vad_speech_start": vad_speech_start,  # VAD报告语音开始的时间
+            "asr_calls": [],  # 每次asr_model.generate的(开始时间, 耗时)
+            "first_partial_time": None,  # 第一次实时结果回调的时间
+            "final_decode_duration": None,  # is_final解码耗时
+            "punc_duration": None,  # 标点恢复耗时
+            "last_sample_time": None,  # 句子结束时最后一个样本的采集时间
+            "emit_time": None,  # 最终结果回调的时间
+        }
+        if vad_speech_start is not None:
+            self._record_latency("vad_detect", vad_speech_start - first_sample_time)
+        return self.current_utterance
+
+    def _record_latency(self, name, seconds):
+        """记录一个延迟样本"""
+        with self.stats_lock:
+            samples = self.latency_samples.get(name)
+            if samples is None:
+                samples = self.latency_samples[name] = deque(maxlen=self.latency_window)
+            samples.append(seconds)
+
+    def _record_asr_call(self, start_time, duration, is_final):
+        """记录一次asr_model.generate调用"""
+        utterance = self.current_utterance or self._begin_utterance(self.last_capture_time)
+        utterance["asr_calls"].append((start_time, duration))
+        self._record_latency("asr_generate", duration)
+        if is_final:
+            utterance["final_decode_duration"] = duration
+            self._record_latency("final_decode", duration)
+
+    def _set_asr_chunk_level(self, level, rtf, backlog):
+        """切换每次ASR调用的音频时长并记录切换（asr_cache不受影响）"""
+        old_ms = self.asr_chunk_duration_ms
+        self.asr_chunk_level = level
+        self.asr_chunk_duration_ms = self.asr_chunk_base_ms * self.asr_chunk_multiples[level]
+        self.asr_chunk_samples = int(self.sample_rate * self.asr_chunk_duration_ms / 1000)
+        self.asr_rtf_samples.clear()  # 新块大小的RTF重新测量
+        self.asr_calls_since_switch = 0
+        self.asr_chunk_switches.append({
+            "time": self.clock(), "from_ms": old_ms, "to_ms": self.asr_chunk_duration_ms,
+            "rtf": round(rtf, 3), "backlog_seconds": round(backlog, 3),
+        })
+        print(f"\nASR块大小切换: {old_ms}ms -> {self.asr_chunk_duration_ms}ms "
+              f"(RTF {rtf:.2f}, 积压 {backlog:.1f}s)")
+
+    def _asr_rtf(self):
+        """滑动窗口内的ASR实时率（推理耗时/音频时长）"""
+        audio = sum(a for a, _ in self.asr_rtf_samples)
+        return sum(c for _, c in self.asr_rtf_samples) / audio if audio > 0 else 0.0
+
+    def _update_asr_chunk_size(self, samples, duration):
+        """
+        自适应块大小控制器：每次ASR调用后更新滑动窗口RTF，按RTF和积压的音频切换块大小
+
+        RTF过高或积压超过两个块时切换到更大的块以追上实时，
+        RTF较低且积压不足一个较小的块时回到低延迟的块。
+        """
+        self.asr_rtf_samples.append((samples / self.sample_rate, duration))
+        while len(self.asr_rtf_samples) > 1 and sum(a for a, _ in self.asr_rtf_samples) > self.asr_rtf_window_seconds:
+            self.asr_rtf_samples.popleft()
+        self.asr_calls_since_switch += 1
+        if self.asr_calls_since_switch < self.asr_switch_min_calls:
+            return
 
-                    # 保持音频累积器在合理大小
-                    if len(audio_accumulator) > silence_check_samples * 2:
-                        audio_accumulator = audio_accumulator[-silence_check_samples:]
-
-                # 如果长时间没有新音频，填充静音数据进行检测（确保能检测到持续的静音）
-                elif current_time - last_audio_time > 0.1 and self.is_speaking:
-                    # 填充100ms的静音数据
-                    silence_data = np.zeros(silence_check_samples, dtype=np.float32)
-                    audio_accumulator = np.append(audio_accumulator, silence_data)
-                    last_audio_time = current_time
-
-                # 使用VAD处理
-                if self.use_vad and self.vad_model is not None:
-                    while len(vad_buffer) >= self.vad_chunk_samples and self.running:
-                        # 提取一个VAD音频块
-                        vad_chunk = vad_buffer[:self.vad_chunk_samples]
-                        vad_buffer = vad_buffer[self.vad_chunk_samples:]
-                        audio_chunk_processed_this_loop = True
-
-                        # 使用VAD模型处理
-                        vad_res = self.vad_model.generate(
-                            input=vad_chunk,
-                            cache=self.vad_cache,
-                            is_final=False,
-                            chunk_size=self.vad_chunk_duration_ms
-                        )
-
-                        # 处理VAD结果
-                        if len(vad_res[0]["value"]):
-                            # 有语音活动检测结果
-                            for segment_info in vad_res[0]["value"]:
-                                if segment_info[0] != -1 and segment_info[1] == -1:
-                                    # 检测到语音开始
-                                    if not self.is_speaking:  # Check to only set start_time once per segment
-                                        self.is_speaking = True
-                                        self.current_segment_start_time = time.time()
-                                        # 重置静音状态
-                                        self.is_in_silence = False
-                                        self.silence_start_time = None
-                                        self.speaking_volume = 0.0  # 重置说话音量
-                                        print("\n检测到语音开始 (VAD)...")
-                                elif segment_info[0] == -1 and segment_info[1] != -1:
-                                    # 检测到语音结束
-                                    if self.is_speaking:  # Process only if we were speaking
-                                        self.is_speaking = False
-                                        self.current_segment_start_time = None  # Reset segment start time
-                                        # 重置静音状态
-                                        self.is_in_silence = False
-                                        self.silence_start_time = None
-                                        self.speaking_volume = 0.0  # 重置说话音量
-                                        print("\n检测到语音结束 (VAD)...")
-                                        if len(self.speech_buffer) > 0:
-                                            print("VAD结束，处理剩余ASR缓冲区...")
-                                            self.process_asr_buffer(is_final=True)
-                        # 如果正在说话，将当前块添加到语音缓冲区
-                        if self.is_speaking:
-                            self.speech_buffer = np.append(self.speech_buffer, vad_chunk)
+        rtf = self._asr_rtf()
+        # 等待ASR的音频：队列中的积压加上尚未经过VAD/ASR的缓冲区
+        backlog = (self.audio_queue.queued_samples + len(self.vad_buffer) + len(self.speech_buffer)) / self.sample_rate
+        level = self.asr_chunk_level
+        chunk_seconds = self.asr_chunk_duration_ms / 1000
+        if level + 1 < len(self.asr_chunk_multiples) and (rtf > self.asr_rtf_high or backlog > 2 * chunk_seconds):
+            self._set_asr_chunk_level(level + 1, rtf, backlog)
+        elif level > 0 and rtf < self.asr_rtf_low and backlog < self.asr_chunk_base_ms / 1000 * self.asr_chunk_multiples[level - 1]:
+            self._set_asr_chunk_level(level - 1, rtf, backlog)
+
+    def get_asr_chunk_stats(self):
+        """获取自适应ASR块大小的状态：当前块大小、滑动窗口RTF和最近的切换记录"""
+        return {
+            "adaptive": self.adaptive_asr_chunks,
+            "chunk_ms": self.asr_chunk_duration_ms,
+            "rtf": round(self._asr_rtf(), 3),
+            "switches": len(self.asr_chunk_switches),
+            "recent_switches": list(self.asr_chunk_switches)[-5:],
+        }
+
+    def _punctuate(self, text, utterance=None):
+        """对文本进行标点恢复并记录耗时，失败时返回原文"""
+        punc_timer = time.perf_counter()
+        punc_res = self.punc_model.generate(input=text)
+        duration = time.perf_counter() - punc_timer
+        if utterance is not None:
+            utterance["punc_duration"] = duration
+        self._record_latency("punc", duration)
+        self._record_punc_batch(1, duration)
+        if punc_res and punc_res[0]["text"]:
+            return punc_res[0]["text"]
+        return text
+
+    def _punctuate_batch(self, texts, utterances, owners=None):
+        """
+        在一次标点恢复调用中处理多句积压的文本，再按句子切分结果
+
+        ct-punc本身按固定长度窗口处理长文本，合并调用省去了逐句调用的固定开销；
+        结果无法对齐回原句时逐句处理。
+        owners为每句所属的会话（多路识别时一批中可能有其他音频流的句子），默认全部属于本实例；
+        标点耗时和批大小（该会话在本批中的句数）记入各句所属的会话。
+        """
+        owners = owners or [self] * len(texts)
+        if len(texts) == 1:
+            return [owners[0]._punctuate(texts[0], utterances[0])]
+        punc_timer = time.perf_counter()
+        punc_res = self.punc_model.generate(input=" ".join(texts))
+        duration = time.perf_counter() - punc_timer
+        pieces = split_punctuated_text(punc_res[0]["text"], texts) if punc_res and punc_res[0]["text"] else None
+        if pieces is None:
+            for owner in dict.fromkeys(owners):
+                owner.punc_batch_fallbacks += 1
+            return [owner._punctuate(text, utterance) for text, utterance, owner in zip(texts, utterances, owners)]
+        for utterance in utterances:
+            utterance["punc_duration"] = duration
+            utterance["punc_batch_size"] = len(texts)
+        for owner in dict.fromkeys(owners):
+            owner._record_latency("punc", duration)
+            owner._record_punc_batch(owners.count(owner), duration)
+        return [piece or text for piece, text in zip(pieces, texts)]
+
+    def _record_punc_batch(self, size, duration):
+        """记录一次标点恢复调用的批大小和耗时"""
+        with self.stats_lock:
+            self.punc_batch_sizes[size] = self.punc_batch_sizes.get(size, 0) + 1
+            self.punc_total_seconds += duration
+
+    def _run_punc_batch(self):
+        """在标点线程中取出积压的句子，合并做一次标点恢复"""
+        jobs = []
+        while self.punc_pending and len(jobs) < self.punc_max_batch:
+            job = self.punc_pending.popleft()
+            if not job["expired"]:  # 已超时输出原文的句子不再处理
+                jobs.append(job)
+        if not jobs:
+            return  # 已被前一次调用合并处理
+        try:
+            texts = self._punctuate_batch([job["raw_text"] for job in jobs], [job["utterance"] for job in jobs],
+                                          [job["owner"] for job in jobs])
+        except Exception as e:
+            print(f"标点恢复出错，输出原文: {e}")
+            texts = [job["raw_text"] for job in jobs]
+        for job, text in zip(jobs, texts):
+            job["text"] = text
+            job["done"].set()
+
+    def _stabilize_partial(self, hypothesis):
+        """
+        计算部分结果的稳定前缀
+
+        在最近partial_stability_window次部分结果中位置和内容都不变的前缀视为稳定；
+        稳定前缀只增不减，后续结果修改了已稳定的文本时记为一次回退。
+
+        返回:
+            (stable, unstable, delta): 稳定前缀、可能变化的尾部、自上次回调以来新增的稳定文本；
+            回退时delta为None，调用方应以stable+unstable替换本句已显示的内容
+        """
+        self.partial_history.append(hypothesis)
+        stable_len = 0
+        if len(self.partial_history) == self.partial_history.maxlen:
+            stable_len = len(os.path.commonprefix(list(self.partial_history)))
+        previous = self.partial_stable
+        if hypothesis.startswith(previous):
+            stable = hypothesis[:max(stable_len, len(previous))]
+            delta = stable[len(previous):]
+        else:
+            self.partial_rollbacks += 1
+            stable = hypothesis[:stable_len]
+            delta = None
+        self.partial_stable = stable
+        unstable = hypothesis[len(stable):]
+
+        self.partial_callbacks += 1
+        self.partial_full_chars += len(hypothesis)
+        self.partial_incremental_chars += len(hypothesis) if delta is None else len(delta) + len(unstable)
+        return stable, unstable, delta
+
+    def _reset_partial_stability(self):
+        """句子结束时清空稳定前缀的跟踪状态（按当前的partial_stability_window重建历史）"""
+        self.partial_history = deque(maxlen=self.partial_stability_window)
+        self.partial_stable = ""
+
+    def get_partial_stats(self):
+        """获取部分结果的稳定前缀统计：回调次数、回退次数，以及增量更新相对整句重绘处理的字符比例"""
+        full = self.partial_full_chars
+        return {
+            "callbacks": self.partial_callbacks,
+            "rollbacks": self.partial_rollbacks,
+            "full_chars": full,
+            "incremental_chars": self.partial_incremental_chars,
+            "incremental_ratio": round(self.partial_incremental_chars / full, 3) if full else 0.0,
+        }
+
+    def _finalize_sentence(self, raw_text):
+        """
+        句子结束：标点恢复后输出最终结果
+
+        标点线程运行时只把原文交给标点线程后立即返回，由输出线程按句子顺序回调；
+        否则在当前线程中同步完成标点恢复。
+        """
+        self._reset_partial_stability()
+        if self.use_punc and self.punc_model is not None and raw_text:
+            utterance = self.current_utterance or self._begin_utterance(self.last_capture_time)
+            if self.punc_executor is not None:
+                utterance["last_sample_time"] = self.last_capture_time
+                self.current_utterance = None  # 下一句可以立即开始，不等待标点恢复
+                job = {
+                    "owner": self,  # 多路识别时标点线程可能由其他会话提交的任务处理，统计记入本会话
+                    "utterance": utterance,
+                    "raw_text": raw_text,
+                    "submit_time": time.perf_counter(),
+                    "done": threading.Event(),
+                    "expired": False,
+                    "text": raw_text,
+                }
+                self.punc_pending.append(job)
+                self.punc_output_queue.put(job)
+                self.punc_executor.submit(self._run_punc_batch)
+                return
+            text = self._punctuate(raw_text, utterance)  # 标点失败时返回原文
+        else:
+            text = raw_text
+        self._deliver_text(text, text, True)
+
+    def _start_punc_worker(self, executor=None, pending=None):
+        """
+        启动标点恢复线程和按顺序输出结果的线程
+
+        多路识别时各路传入同一个执行器和待处理队列，积压的句子跨路合并成一次标点恢复调用。
+        """
+        if not self.async_punc or self.punc_model is None or self.punc_executor is not None:
+            return
+        if executor is None:
+            self.punc_pending.clear()
+            executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="punc")
+            self._owns_punc_executor = True
+        else:
+            self.punc_pending = pending
+            self._owns_punc_executor = False
+        self.punc_executor = executor
+        self.punc_output_thread = threading.Thread(target=self._punc_output_loop)
+        self.punc_output_thread.daemon = True
+        self.punc_output_thread.start()
+
+    def _stop_punc_worker(self):
+        """输出所有已交给标点线程的句子后停止标点线程"""
+        if self.punc_executor is None:
+            return
+        self.punc_output_queue.put(None)
+        # 每句最多等待到各自的截止时间，整体不会超过一个截止时长太多
+        self.punc_output_thread.join(timeout=self.punc_deadline_seconds + 1)
+        if self.punc_output_thread.is_alive():
+            print("警告: 标点输出线程超时未结束。")
+        if self._owns_punc_executor:
+            self.punc_executor.shutdown(wait=False)
+        self.punc_executor = None
+        self.punc_output_thread = None
+
+    def _punc_output_loop(self):
+        """
+        按交付顺序回调：等待标点结果，超过截止时间时输出原文；
+        处理线程排入的部分结果和无需标点的句子按原顺序输出，不会跑到前一句的最终结果之前
+        """
+        while True:
+            job = self.punc_output_queue.get()
+            if job is None:
+                break
+            if "done" in job:  # 交给标点线程的句子
+                remaining = job["submit_time"] + self.punc_deadline_seconds - time.perf_counter()
+                if job["done"].wait(timeout=max(0.0, remaining)):
+                    text = job["text"]
                 else:
-                    # 不使用VAD时，总是处于"说话"状态
-                    if len(self.speech_buffer) > 0 and self.current_segment_start_time is None:
-                        self.current_segment_start_time = time.time()  # Start timing if buffer has data
-                    self.is_speaking = True
-
-                # 如果语音缓冲区足够大，进行ASR处理
-                if len(self.speech_buffer) >= self.asr_chunk_samples:
-                    self.process_asr_buffer()
-                    audio_chunk_processed_this_loop = True
-
-                # Max segment duration check (only if speaking or if no VAD and buffer exists)
-                if self.is_speaking and self.current_segment_start_time is not None:
-                    current_time = time.time()
-                    segment_duration = current_time - self.current_segment_start_time
-                    # Also consider time since last forced segment to avoid rapid successive forced cuts
-                    time_since_last_force = current_time - self.last_forced_segment_time
-
-                    if segment_duration > self.max_segment_duration_seconds and time_since_last_force > self.max_segment_duration_seconds / 2.0:  # Ensure not too close forced cuts
-                        print(
-                            f"\n片段达到最大时长 ({segment_duration:.2f}s > {self.max_segment_duration_seconds}s)，强制结束当前片段...")
-                        if len(self.speech_buffer) > 0:
-                            self.process_asr_buffer(is_final=True)  # Process current buffer as final
-                        # Reset timing for the *next* segment, which starts now conceptually
-                        self.current_segment_start_time = time.time()
-                        self.last_forced_segment_time = current_time
-                        # 重置静音状态
-                        self.is_in_silence = False
-                        self.silence_start_time = None
-                        self.speaking_volume = 0.0  # 重置说话音量
-                        # If using VAD, is_speaking might still be true. We don't reset it here,
-                        # VAD should eventually detect silence or another forced cut will occur.
-                        # If not using VAD, this effectively restarts the segment timer.
+                    job["expired"] = True  # 尚未开始处理时不再占用标点线程
+                    self.punc_timeouts += 1
+                    print(f"标点恢复超时（>{self.punc_deadline_seconds:.1f}s），输出原文: {job['raw_text']}")
+                    text = job["raw_text"]
+                segment, full_sentence, is_sentence_end, partial = text, text, True, None
+            else:
+                segment, full_sentence, is_sentence_end, partial = job["text"]
+            try:
+                self._emit_text(segment, full_sentence, is_sentence_end, utterance=job["utterance"], partial=partial)
+            except Exception as e:
+                print(f"文本输出回调出错: {e}")
+            if is_sentence_end:
+                self.complete_transcript += full_sentence + (" " if full_sentence else "")
 
-                if not audio_chunk_processed_this_loop:
-                    time.sleep(0.01)  # Sleep if no audio was processed in this loop iteration
-            except queue.Empty:
-                if self.running:  # Only sleep if running and queue is empty
-                    time.sleep(0.01)
+    def _deliver_text(self, segment, full_sentence, is_sentence_end, partial=None):
+        """
+        在处理线程中输出文本
+
+        输出线程运行时排入punc_output_queue，排在已交给标点线程的句子之后由输出线程回调，
+        保证第N句的最终结果先于第N+1句的部分结果；否则直接回调。
+        """
+        if self.punc_output_thread is None:
+            self._emit_text(segment, full_sentence, is_sentence_end, partial=partial)
+            if is_sentence_end:
+                self.complete_transcript += full_sentence + (" " if full_sentence else "")
+            return
+        utterance = self.current_utterance or self._begin_utterance(self.last_capture_time)
+        if is_sentence_end:
+            utterance["last_sample_time"] = self.last_capture_time
+            self.current_utterance = None
+        self.punc_output_queue.put({"utterance": utterance,
+                                    "text": (segment, full_sentence, is_sentence_end, partial)})
+
+    def _emit_text(self, segment, full_sentence, is_sentence_end, utterance=None, partial=None):
+        """
+        调用文本输出回调并记录延迟
+
+        回调参数：当前处理好的片段，完整的当前句子，是否句子结束；
+        callback_metadata为True时额外传入metadata（本句的时间戳记录）；
+        callback_partial_stability为True时额外传入stable、unstable、delta（见_stabilize_partial），
+        句子结束时stable为最终文本、unstable为空、delta为None（以最终文本替换本句）。
+        utterance为已交给标点线程的句子记录，默认为当前句子。
+        partial为部分结果的 (stable, unstable, delta)。
+        """
+        now = self.clock()
+        if utterance is None:
+            utterance = self.current_utterance or self._begin_utterance(self.last_capture_time)
+        if is_sentence_end:
+            if utterance["last_sample_time"] is None:
+                utterance["last_sample_time"] = self.last_capture_time
+            utterance["emit_time"] = now
+            self._record_latency("final_emit", now - utterance["last_sample_time"])
+            self._record_latency("utterance_total", now - utterance["first_sample_time"])
+            with self.stats_lock:
+                self.utterance_history.append(utterance)
+                self.completed_utterance_count += 1
+            if self.current_utterance is utterance:
+                self.current_utterance = None
+        elif utterance["first_partial_time"] is None:
+            utterance["first_partial_time"] = now
+            self._record_latency("first_partial", now - utterance["first_sample_time"])
+
+        if self.text_output_callback:
+            kwargs = {}
+            if self.callback_metadata:
+                kwargs["metadata"] = dict(utterance)
+            if self.callback_partial_stability:
+                stable, unstable, delta = partial if partial is not None else (full_sentence, "", None)
+                kwargs.update(stable=stable, unstable=unstable, delta=delta)
+            self.text_output_callback(segment, full_sentence, is_sentence_end, **kwargs)
+
+    def get_latency_stats(self):
+        """
+        获取延迟统计
+
+        指标（秒）：
+        - vad_detect: 首个样本采集 -> VAD报告语音开始
+        - first_partial: 首个样本采集 -> 第一次实时结果回调
+        - asr_generate: 每次asr_model.generate耗时
+        - final_decode: is_final解码耗时
+        - punc: 标点恢复耗时
+        - final_emit: 最后一个样本采集 -> 最终结果回调
+        - utterance_total: 首个样本采集 -> 最终结果回调
+
+        返回:
+            dict: utterances（已完成句数）和metrics（每项的count/mean/p50/p95/p99/max，单位毫秒）
+        """
+        with self.stats_lock:
+            latency_samples = {name: list(samples) for name, samples in self.latency_samples.items()}
+            completed = self.completed_utterance_count
+        metrics = {}
+        for name, samples in latency_samples.items():
+            if not samples:
                 continue
-            except Exception as e:
-                print(f"\n音频处理错误: {e}")
-                if not self.running: break
-                time.sleep(0.1)  # Avoid busy loop on other errors
+            values = np.asarray(samples, dtype=np.float64) * 1000
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            metrics[name] = {
+                "count": len(values),
+                "mean_ms": float(values.mean()),
+                "p50_ms": float(p50),
+                "p95_ms": float(p95),
+                "p99_ms": float(p99),
+                "max_ms": float(values.max()),
+            }
+        return {"utterances": completed, "metrics": metrics,
+                "threads": self.get_thread_settings(), "punc_timeouts": self.punc_timeouts,
+                "punc_batches": self.get_punc_batch_stats(), "vad_gate": self.get_vad_gate_stats(),
+                "capture": self.get_capture_stats(), "audio_queue": self.get_audio_queue_stats(),
+                "asr_chunks": self.get_asr_chunk_stats(), "partials": self.get_partial_stats()}
+
+    def reset_latency_stats(self):
+        """清空延迟统计（比较不同配置时在两次运行之间调用）"""
+        with self.stats_lock:
+            self.latency_samples = {}
+            self.utterance_history.clear()
+            self.completed_utterance_count = 0
+        self.asr_chunk_switches.clear()
+        self.partial_callbacks = self.partial_rollbacks = 0
+        self.partial_full_chars = self.partial_incremental_chars = 0
+
+    def get_capture_stats(self):
+        """获取采集配置，以及采集中心的每秒回调次数和队列操作次数（通过采集中心采集时）"""
+        stats = {
+            "profile": self.capture_profile,
+            "blocksize": self.capture_blocksize,
+            "latency": self.capture_latency,
+            "dtype": self.capture_dtype,
+        }
+        if self.capture_hub is not None:
+            stats["hub"] = self.capture_hub.get_stats()
+        return stats
+
+    def get_audio_queue_stats(self):
+        """
+        获取音频队列统计：当前积压（秒）、最高水位、丢弃/合并的块数和过载策略
+
+        pipeline_lag_seconds在队列积压之外还包括已取出、尚未经过VAD/ASR的音频
+        """
+        stats = self.audio_queue.get_stats()
+        buffered = len(self.vad_buffer) + len(self.speech_buffer)
+        stats["pipeline_lag_seconds"] = round(stats["lag_seconds"] + buffered / self.sample_rate, 3)
+        return stats
+
+    def get_vad_gate_stats(self):
+        """获取VAD预门限统计：跳过的推理次数和按平均推理耗时估算节省的CPU时间"""
+        total = self.vad_calls + self.vad_gate_skipped
+        mean_call = self.vad_call_seconds / self.vad_calls if self.vad_calls else 0.0
+        return {
+            "calls": self.vad_calls,
+            "skipped": self.vad_gate_skipped,
+            "skip_ratio": round(self.vad_gate_skipped / total, 4) if total else 0.0,
+            "cpu_saved_seconds": round(self.vad_gate_skipped * mean_call, 3),
+            "noise_floor": self.vad_noise_floor,
+        }
+
+    def get_punc_batch_stats(self):
+        """获取标点恢复的批大小分布和吞吐量（句/秒）"""
+        with self.stats_lock:
+            sizes = dict(self.punc_batch_sizes)
+            total_seconds = self.punc_total_seconds
+        calls = sum(sizes.values())
+        segments = sum(size * count for size, count in sizes.items())
+        return {
+            "sizes": dict(sorted(sizes.items())),
+            "calls": calls,
+            "segments": segments,
+            "fallbacks": self.punc_batch_fallbacks,
+            "segments_per_second": round(segments / total_seconds, 2) if total_seconds > 0 else 0.0,
+        }
+
+    def get_thread_settings(self):
+        """获取生效的线程设置"""
+        settings = {
+            "backend": self.backend,
+            "cpu_count": os.cpu_count(),
+            "intra_op": {kind: self.thread_budget[kind] for kind in ("asr", "vad", "punc")},
+        }
+        if self.backend == "torch":
+            import torch
+            settings["interop"] = torch.get_num_interop_threads()
+        return settings
 
     def process_asr_buffer(self, is_final=False):
         """处理语音缓冲区进行ASR识别"""
@@ -436,13 +2475,7 @@ class FastLoadASR:
                 if self.current_sentence_transcript and self.text_output_callback:
                     print(f"ASR Final (empty buffer, pending sentence): {self.current_sentence_transcript}")
                     # Force punctuation on this pending sentence if is_final and punc enabled
-                    final_text_to_send = self.current_sentence_transcript
-                    if self.use_punc and self.punc_model is not None:
-                        punc_res = self.punc_model.generate(input=self.current_sentence_transcript)
-                        if punc_res and punc_res[0]["text"]:
-                            final_text_to_send = punc_res[0]["text"]
-                    self.text_output_callback(final_text_to_send, final_text_to_send, True)
-                    self.complete_transcript += final_text_to_send + " "
+                    self._finalize_sentence(self.current_sentence_transcript)
                 self.current_sentence_transcript = ""  # Always reset on final with empty buffer
                 self.asr_cache = {}  # Reset ASR cache on final segment
                 return
@@ -451,16 +2484,17 @@ class FastLoadASR:
                 return
 
             # 如果不是最终处理，提取一个ASR块
+            # （consume返回环形缓冲区的视图，在下一次写入前同步使用，无需拷贝）
             if not is_final:
-                asr_chunk = self.speech_buffer[:self.asr_chunk_samples]
-                self.speech_buffer = self.speech_buffer[self.asr_chunk_samples:]
+                asr_chunk = self.speech_buffer.consume(self.asr_chunk_samples)
             else:
                 # 如果是最终处理，使用整个缓冲区
-                asr_chunk = self.speech_buffer
-                self.speech_buffer = np.array([], dtype=np.float32)
+                asr_chunk = self.speech_buffer.consume()
 
             # 使用ASR模型处理
             if len(asr_chunk) > 0:
+                asr_start = self.clock()
+                asr_timer = time.perf_counter()  # 计算耗时使用真实计时器，不受注入时钟影响
                 asr_res = self.asr_model.generate(
                     input=asr_chunk,
                     cache=self.asr_cache,
@@ -469,6 +2503,10 @@ class FastLoadASR:
                     encoder_chunk_look_back=self.encoder_chunk_look_back,
                     decoder_chunk_look_back=self.decoder_chunk_look_back
                 )
+                asr_duration = time.perf_counter() - asr_timer
+                self._record_asr_call(asr_start, asr_duration, is_final)
+                if self.adaptive_asr_chunks:
+                    self._update_asr_chunk_size(len(asr_chunk), asr_duration)
 
                 # 如果有识别结果，处理并应用标点
                 if asr_res and asr_res[0]["text"]:
@@ -483,55 +2521,36 @@ class FastLoadASR:
                         # 或者如果asr_res表明这是一个完整的句子结束点 (FunASR的流式模型可能不会明确给这个信息)
                         # 这里简化处理：is_final 才用标点，或者当检测到语音结束时 (VAD驱动的is_final)
                         full_input_for_punc = self.current_sentence_transcript + segment_text
-                        punc_res = self.punc_model.generate(input=full_input_for_punc)
-                        if punc_res and punc_res[0]["text"]:
-                            final_text_segment = punc_res[0]["text"]
-                            if self.text_output_callback:
-                                # 回调参数：当前处理好的片段，完整的当前句子，是否句子结束
-                                self.text_output_callback(final_text_segment, final_text_segment, True)
-                            self.complete_transcript += final_text_segment + (" " if final_text_segment else "")
-                            self.current_sentence_transcript = ""  # 重置当前句子
-                        else:
-                            # 标点失败，回退到无标点文本
-                            final_text_segment = full_input_for_punc
-                            if self.text_output_callback:
-                                self.text_output_callback(final_text_segment, final_text_segment, True)
-                            self.complete_transcript += final_text_segment + (" " if final_text_segment else "")
-                            self.current_sentence_transcript = ""  # 重置当前句子
+                        # 交给标点恢复后回调（标点失败时回退到无标点文本）
+                        self._finalize_sentence(full_input_for_punc)
+                        self.current_sentence_transcript = ""  # 重置当前句子
                     elif not is_final:
                         # 非最终块，累积到 current_sentence_transcript
                         self.current_sentence_transcript += segment_text
-                        if self.text_output_callback:  # 实时反馈（可能是未标点的）
-                            self.text_output_callback(segment_text, self.current_sentence_transcript, False)
+                        # 实时反馈（可能是未标点的），附带稳定前缀和新增的稳定文本
+                        partial = self._stabilize_partial(self.current_sentence_transcript)
+                        self._deliver_text(segment_text, self.current_sentence_transcript, False, partial=partial)
                     else:  # is_final and no punctuation
-                        final_text_segment = self.current_sentence_transcript + segment_text
-                        if self.text_output_callback:
-                            self.text_output_callback(final_text_segment, final_text_segment, True)
-                        self.complete_transcript += final_text_segment + (" " if final_text_segment else "")
+                        self._finalize_sentence(self.current_sentence_transcript + segment_text)
                         self.current_sentence_transcript = ""
 
             elif is_final and self.current_sentence_transcript:  # 如果asr_chunk为空，但is_final且有累积的句子
                 # 这通常发生在VAD检测到语音结束，且speech_buffer中剩余部分不足一个asr_chunk_samples
                 # 或者asr_chunk处理后没有新文本，但仍需处理累积的句子
-                if self.use_punc and self.punc_model is not None:
-                    punc_res = self.punc_model.generate(input=self.current_sentence_transcript)
-                    if punc_res and punc_res[0]["text"]:
-                        final_text_segment = punc_res[0]["text"]
-                    else:
-                        final_text_segment = self.current_sentence_transcript  # 标点失败
-                else:
-                    final_text_segment = self.current_sentence_transcript
-
-                if self.text_output_callback:
-                    self.text_output_callback(final_text_segment, final_text_segment, True)
-                self.complete_transcript += final_text_segment + (" " if final_text_segment else "")
+                self._finalize_sentence(self.current_sentence_transcript)
                 self.current_sentence_transcript = ""
 
         except Exception as e:
             print(f"\nASR处理错误: {e}")
 
-    def start(self):
-        """开始录音和识别过程"""
+    def start(self, open_stream=True, background=True):
+        """
+        开始录音和识别过程
+
+        参数:
+            open_stream: 是否打开麦克风音频流（回放测试时由调用方通过audio_callback送入音频）
+            background: 是否启动后台处理线程；为False时由调用方调用process_queued_audio驱动处理
+        """
         if self.running:
             print("已经在运行中。")
             return
@@ -541,7 +2560,14 @@ class FastLoadASR:
         self.complete_transcript = ""
         self.current_sentence_transcript = ""
         self.raw_transcript = ""
-        self.speech_buffer = np.array([], dtype=np.float32)
+        self.speech_buffer.clear()
+        self.vad_buffer.clear()
+        self.audio_accumulator.clear()
+        self.last_audio_time = self.clock()
+        self.last_chunk_seconds = 0.0
+        self.processed_samples = 0
+        self.current_utterance = None
+        self._reset_partial_stability()
         self.last_forced_segment_time = 0  # 重置强制分段时间
         self.current_segment_start_time = None  # 重置当前片段开始时间
 
@@ -552,6 +2578,13 @@ class FastLoadASR:
         self.last_audio_volume = 0.0  # 重置音量跟踪
         self.speaking_volume = 0.0
 
+        # 重置VAD预门限状态，噪声底按本次会话开头的音频重新初始化（设备或环境可能已改变）
+        self.vad_noise_floor = None
+        self.vad_gate_seed_rms = []
+        self.vad_gate_quiet_chunks = 0
+        self.vad_gate_skipping = False
+        self.vad_gate_preroll.clear()
+
         # 确保所有模型都已加载
         if not self.ensure_asr_model_loaded():
             print("ASR模型加载失败，无法启动。")
@@ -568,70 +2601,67 @@ class FastLoadASR:
                 self.running = False
                 return
 
-        # 清空音频队列
-        while not self.audio_queue.empty():
-            self.audio_queue.get_nowait()
+        if self.warmup_enabled and not self.warmed_up:
+            self.warmup()
+
+        # 音频来源：采集中心的订阅队列，或由调用方通过audio_callback送入
+        if open_stream:
+            if self.capture_hub is None:
+                self.capture_hub = AudioCaptureHub(self.sample_rate, device=self.input_device_index, clock=self.clock,
+                                                   dtype=self.capture_dtype, blocksize=self.capture_blocksize,
+                                                   latency=self.capture_latency)
+                self._owns_capture_hub = True
+            policy = self.audio_queue_policy
+            if policy == "block":
+                print("采集回调中不能阻塞，音频队列改用drop_non_speech策略。")
+                policy = "drop_non_speech"
+            self.audio_subscription = self.capture_hub.subscribe("asr", maxsize=0, policy=policy,
+                                                                 max_seconds=self.audio_queue_max_seconds)
+            self.audio_queue = self.audio_subscription.queue
+        else:
+            self.audio_queue = self._new_audio_queue()
 
         # 启动音频处理线程
-        self.process_thread = threading.Thread(target=self.process_audio_thread)
-        self.process_thread.daemon = True
-        self.process_thread.start()
+        if background:
+            self._start_punc_worker()
+            self.process_thread = threading.Thread(target=self.process_audio_thread)
+            self.process_thread.daemon = True
+            self.process_thread.start()
+
+        if not open_stream:
+            print("系统已启动（未打开音频流，等待外部送入音频）。")
+            return
 
-        # 打开音频流
-        try:
-            print(f"尝试打开音频流 (设备索引: {self.input_device_index})...")
-            self.stream = sd.InputStream(
-                callback=self.audio_callback,
-                channels=1,
-                samplerate=self.sample_rate,
-                dtype='float32',
-                device=self.input_device_index  # 使用指定的设备索引
-            )
-            self.stream.start()
-            print("音频流已成功打开并开始。")
-        except Exception as e:
-            print(f"打开音频流失败: {e}")
-            print("请检查您的麦克风是否连接并配置正确。")
-            # 尝试使用默认设备（如果之前指定了设备）
-            if self.input_device_index is not None:
-                print("尝试使用默认输入设备...")
-                try:
-                    self.stream = sd.InputStream(
-                        callback=self.audio_callback,
-                        channels=1,
-                        samplerate=self.sample_rate,
-                        dtype='float32',
-                        device=None  # 使用默认设备
-                    )
-                    self.stream.start()
-                    print("音频流已使用默认设备成功打开并开始。")
-                    # 更新 self.input_device_index 以反映实际使用的设备 (或者标记为默认)
-                    # self.input_device_index = None # 或一个特殊值代表默认
-                except Exception as e_default:
-                    print(f"使用默认设备打开音频流仍失败: {e_default}")
-                    self.running = False
-                    return
-            else:  # 如果一开始就没指定设备且失败了
-                self.running = False
-                return
+        if not self.capture_hub.start():
+            self.running = False
+            self._release_capture()
+            self._wake_processing_thread()
+            return
 
         print("系统已启动。按回车键停止。")  # 与原始脚本行为一致
 
+    def _release_capture(self):
+        """取消ASR对采集中心的订阅，自己创建的采集中心同时关闭"""
+        if self.audio_subscription is not None:
+            self.capture_hub.unsubscribe(self.audio_subscription)
+            self.audio_subscription = None
+        if self._owns_capture_hub:
+            self.capture_hub.stop()
+            self.capture_hub = None
+            self._owns_capture_hub = False
+
+    def _wake_processing_thread(self):
+        """唤醒阻塞等待音频的处理线程，以及在"block"策略下等待队列空位的生产者"""
+        self.audio_queue.close()
+        self.audio_queue.put_nowait(None)
+
     def stop(self):
         """停止录音和识别"""
         print("正在停止录音和识别...")
         self.running = False
-
-        # 停止音频流
-        if hasattr(self, 'stream') and self.stream:
-            try:
-                if not self.stream.stopped:
-                    self.stream.stop()
-                self.stream.close()
-                print("录音设备已停止并关闭。")
-            except Exception as e:
-                print(f"停止或关闭录音设备时出错: {e}")
-            del self.stream
+        # 取消订阅（自己创建的采集中心同时关闭音频流）
+        self._release_capture()
+        self._wake_processing_thread()
 
         # 等待音频处理线程结束
         if hasattr(self, 'process_thread') and self.process_thread.is_alive():
@@ -642,12 +2672,18 @@ class FastLoadASR:
 
         # 处理剩余的音频数据 (确保最后一块被处理)
         print("处理任何剩余的音频数据...")
-        if len(self.speech_buffer) > 0 or self.current_sentence_transcript:
-            self.process_asr_buffer(is_final=True)
+        self.flush()
+        self._stop_punc_worker()
 
         # 清理资源 (模型可以不清，以便下次快速启动，但缓存需要)
         self.vad_cache = {}
         self.asr_cache = {}
+        # 下次启动从低延迟的块开始
+        self.asr_chunk_level = 0
+        self.asr_chunk_duration_ms = self.asr_chunk_base_ms
+        self.asr_chunk_samples = int(self.sample_rate * self.asr_chunk_duration_ms / 1000)
+        self.asr_rtf_samples.clear()
+        self.asr_calls_since_switch = 0
         # 重置动态静音检测状态
         self.is_in_silence = False
         self.silence_start_time = None
@@ -655,8 +2691,263 @@ class FastLoadASR:
         self.speaking_volume = 0.0
         print("FunASR已停止。")
 
+    def flush(self):
+        """对剩余的语音缓冲区做最终解码，输出最后一句（多路识别时在共享模型的锁内调用）"""
+        if len(self.speech_buffer) > 0 or self.current_sentence_transcript:
+            self.process_asr_buffer(is_final=True)
+
+    def read_audio_blocks(self, path, block_seconds=None):
+        """
+        分块读取音频文件，转换为16kHz单声道float32
+
+        参数:
+            path: 音频文件路径
+            block_seconds: 块长度（秒），默认offline_block_seconds
+
+        返回:
+            生成器，每次产出一个音频块
+        """
+        import soundfile as sf  # 仅离线转写需要
+
+        info = sf.info(path)
+        blocksize = int(info.samplerate * (block_seconds or self.offline_block_seconds))
+        for block in sf.blocks(path, blocksize=blocksize, dtype='float32', always_2d=True):
+            block = block.mean(axis=1) if block.shape[1] > 1 else block[:, 0]
+            if info.samplerate != self.sample_rate:
+                from scipy.signal import resample_poly
+                from math import gcd
+                g = gcd(self.sample_rate, info.samplerate)
+                block = resample_poly(block, self.sample_rate // g, info.samplerate // g).astype(np.float32)
+            yield block
+
+    def _vad_segments_from_file(self, path, file_info=None):
+        """
+        分块读取音频并用fsmn-vad（流式模式，独立缓存）切分语音片段，VAD结束一个片段时即切出其音频
+
+        滚动缓冲区只保留最早未结束片段起点之后的音频；没有未结束的片段时保留最近
+        offline_vad_lookback_seconds的音频（VAD报告的语音起点早于当前块），内存占用与文件长度无关。
+
+        参数:
+            path: 音频文件路径
+            file_info: 可选dict，读取结束后写入samples（文件总样本数）
+
+        返回:
+            生成器，依次产出 (起始样本, 结束样本, 片段音频)
+        """
+        blocks = deque()  # 滚动缓冲区：(块的起始样本, 音频块)
+        vad_cache = {}
+        open_start_ms = None
+        total_samples = 0
+        lookback_samples = int(self.offline_vad_lookback_seconds * self.sample_rate)
+
+        def cut(beg_ms, end_ms):
+            beg = max(0, int(beg_ms * self.sample_rate / 1000))
+            end = min(total_samples, int(end_ms * self.sample_rate / 1000))
+            buffer_start = blocks[0][0] if blocks else total_samples
+            if beg < buffer_start:
+                print(f"警告: VAD片段起点 {beg_ms}ms 早于缓冲区，从 {buffer_start * 1000 // self.sample_rate}ms 开始截取")
+                beg = buffer_start
+            if end <= beg:
+                return None
+            parts = [block[max(beg - start, 0):end - start] for start, block in blocks
+                     if start < end and start + len(block) > beg]
+            return beg, end, np.concatenate(parts)
+
+        block_iter = self.read_audio_blocks(path)
+        block = next(block_iter, None)
+        while block is not None:
+            next_block = next(block_iter, None)
+            blocks.append((total_samples, block))
+            total_samples += len(block)
+            vad_res = self.vad_model.generate(
+                input=block,
+                cache=vad_cache,
+                is_final=next_block is None,
+                chunk_size=int(len(block) * 1000 / self.sample_rate)
+            )
+            # 流式VAD结果（毫秒）：[开始, -1] 语音开始；[-1, 结束] 语音结束；[开始, 结束] 完整片段
+            closed = []
+            for beg_ms, end_ms in vad_res[0]["value"] if vad_res else []:
+                if beg_ms != -1 and end_ms == -1:
+                    open_start_ms = beg_ms
+                elif beg_ms == -1 and end_ms != -1:
+                    if open_start_ms is not None:
+                        closed.append((open_start_ms, end_ms))
+                    open_start_ms = None
+                else:
+                    closed.append((beg_ms, end_ms))
+                    open_start_ms = None
+            for beg_ms, end_ms in closed:
+                segment = cut(beg_ms, end_ms)
+                if segment is not None:
+                    yield segment
+
+            # 丢弃不再需要的块
+            if open_start_ms is not None:
+                keep_from = min(int(open_start_ms * self.sample_rate / 1000), total_samples - lookback_samples)
+            else:
+                keep_from = total_samples - lookback_samples
+            while blocks and blocks[0][0] + len(blocks[0][1]) <= keep_from:
+                blocks.popleft()
+            block = next_block
+
+        if open_start_ms is not None:  # 文件结束时仍在说话
+            segment = cut(open_start_ms, total_samples * 1000 // self.sample_rate)
+            if segment is not None:
+                yield segment
+        if file_info is not None:
+            file_info["samples"] = total_samples
+
+    def _recognize_segment_batch(self, segment_audios):
+        """对一批VAD片段进行识别，返回每个片段的文本"""
+        if self.offline_asr_model is not None:
+            res = self.offline_asr_model.generate(input=segment_audios, batch_size=len(segment_audios))
+            return [r.get("text", "") for r in res]
+
+        # 回退：流式模型以整段为单位识别（独立缓存，is_final=True），不再按600ms步进
+        texts = []
+        for segment_audio in segment_audios:
+            res = self.asr_model.generate(
+                input=segment_audio,
+                cache={},
+                is_final=True,
+                chunk_size=self.asr_chunk_size,
+                encoder_chunk_look_back=self.encoder_chunk_look_back,
+                decoder_chunk_look_back=self.decoder_chunk_look_back
+            )
+            texts.append(res[0]["text"] if res else "")
+        return texts
+
+    def transcribe_file(self, path):
+        """
+        离线转写单个音频文件（快于实时）
+
+        流程：分块读取 -> fsmn-vad切分语音片段 -> 按批识别 -> 标点恢复
+
+        参数:
+            path: 音频文件路径（soundfile支持的格式）
+
+        返回:
+            dict: path, text, segments(每段的start/end秒和text), duration, elapsed, rtf
+        """
+        if not self._load_model_with_retry("vad", self.vad_model_name):
+            raise RuntimeError(f"VAD模型加载失败: {self.model_load_errors.get('vad')}")
+        if not self.load_offline_asr_model_if_needed() and not self.ensure_asr_model_loaded():
+            raise RuntimeError("ASR模型加载失败，无法转写")
+        self.load_punc_model_if_needed()
+
+        start_time = time.perf_counter()
+        segments = []
+        max_batch_samples = int(self.offline_batch_size_s * self.sample_rate)
+
+        def recognize(batch):
+            texts = self._recognize_segment_batch([audio for _, _, audio in batch])
+            for (beg, end, _), text in zip(batch, texts):
+                if self.use_punc and self.punc_model is not None and text:
+                    punc_res = self.punc_model.generate(input=text)
+                    if punc_res and punc_res[0]["text"]:
+                        text = punc_res[0]["text"]
+                if text:
+                    segments.append({
+                        "start": round(beg / self.sample_rate, 3),
+                        "end": round(end / self.sample_rate, 3),
+                        "text": text
+                    })
+
+        # VAD片段按总时长分批，一批凑满即识别，只保留当前批的片段音频
+        file_info = {}
+        current_batch = []
+        current_batch_samples = 0
+        for beg, end, audio in self._vad_segments_from_file(path, file_info):
+            if current_batch and current_batch_samples + (end - beg) > max_batch_samples:
+                recognize(current_batch)
+                current_batch = []
+                current_batch_samples = 0
+            current_batch.append((beg, end, audio))
+            current_batch_samples += end - beg
+        if current_batch:
+            recognize(current_batch)
+        duration = file_info.get("samples", 0) / self.sample_rate
+
+        elapsed = time.perf_counter() - start_time
+        rtf = elapsed / duration if duration > 0 else 0.0
+        print(f"转写完成: {path} (时长 {duration:.1f}s, 耗时 {elapsed:.1f}s, RTF {rtf:.3f}, {len(segments)} 个片段)")
+        return {
+            "path": path,
+            "text": " ".join(segment["text"] for segment in segments),
+            "segments": segments,
+            "duration": duration,
+            "elapsed": elapsed,
+            "rtf": rtf
+        }
+
+    def transcribe_files(self, paths, result_callback=None):
+        """
+        离线转写多个音频文件，模型只加载一次
+
+        参数:
+            paths: 音频文件路径列表
+            result_callback: 每个文件完成后的回调函数，参数为transcribe_file的返回值
+
+        返回:
+            结果列表（失败的文件包含error字段）
+        """
+        results = []
+        for path in paths:
+            try:
+                result = self.transcribe_file(path)
+            except Exception as e:
+                print(f"转写失败: {path}: {e}")
+                result = {"path": path, "error": str(e)}
+            if result_callback:
+                result_callback(result)
+            results.append(result)
+
+        total_duration = sum(r.get("duration", 0.0) for r in results)
+        total_elapsed = sum(r.get("elapsed", 0.0) for r in results)
+        if total_duration > 0:
+            print(f"共转写 {len(results)} 个文件，音频总时长 {total_duration:.1f}s，"
+                  f"耗时 {total_elapsed:.1f}s，总体RTF {total_elapsed / total_duration:.3f}")
+        return results
+
 
 if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="FunASR 实时/离线语音识别")
+    parser.add_argument("files", nargs="*", help="离线转写的音频文件；不指定时进入实时识别模式")
+    parser.add_argument("--output", help="离线转写结果输出文件（JSONL，每行一个文件）")
+    parser.add_argument("--batch-size-s", type=float, default=60.0, help="每批识别的VAD片段总时长（秒）")
+    parser.add_argument("--no-punc", action="store_true", help="禁用标点恢复")
+    parser.add_argument("--backend", choices=["torch", "onnx"], default="torch", help="推理后端")
+    parser.add_argument("--quantize", choices=["int8"], default=None, help="CPU动态量化")
+    parser.add_argument("--record", help="实时识别时同时把麦克风音频保存为WAV文件")
+    parser.add_argument("--capture-dtype", choices=["float32", "int16"], default="float32", help="实时采集的采样格式")
+    parser.add_argument("--capture-profile", choices=list(FastLoadASR.CAPTURE_PROFILES), default="default",
+                        help="实时采集的块大小/延迟配置")
+    args = parser.parse_args()
+
+    if args.files:
+        asr_system = FastLoadASR(use_vad=True, use_punc=not args.no_punc,
+                                 backend=args.backend, quantize=args.quantize, streaming=False)
+        asr_system.offline_batch_size_s = args.batch_size_s
+        output_file = open(args.output, "a", encoding="utf-8") if args.output else None
+
+        def write_result(result):
+            if output_file:
+                output_file.write(json.dumps(result, ensure_ascii=False) + "\n")
+                output_file.flush()
+            elif "text" in result:
+                print(f"[{result['path']}]: {result['text']}")
+
+        try:
+            asr_system.transcribe_files(args.files, result_callback=write_result)
+        finally:
+            if output_file:
+                output_file.close()
+        raise SystemExit(0)
+
     def demo_callback(segment, full_sentence, is_sentence_end):
         if is_sentence_end:
             print(f"\n[FINAL]: {full_sentence}")
@@ -665,13 +2956,27 @@ if __name__ == "__main__":
             print(f"[REALTIME]: {full_sentence} ...", end='\r')
 
 
+    # ASR和录音共用一个音频流
+    capture_profile = FastLoadASR.CAPTURE_PROFILES[args.capture_profile]
+    capture_hub = AudioCaptureHub(dtype=args.capture_dtype, blocksize=capture_profile["blocksize"],
+                                  latency=capture_profile["latency"])
+    recorder = AudioRecorder(capture_hub, args.record) if args.record else None
+
     # Test with dynamic silence detection (5s max segment duration)
     asr_system = FastLoadASR(use_vad=True, use_punc=True,
                              text_output_callback=demo_callback,
-                             max_segment_duration_seconds=5.0)
+                             max_segment_duration_seconds=5.0,
+                             warmup=True,
+                             backend=args.backend,
+                             quantize=args.quantize,
+                             capture_hub=capture_hub,
+                             capture_dtype=args.capture_dtype,
+                             capture_profile=args.capture_profile)
 
     try:
         print("FunASR 命令行测试 (带回调、动态静音检测和5s强制分段)。按Ctrl+C退出。")
+        if recorder:
+            recorder.start()
         asr_system.start()
         while True:
             time.sleep(0.1)
@@ -680,4 +2985,12 @@ if __name__ == "__main__":
     finally:
         if asr_system.running:
             asr_system.stop()
-        print("程序退出。")
\ No newline at end of file
+        if recorder:
+            recorder.stop()
+        capture_hub.stop()
+        print(f"采集统计: {asr_system.get_capture_stats()}")
+        latency = asr_system.get_latency_stats()["metrics"]
+        for name in ("first_partial", "final_emit", "utterance_total"):
+            if name in latency:
+                print(f"{name}: p50 {latency[name]['p50_ms']:.0f}ms  p95 {latency[name]['p95_ms']:.0f}ms")
+        print("程序退出。")
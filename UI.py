@@ -24,10 +24,11 @@ import numpy as np
 
 # 导入项目模块
 try:
-    from FunASR import FastLoadASR
+    from FunASR import FastLoadASR, AudioCaptureHub
 except ImportError:
     print("警告: FunASR.py 未找到或无法导入。语音识别功能将不可用。")
     FastLoadASR = None
+    AudioCaptureHub = None
 
 try:
     from translation_module import TranslationModule, LANGUAGE_CODES, LANGUAGE_NAMES
@@ -271,6 +272,8 @@ class WorkerSignals(QObject):
     """工作线程信号"""
     log_message = pyqtSignal(str)
     update_recognized_text = pyqtSignal(str, str)  # text, mode
+    update_partial_text = pyqtSignal(str, str)  # 新增的稳定文本, 不稳定尾部
+    replace_partial_text = pyqtSignal(str, str)  # 本句完整文本, 不稳定尾部（稳定前缀被修改时）
     update_translated_text = pyqtSignal(str, str, str)  # time, original, translation
     update_volume = pyqtSignal(float)
     update_status = pyqtSignal(str, str)  # status, color
@@ -661,17 +664,15 @@ class SettingsDialog(QDialog):
 
 
 class VolumeMonitorWorker(QObject):
-    """独立的音量监测线程，直接从麦克风读取音量数据"""
+    """独立的音量监测线程，从共享的音频采集中心读取音量数据"""
     finished = pyqtSignal()
     volume_updated = pyqtSignal(float)
     
-    def __init__(self, input_device_index=None):
+    def __init__(self, capture_hub):
         super().__init__()
-        self.input_device_index = input_device_index
+        self.capture_hub = capture_hub  # 与ASR共用一个音频流
+        self.subscription = None
         self.is_running = False
-        self.stream = None
-        self.sample_rate = 16000
-        self.block_size = 1024
         self.volume_scale = 20.0  # 增加音量放大倍数，使显示更明显
         self.debug_counter = 0  # 用于控制调试信息输出频率
         self.last_volume = 0.0  # 上一次的音量值，用于平滑处理
@@ -679,7 +680,7 @@ class VolumeMonitorWorker(QObject):
         self.noise_floor = 0.005  # 噪声阈值，低于此值视为静音
         
     def start_monitoring(self):
-        """开始音量监测"""
+        """开始音量监测（在监测线程中循环读取订阅队列，直到stop_monitoring）"""
         if self.is_running:
             return
             
@@ -696,52 +697,26 @@ class VolumeMonitorWorker(QObject):
         except Exception as e:
             print(f"无法查询音频设备: {e}")
         
-        try:
-            # 打开音频流
-            print(f"尝试打开音频设备 ID: {self.input_device_index}")
-            self.stream = sd.InputStream(
-                callback=self.audio_callback,
-                channels=1,
-                samplerate=self.sample_rate,
-                blocksize=self.block_size,
-                dtype='float32',
-                device=self.input_device_index
-            )
-            self.stream.start()
-            print(f"音量监测已启动 (设备ID: {self.input_device_index}, 采样率: {self.sample_rate}, 块大小: {self.block_size})")
-            
-            # 获取实际使用的设备信息
-            if hasattr(self.stream, 'device'):
-                actual_device = self.stream.device
-                print(f"实际使用的设备: {actual_device}")
-                
-        except Exception as e:
-            print(f"音量监测启动失败: {e}")
-            # 尝试使用默认设备
+        # 音量表只需要最新的音量，队列很短，处理不过来时丢弃旧数据
+        self.subscription = self.capture_hub.subscribe("volume_meter", maxsize=16)
+        if not self.capture_hub.start():
+            print("音量监测启动失败: 无法打开音频流")
+            self.capture_hub.unsubscribe(self.subscription)
+            self.is_running = False
+            self.finished.emit()
+            return
+        print(f"音量监测已启动 (共享音频流, 设备ID: {self.capture_hub.device}, 采样率: {self.capture_hub.sample_rate})")
+        
+        subscription = self.subscription  # stop_monitoring可能在其他线程中清空self.subscription
+        while self.is_running:
             try:
-                print("尝试使用默认音频设备...")
-                self.stream = sd.InputStream(
-                    callback=self.audio_callback,
-                    channels=1,
-                    samplerate=self.sample_rate,
-                    blocksize=self.block_size,
-                    dtype='float32',
-                    device=None  # 使用默认设备
-                )
-                self.stream.start()
-                print("音量监测已使用默认设备启动")
-                
-                # 获取默认设备信息
-                if hasattr(self.stream, 'device'):
-                    actual_device = self.stream.device
-                    print(f"实际使用的默认设备: {actual_device}")
-            except Exception as e2:
-                print(f"使用默认设备启动音量监测也失败: {e2}")
-                self.is_running = False
-                self.finished.emit()
+                _, chunk = subscription.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            self.process_block(chunk)
             
-    def audio_callback(self, indata, frames, time_info, status):
-        """音频回调函数，计算音量并发送信号"""
+    def process_block(self, indata):
+        """计算一个音频块的音量并发送信号"""
         if not self.is_running:
             return
             
@@ -781,13 +756,10 @@ class VolumeMonitorWorker(QObject):
         """停止音量监测"""
         self.is_running = False
         
-        if self.stream:
-            try:
-                self.stream.stop()
-                self.stream.close()
-                print("音量监测已停止")
-            except Exception as e:
-                print(f"停止音量监测失败: {e}")
+        if self.subscription:
+            self.capture_hub.unsubscribe(self.subscription)
+            print(f"音量监测已停止 (丢弃 {self.subscription.dropped} 块)")
+            self.subscription = None
                 
         self.finished.emit()
 
@@ -850,11 +822,15 @@ class MainWindow(QMainWindow):
         # 音量监测线程
         self.volume_monitor_thread = None
         self.volume_monitor_worker = None
+        self.capture_hub = None  # ASR与音量监测共用的音频采集中心
 
         # 信号
         self.signals = WorkerSignals()
         self.signals.log_message.connect(self.log_message)
         self.signals.update_recognized_text.connect(self.update_recognized_text)
+        self.signals.update_partial_text.connect(self.update_partial_text)
+        self.signals.replace_partial_text.connect(self.replace_partial_text)
+        self.partial_unstable_length = 0  # 识别区末尾当前显示的不稳定文本长度
         self.signals.update_translated_text.connect(self.add_translation_card)
         self.signals.update_volume.connect(self.update_volume_display)
         self.signals.update_status.connect(self.update_status)
@@ -1437,42 +1413,46 @@ class MainWindow(QMainWindow):
     def _init_models_thread(self):
         """在后台线程中初始化模型"""
         try:
-            # 初始化ASR实例
+            # 初始化ASR实例（进程中已加载的模型由model_registry直接复用）
             self.log_message("正在初始化ASR实例...")
+            previous_instance = self.asr_instance
             self.asr_instance = FastLoadASR(
                 use_vad=True,
                 use_punc=True,
                 text_output_callback=self.asr_text_callback,
                 input_device_index=self.selected_input_device_idx,
-                max_segment_duration_seconds=5.0
+                max_segment_duration_seconds=5.0,
+                model_load_progress_callback=self._on_model_load_progress,
+                warmup=True
             )
+            self.asr_instance.callback_partial_stability = True  # 实时结果只增量更新变化的部分
             self.log_message("ASR实例初始化完成")
 
-            # 加载ASR模型
-            self.log_message("正在加载ASR模型...")
-            if self.asr_instance.ensure_asr_model_loaded():
-                self.log_message("ASR模型加载完成")
-
-                if self.asr_instance.use_vad:
-                    self.log_message("正在加载VAD模型...")
-                    self.asr_instance.load_vad_model_if_needed()
-                    self.log_message("VAD模型加载完成")
-
-                if self.asr_instance.use_punc:
-                    self.log_message("正在加载标点模型...")
-                    self.asr_instance.load_punc_model_if_needed()
-                    self.log_message("标点模型加载完成")
-
+            # ASR、VAD和标点模型在后台并行加载，这里等待全部完成
+            loaded = self.asr_instance.ensure_models_loaded()
+            if previous_instance is not None:
+                # 新实例已持有模型引用，释放旧实例不会导致重新加载
+                previous_instance.release_models()
+            if loaded:
                 # 所有模型加载完成
                 QMetaObject.invokeMethod(self, "_on_models_loaded", Qt.QueuedConnection)
             else:
-                self.log_message("ASR模型加载失败")
+                for kind, error in self.asr_instance.model_load_errors.items():
+                    self.log_message(f"{FastLoadASR.MODEL_LABELS.get(kind, kind)}模型加载失败: {error}")
                 QMetaObject.invokeMethod(self, "_on_models_failed", Qt.QueuedConnection)
 
         except Exception as e:
             self.log_message(f"模型初始化错误: {e}")
             QMetaObject.invokeMethod(self, "_on_models_failed", Qt.QueuedConnection)
 
+    def _on_model_load_progress(self, kind, status, detail):
+        """模型加载进度回调（在加载线程中调用）"""
+        label = FastLoadASR.MODEL_LABELS.get(kind, kind)
+        if status == "loading":
+            self.log_message(f"正在加载{label}模型...")
+        elif status == "loaded":
+            self.log_message(f"{label}模型加载完成 ({detail:.1f}s)")
+
     @pyqtSlot()
     def _on_models_loaded(self):
         """模型加载成功的回调"""
@@ -1756,7 +1736,7 @@ class MainWindow(QMainWindow):
             except Exception as e2:
                 self.log_message(f"默认设备也失败: {e2}")
 
-    def asr_text_callback(self, segment, full_sentence, is_sentence_end):
+    def asr_text_callback(self, segment, full_sentence, is_sentence_end, stable=None, unstable=None, delta=None):
         """ASR文本回调"""
         if not self.is_running:
             return
@@ -1766,8 +1746,13 @@ class MainWindow(QMainWindow):
             if full_sentence:
                 self.asr_output_queue.put(full_sentence)
                 self.signals.update_recognized_text.emit(full_sentence + "\n", "append")
+        elif delta is not None:
+            # 实时更新：追加新稳定的文本，只替换不稳定的尾部
+            self.signals.update_partial_text.emit(delta, unstable)
+        elif unstable is not None:
+            # 稳定前缀被修改时整行替换，之后仍按新的不稳定尾部增量更新
+            self.signals.replace_partial_text.emit(full_sentence, unstable)
         else:
-            # 实时更新
             self.signals.update_recognized_text.emit(full_sentence, "update")
 
     def toggle_translation(self):
@@ -1803,9 +1788,16 @@ class MainWindow(QMainWindow):
         self.timer.timeout.connect(self.update_time)
         self.timer.start(1000)
         
+        # ASR和音量监测共用一个音频流
+        self.capture_hub = AudioCaptureHub(device=self.selected_input_device_idx,
+                                           blocksize=self.asr_instance.capture_blocksize,
+                                           latency=self.asr_instance.capture_latency,
+                                           dtype=self.asr_instance.capture_dtype)
+        self.asr_instance.capture_hub = self.capture_hub
+
         # 启动独立的音量监测线程
         self.volume_monitor_thread = QThread()
-        self.volume_monitor_worker = VolumeMonitorWorker(self.selected_input_device_idx)
+        self.volume_monitor_worker = VolumeMonitorWorker(self.capture_hub)
         self.volume_monitor_worker.moveToThread(self.volume_monitor_thread)
         
         # 连接信号
@@ -1895,6 +1887,11 @@ class MainWindow(QMainWindow):
         if self.asr_worker:
             self.asr_worker.stop_asr()
 
+        # 所有订阅者都已退出，关闭共享的音频流
+        if self.capture_hub:
+            self.capture_hub.stop()
+            self.capture_hub = None
+
         # 停止翻译线程
         if self.translation_worker:
             self.translation_worker.stop()
@@ -1926,6 +1923,7 @@ class MainWindow(QMainWindow):
 
     def update_recognized_text(self, text, mode):
         """更新识别文本"""
+        self.partial_unstable_length = 0
         if mode == "append":
             self.transcribe_area.append(text)
         elif mode == "update":
@@ -1936,6 +1934,19 @@ class MainWindow(QMainWindow):
             cursor.removeSelectedText()
             cursor.insertText(text)
 
+    def update_partial_text(self, delta, unstable):
+        """增量更新实时结果：替换末尾的不稳定文本，保留已显示的稳定前缀"""
+        cursor = self.transcribe_area.textCursor()
+        cursor.movePosition(QTextCursor.End)
+        cursor.movePosition(QTextCursor.Left, QTextCursor.KeepAnchor, self.partial_unstable_length)
+        cursor.insertText(delta + unstable)
+        self.partial_unstable_length = len(unstable)
+
+    def replace_partial_text(self, text, unstable):
+        """整行替换实时结果，并记录行末的不稳定文本长度供之后的增量更新使用"""
+        self.update_recognized_text(text, "update")
+        self.partial_unstable_length = len(unstable)
+
     def add_translation_card(self, time_str, original, translation):
         """添加翻译卡片"""
         card = TranslationCard(time_str, original, translation)
@@ -2015,6 +2026,9 @@ class MainWindow(QMainWindow):
         if self.mixer_initialized:
             pygame.mixer.quit()
 
+        if self.asr_instance:
+            self.asr_instance.release_models()
+
         event.accept()
 
     def export_translation_cards(self):
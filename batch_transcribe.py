@@ -0,0 +1,247 @@
+"""
+多进程批量离线转写 - FunASR
+----------------------------
+在 FunASR.py 的离线转写接口之上，把大量录音分发到多个工作进程。
+每个工作进程只加载一次模型（paraformer-zh-streaming、fsmn-vad、ct-punc），
+然后从共享任务队列中取文件转写，结果由主进程统一写入JSONL。
+
+特性：
+- 每个进程复用已加载的模型
+- 断点续传：已成功写入输出文件的音频会被跳过，进度定期写入检查点文件
+- 结束时输出每个工作进程的吞吐量统计
+
+使用方法:
+- python batch_transcribe.py 录音目录 [更多文件或目录] --output results.jsonl [--workers 8]
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import queue
+import time
+
+AUDIO_EXTENSIONS = {".wav", ".flac", ".ogg", ".mp3"}
+
+
+def collect_audio_files(inputs):
+    """展开输入的文件和目录，返回排序后的音频文件列表"""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                for name in files:
+                    if os.path.splitext(name)[1].lower() in AUDIO_EXTENSIONS:
+                        paths.append(os.path.join(root, name))
+        else:
+            paths.append(item)
+    return sorted(set(os.path.abspath(p) for p in paths))
+
+
+def load_completed_paths(output_path):
+    """读取已有的输出文件，返回已成功转写的文件集合（用于断点续传）"""
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # 上次中断时可能写了半行
+            if "error" not in record and "path" in record:
+                completed.add(record["path"])
+    return completed
+
+
+def worker_main(worker_id, task_queue, result_queue, use_punc, threads_per_worker, offline_model):
+    """
+    工作进程入口：加载一次模型，然后循环处理任务队列中的文件
+
+    参数:
+        worker_id: 工作进程编号
+        task_queue: 共享任务队列（None表示结束）
+        result_queue: 结果队列
+        use_punc: 是否使用标点恢复
+        threads_per_worker: 每个进程的torch线程数
+        offline_model: 离线批量识别模型名称，None表示使用流式模型
+    """
+    from FunASR import FastLoadASR
+
+    load_start = time.perf_counter()
+    try:
+        # 各进程已按核数均分线程，进程内的模型不再额外预留核心
+        thread_budget = {"asr": threads_per_worker, "vad": 1, "punc": threads_per_worker}
+        # 使用离线识别模型时不加载流式模型（仅在离线模型加载失败时回退），每个进程只保留一个ASR模型
+        asr_system = FastLoadASR(use_vad=True, use_punc=use_punc, thread_budget=thread_budget,
+                                 streaming=offline_model is None)
+        asr_system.offline_asr_model_name = offline_model
+        if not asr_system.load_offline_asr_model_if_needed() and not asr_system.ensure_asr_model_loaded():
+            raise RuntimeError("ASR模型加载失败")
+        asr_system.load_vad_model_if_needed()
+        asr_system.load_punc_model_if_needed()
+    except Exception as e:
+        result_queue.put(("failed", worker_id, str(e)))
+        return
+    result_queue.put(("ready", worker_id, time.perf_counter() - load_start))
+
+    while True:
+        path = task_queue.get()
+        if path is None:
+            break
+        try:
+            result = asr_system.transcribe_file(path)
+        except Exception as e:
+            result = {"path": path, "error": str(e)}
+        result["worker"] = worker_id
+        result_queue.put(("result", worker_id, result))
+    result_queue.put(("done", worker_id, None))
+
+
+def write_checkpoint(checkpoint_path, state):
+    """原子地写入进度检查点"""
+    tmp_path = checkpoint_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, checkpoint_path)
+
+
+def print_worker_summary(worker_stats):
+    """输出每个工作进程的吞吐量统计"""
+    print("\n===== 工作进程吞吐量 =====")
+    print(f"{'进程':>4} {'加载(s)':>8} {'文件':>6} {'失败':>5} {'音频(s)':>10} {'处理(s)':>9} {'RTF':>7} {'倍速':>7}")
+    for worker_id in sorted(worker_stats):
+        stats = worker_stats[worker_id]
+        rtf = stats["elapsed"] / stats["audio"] if stats["audio"] > 0 else 0.0
+        speed = stats["audio"] / stats["elapsed"] if stats["elapsed"] > 0 else 0.0
+        print(f"{worker_id:>4} {stats['load_time']:>8.1f} {stats['files']:>6} {stats['failed']:>5} "
+              f"{stats['audio']:>10.1f} {stats['elapsed']:>9.1f} {rtf:>7.3f} {speed:>6.1f}x")
+    print("===========================")
+
+
+def run_batch(paths, output_path, workers, use_punc=True, threads_per_worker=1,
+              offline_model=None, checkpoint_every=20):
+    """
+    多进程批量转写
+
+    参数:
+        paths: 音频文件列表
+        output_path: 结果输出文件（JSONL，追加写入）
+        workers: 工作进程数
+        use_punc: 是否使用标点恢复
+        threads_per_worker: 每个进程的torch线程数
+        offline_model: 离线批量识别模型名称，None表示使用流式模型
+        checkpoint_every: 每完成多少个文件写一次检查点
+
+    返回:
+        每个工作进程的统计信息
+    """
+    checkpoint_path = output_path + ".progress.json"
+    completed = load_completed_paths(output_path)
+    pending = [p for p in paths if p not in completed]
+    print(f"共 {len(paths)} 个文件，已完成 {len(completed & set(paths))} 个，待处理 {len(pending)} 个")
+    if not pending:
+        return {}
+
+    workers = max(1, min(workers, len(pending)))
+    ctx = mp.get_context("spawn")
+    task_queue = ctx.Queue()
+    result_queue = ctx.Queue()
+    for path in pending:
+        task_queue.put(path)
+    for _ in range(workers):
+        task_queue.put(None)
+
+    processes = []
+    for worker_id in range(workers):
+        process = ctx.Process(target=worker_main,
+                              args=(worker_id, task_queue, result_queue, use_punc,
+                                    threads_per_worker, offline_model),
+                              daemon=True)
+        process.start()
+        processes.append(process)
+
+    worker_stats = {
+        worker_id: {"load_time": 0.0, "files": 0, "failed": 0, "audio": 0.0, "elapsed": 0.0}
+        for worker_id in range(workers)
+    }
+    finished_workers = set()
+    done_count = 0
+    failed_count = 0
+    start_time = time.time()
+
+    with open(output_path, "a", encoding="utf-8") as output_file:
+        while len(finished_workers) < workers:
+            try:
+                kind, worker_id, payload = result_queue.get(timeout=5.0)
+            except queue.Empty:
+                # 检查是否有进程异常退出
+                for worker_id, process in enumerate(processes):
+                    if worker_id not in finished_workers and not process.is_alive():
+                        print(f"工作进程 {worker_id} 异常退出 (exitcode={process.exitcode})")
+                        finished_workers.add(worker_id)
+                continue
+
+            stats = worker_stats[worker_id]
+            if kind == "ready":
+                stats["load_time"] = payload
+                print(f"工作进程 {worker_id} 模型加载完成 ({payload:.1f}s)")
+            elif kind == "failed":
+                print(f"工作进程 {worker_id} 模型加载失败: {payload}")
+                finished_workers.add(worker_id)
+            elif kind == "done":
+                finished_workers.add(worker_id)
+            elif kind == "result":
+                output_file.write(json.dumps(payload, ensure_ascii=False) + "\n")
+                output_file.flush()
+                done_count += 1
+                if "error" in payload:
+                    stats["failed"] += 1
+                    failed_count += 1
+                else:
+                    stats["files"] += 1
+                    stats["audio"] += payload["duration"]
+                    stats["elapsed"] += payload["elapsed"]
+
+                if done_count % checkpoint_every == 0 or done_count == len(pending):
+                    os.fsync(output_file.fileno())
+                    write_checkpoint(checkpoint_path, {
+                        "total": len(paths),
+                        "completed_before_run": len(completed),
+                        "processed_this_run": done_count,
+                        "failed_this_run": failed_count,
+                        "remaining": len(pending) - done_count,
+                        "elapsed_seconds": round(time.time() - start_time, 1),
+                        "workers": worker_stats
+                    })
+                    print(f"进度: {done_count}/{len(pending)} (失败 {failed_count})")
+
+    for process in processes:
+        process.join(timeout=10)
+
+    print_worker_summary(worker_stats)
+    return worker_stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多进程批量离线转写")
+    parser.add_argument("inputs", nargs="+", help="音频文件或目录")
+    parser.add_argument("--output", required=True, help="结果输出文件（JSONL）；已存在时断点续传")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="工作进程数")
+    parser.add_argument("--threads-per-worker", type=int, default=None,
+                        help="每个进程的torch线程数（默认按CPU核数平均分配）")
+    parser.add_argument("--offline-model", default=None,
+                        help="使用非流式模型批量识别（如 paraformer-zh），默认使用 paraformer-zh-streaming")
+    parser.add_argument("--no-punc", action="store_true", help="禁用标点恢复")
+    parser.add_argument("--checkpoint-every", type=int, default=20, help="每完成多少个文件写一次检查点")
+    args = parser.parse_args()
+
+    threads_per_worker = args.threads_per_worker or max(1, (os.cpu_count() or 1) // args.workers)
+    paths = collect_audio_files(args.inputs)
+    run_batch(paths, args.output, args.workers, use_punc=not args.no_punc,
+              threads_per_worker=threads_per_worker, offline_model=args.offline_model,
+              checkpoint_every=args.checkpoint_every)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,774 @@
+"""
+性能基准测试 - FunASR 实时语音识别
+----------------------------
+针对 FunASR.py 中音频处理路径的微基准测试，用于比较优化前后的性能。
+
+使用方法:
+- python benchmark.py ring_buffer [--seconds 3600] [--stall 0 2 10 20]
+- python benchmark.py silence [--seconds 600] [--stall 0.5]
+- python benchmark.py capture_dtype [--seconds 600] [--block-size 1024]
+- python benchmark.py capture_profile 录音.wav [--speed max|1]
+- python benchmark.py overload 录音.wav [--asr-delay 0.8] [--max-queue 3]
+- python benchmark.py backends 录音.wav [--backends torch onnx]
+- python benchmark.py quantize 测试集.tsv [--backend torch]
+- python benchmark.py threads 录音.wav [--cores 1 2 4 8]
+- python benchmark.py punc_batch [--texts 句子.txt] [--batch-sizes 1 2 4 8]
+- python benchmark.py snapshot [--models paraformer-zh-streaming fsmn-vad ct-punc] [--processes 2]
+- python benchmark.py import_time [--budget-ms 300] [--skip-onnx]（超出预算或导入了重型依赖时退出码为1）
+
+依赖库:
+- numpy
+- funasr / funasr_onnx（模型相关的测试）
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import time
+
+import numpy as np
+
+
+def _simulated_blocks(total_samples, seed=0, min_block=256, max_block=2048):
+    """生成模拟PortAudio回调的可变大小音频块"""
+    rng = np.random.default_rng(seed)
+    produced = 0
+    while produced < total_samples:
+        n = int(rng.integers(min_block, max_block + 1))
+        n = min(n, total_samples - produced)
+        produced += n
+        yield (rng.standard_normal((n, 1)) * 0.05).astype(np.float32)
+
+
+def bench_ring_buffer(args):
+    """
+    比较 np.append/切片 与 AudioRingBuffer 在音频暂存上的吞吐量（样本/秒）和数据拷贝量
+
+    默认模拟一小时的会话，并按多个消费间隔（推理落后时积压的秒数）分别测量：
+    np.append每次写入都要复制整个积压的缓冲区，拷贝量随积压增长；环形缓冲区只复制新写入的样本。
+    """
+    from FunASR import AudioRingBuffer
+
+    sample_rate = 16000
+    total_samples = int(sample_rate * args.seconds)
+    vad_chunk_samples = int(sample_rate * 0.2)
+    asr_chunk_samples = int(sample_rate * 0.6)
+    silence_check_samples = int(sample_rate * 0.1)
+    blocks = list(_simulated_blocks(total_samples))
+
+    def run_append(drain_every, copied=None):
+        vad_buffer = np.array([], dtype=np.float32)
+        audio_accumulator = np.array([], dtype=np.float32)
+        speech_buffer = np.array([], dtype=np.float32)
+        for i, chunk in enumerate(blocks):
+            audio_accumulator = np.append(audio_accumulator, chunk.flatten())
+            vad_buffer = np.append(vad_buffer, chunk.flatten())
+            if copied is not None:
+                copied[0] += audio_accumulator.nbytes + vad_buffer.nbytes
+            if len(audio_accumulator) > silence_check_samples * 2:
+                audio_accumulator = audio_accumulator[-silence_check_samples:]
+            if i % drain_every:
+                continue
+            while len(vad_buffer) >= vad_chunk_samples:
+                vad_chunk = vad_buffer[:vad_chunk_samples]
+                vad_buffer = vad_buffer[vad_chunk_samples:]
+                speech_buffer = np.append(speech_buffer, vad_chunk)
+                if copied is not None:
+                    copied[0] += speech_buffer.nbytes
+            while len(speech_buffer) >= asr_chunk_samples:
+                speech_buffer = speech_buffer[asr_chunk_samples:]
+
+    def run_ring(drain_every, copied=None):
+        capacity = sample_rate * 30
+        vad_buffer = AudioRingBuffer(capacity)
+        audio_accumulator = AudioRingBuffer(silence_check_samples * 4)
+        speech_buffer = AudioRingBuffer(capacity)
+        for i, chunk in enumerate(blocks):
+            audio_accumulator.write(chunk)
+            vad_buffer.write(chunk)
+            if copied is not None:
+                copied[0] += 2 * 2 * chunk.nbytes  # 两个缓冲区，各写主区和镜像区
+            if len(audio_accumulator) > silence_check_samples * 2:
+                audio_accumulator.consume(len(audio_accumulator) - silence_check_samples)
+            if i % drain_every:
+                continue
+            while len(vad_buffer) >= vad_chunk_samples:
+                speech_buffer.write(vad_buffer.consume(vad_chunk_samples))
+                if copied is not None:
+                    copied[0] += 2 * vad_chunk_samples * 4
+            while len(speech_buffer) >= asr_chunk_samples:
+                speech_buffer.consume(asr_chunk_samples)
+
+    print(f"模拟音频: {args.seconds:.0f}s, {len(blocks)} 个回调块")
+    print(f"{'消费间隔':>8} {'np.append':>14} {'AudioRingBuffer':>16} {'加速比':>8} "
+          f"{'np.append拷贝':>14} {'环形缓冲区拷贝':>14}")
+    for stall in args.stall:
+        # 推理落后时，处理线程每隔stall秒才消费一次缓冲区，期间缓冲区持续增长
+        drain_every = max(1, int(stall * sample_rate * len(blocks) / total_samples))
+        rates = {}
+        copies = {}
+        for name, fn in (("np.append", run_append), ("AudioRingBuffer", run_ring)):
+            best = float("inf")
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                fn(drain_every)
+                best = min(best, time.perf_counter() - t0)
+            rates[name] = total_samples / best
+            copied = [0]
+            fn(drain_every, copied)  # 单独统计拷贝量，不计入计时
+            copies[name] = copied[0]
+        print(f"{stall:>7.1f}s {rates['np.append'] / 1e6:>9.2f} M/s {rates['AudioRingBuffer'] / 1e6:>11.2f} M/s "
+              f"{rates['AudioRingBuffer'] / rates['np.append']:>7.2f}x "
+              f"{copies['np.append'] / 2 ** 30:>11.2f} GB {copies['AudioRingBuffer'] / 2 ** 30:>12.2f} GB")
+
+
+def bench_silence(args):
+    """比较每次处理步骤只看最近100ms与逐帧向量化分析的静音检测：耗时和实际分析的帧数"""
+    from FunASR import AudioRingBuffer
+
+    sample_rate = 16000
+    frame = int(sample_rate * 0.1)
+    total_samples = int(sample_rate * args.seconds)
+    blocks = list(_simulated_blocks(total_samples))
+    drain_every = max(1, int(args.stall * sample_rate * len(blocks) / total_samples))
+    expected_frames = total_samples // frame
+
+    def run_tail():
+        # 原实现：每个处理步骤只取累积器最后100ms计算一次RMS，然后截断
+        accumulator = AudioRingBuffer(frame * 4)
+        speaking_volume = 0.0
+        analyzed = 0
+        for i, chunk in enumerate(blocks):
+            accumulator.write(chunk)
+            if i % drain_every or len(accumulator) < frame:
+                continue
+            recent = accumulator.peek_tail(frame)
+            energy = np.sqrt(np.mean(recent ** 2))
+            speaking_volume = 0.7 * speaking_volume + 0.3 * energy
+            analyzed += 1
+            if len(accumulator) > frame * 2:
+                accumulator.consume(len(accumulator) - frame)
+        return analyzed
+
+    def run_frames():
+        # 新实现：一次计算累积器中所有完整帧的RMS，逐帧更新说话音量
+        accumulator = AudioRingBuffer(sample_rate * 30)
+        speaking_volume = 0.0
+        analyzed = 0
+        for i, chunk in enumerate(blocks):
+            accumulator.write(chunk)
+            if i % drain_every:
+                continue
+            n = len(accumulator) // frame
+            if n == 0:
+                continue
+            frames = accumulator.peek(n * frame).reshape(n, frame)
+            energies = np.sqrt(np.einsum("ij,ij->i", frames, frames) / frame)
+            for energy in energies:
+                speaking_volume = 0.7 * speaking_volume + 0.3 * float(energy)
+            accumulator.consume(n * frame)
+            analyzed += n
+        return analyzed
+
+    print(f"模拟音频: {args.seconds:.0f}s, {len(blocks)} 个回调块, 每{args.stall:.2f}s处理一次, 应分析 {expected_frames} 帧")
+    print(f"{'实现':>16} {'耗时(ms)':>10} {'分析帧数':>10} {'覆盖率':>8} {'每帧(us)':>10}")
+    for name, fn in (("最近100ms", run_tail), ("逐帧向量化", run_frames)):
+        best = float("inf")
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            analyzed = fn()
+            best = min(best, time.perf_counter() - t0)
+        print(f"{name:>16} {best * 1000:>10.1f} {analyzed:>10} {analyzed / expected_frames:>8.1%} "
+              f"{best / max(analyzed, 1) * 1e6:>10.2f}")
+
+
+def bench_capture_dtype(args):
+    """比较float32与int16采集：采集回调耗时、队列数据量、原始缓冲区内存和取块转换耗时"""
+    from FunASR import AudioCaptureHub, AudioRingBuffer, to_float32
+
+    sample_rate = 16000
+    vad_chunk_samples = int(sample_rate * 0.2)
+    n_blocks = int(sample_rate * args.seconds / args.block_size)
+    rng = np.random.default_rng(0)
+    float_blocks = [(rng.standard_normal((args.block_size, 1)) * 0.05).astype(np.float32) for _ in range(64)]
+    int16_blocks = [np.clip(np.rint(b * 32768), -32768, 32767).astype(np.int16) for b in float_blocks]
+
+    print(f"模拟音频: {args.seconds:.0f}s, {n_blocks} 个 {args.block_size} 样本的回调块")
+    print(f"{'格式':>8} {'回调(us)':>10} {'队列(MB)':>10} {'原始缓冲区(MB)':>14} {'取块+转换(us)':>14}")
+    for dtype, blocks in (("float32", float_blocks), ("int16", int16_blocks)):
+        # 采集回调：打时间戳、拷贝、分发给一个订阅者
+        hub = AudioCaptureHub(dtype=dtype)
+        subscription = hub.subscribe("asr", maxsize=n_blocks + 1)
+        t0 = time.perf_counter()
+        for i in range(n_blocks):
+            hub._callback(blocks[i % len(blocks)], args.block_size, None, None)
+        callback_time = (time.perf_counter() - t0) / n_blocks
+        queued_bytes = sum(chunk.nbytes for _, chunk in list(subscription.queue.queue))
+
+        # 原始缓冲区（VAD缓冲区+静音检测累积器，各30秒）写入后按VAD块取出并转换为float32
+        vad_buffer = AudioRingBuffer(sample_rate * 30, dtype=dtype)
+        accumulator = AudioRingBuffer(sample_rate * 30, dtype=dtype)
+        consume_time = 0.0
+        chunks = 0
+        for _, chunk in list(subscription.queue.queue):
+            vad_buffer.write(chunk)
+            accumulator.write(chunk)
+            while len(vad_buffer) >= vad_chunk_samples:
+                t0 = time.perf_counter()
+                to_float32(vad_buffer.consume(vad_chunk_samples))
+                consume_time += time.perf_counter() - t0
+                chunks += 1
+        buffer_mb = (vad_buffer.nbytes + accumulator.nbytes) / (1024 * 1024)
+        print(f"{dtype:>8} {callback_time * 1e6:>10.2f} {queued_bytes / (1024 * 1024):>10.1f} {buffer_mb:>14.2f} "
+              f"{consume_time / max(chunks, 1) * 1e6:>14.2f}")
+
+
+def _peak_rss_mb():
+    """当前进程的峰值常驻内存（MB）"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux单位为KB，macOS为字节
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        import psutil  # Windows
+        return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+
+
+def _run_pipeline_in_subprocess(result_queue, paths, asr_kwargs, cores=None):
+    """在独立进程中加载模型并以最快速度回放音频，使峰值内存互不影响"""
+    try:
+        if cores and hasattr(os, "sched_setaffinity"):
+            # 把进程限制在前cores个核心上，模拟核数较少的机器
+            os.sched_setaffinity(0, set(sorted(os.sched_getaffinity(0))[:cores]))
+        from FunASR import FastLoadASR
+        from replay_harness import ReplayHarness
+
+        load_start = time.perf_counter()
+        asr = FastLoadASR(**asr_kwargs)
+        if not asr.ensure_models_loaded():
+            raise RuntimeError(f"模型加载失败: {asr.model_load_errors}")
+        load_time = time.perf_counter() - load_start
+        asr.warmup()
+
+        texts = {}
+        total_duration = 0.0
+        total_wall = 0.0
+        harness = ReplayHarness(asr, speed=None)
+        for path in paths:
+            result = harness.run(path)
+            texts[path] = "".join(segment["text"] for segment in result["segments"])
+            total_duration += result["duration"]
+            total_wall += result["wall_time"]
+        result_queue.put({
+            "load_time": load_time,
+            "rtf": total_wall / total_duration if total_duration > 0 else 0.0,
+            "texts": texts,
+            "latency": asr.get_latency_stats()["metrics"],
+            "threads": asr.get_thread_settings(),
+            "peak_rss_mb": _peak_rss_mb(),
+        })
+    except Exception as e:
+        result_queue.put({"error": str(e)})
+
+
+def run_pipeline_isolated(paths, asr_kwargs, cores=None):
+    """在spawn子进程中对一组音频运行完整流水线，返回结果字典；cores限制子进程可用的核心数"""
+    ctx = mp.get_context("spawn")
+    result_queue = ctx.Queue()
+    process = ctx.Process(target=_run_pipeline_in_subprocess, args=(result_queue, paths, asr_kwargs, cores))
+    process.start()
+    result = result_queue.get()
+    process.join()
+    return result
+
+
+def bench_backends(args):
+    """比较torch与onnxruntime后端的流式识别RTF和峰值内存"""
+    print(f"音频: {args.path}")
+    print(f"{'后端':>8} {'加载(s)':>8} {'RTF':>8} {'ASR p50(ms)':>12} {'峰值RSS(MB)':>12}")
+    for backend in args.backends:
+        result = run_pipeline_isolated([args.path], {"backend": backend})
+        if "error" in result:
+            print(f"{backend:>8} 失败: {result['error']}")
+            continue
+        asr_p50 = result["latency"].get("asr_generate", {}).get("p50_ms", 0.0)
+        print(f"{backend:>8} {result['load_time']:>8.1f} {result['rtf']:>8.3f} {asr_p50:>12.1f} "
+              f"{result['peak_rss_mb']:>12.0f}")
+        if args.verbose:
+            print(f"         {result['texts'][args.path]}")
+
+
+def bench_capture_profile(args):
+    """
+    按各采集配置的块大小回放音频，比较每秒回调次数、队列操作次数和端到端延迟
+
+    最快速度（模拟时钟）下延迟只包含分块/缓冲带来的等待，不含推理耗时；
+    --speed 1 按实时回放，延迟包含推理耗时。PortAudio的latency参数只影响真实设备，这里无法模拟。
+    """
+    from FunASR import FastLoadASR
+    from replay_harness import ReplayHarness
+
+    speed = None if args.speed == "max" else float(args.speed)
+    asr = FastLoadASR(use_vad=True, use_punc=True, max_segment_duration_seconds=args.max_segment)
+    if not asr.ensure_models_loaded():
+        print(f"模型加载失败: {asr.model_load_errors}")
+        return
+    asr.warmup()
+
+    configs = [("portaudio", args.portaudio_block)]
+    configs += [(name, profile["blocksize"]) for name, profile in FastLoadASR.CAPTURE_PROFILES.items()]
+    print(f"音频: {args.path}, 模式: {args.speed}")
+    print(f"{'配置':>12} {'块大小':>6} {'回调/秒':>8} {'队列操作/秒':>10} "
+          f"{'首个结果 p50':>12} {'句末 p50':>10} {'句末 p95':>10} {'整句 p95':>10}")
+    for name, block_size in configs:
+        asr.reset_latency_stats()
+        result = ReplayHarness(asr, speed=speed, block_size=block_size).run(args.path)
+        metrics = result["latency"]["metrics"]
+        callbacks_per_second = asr.sample_rate / block_size
+
+        def p(metric, key):
+            return metrics.get(metric, {}).get(key, 0.0)
+
+        print(f"{name:>12} {block_size:>6} {callbacks_per_second:>8.1f} {callbacks_per_second * 2:>10.1f} "
+              f"{p('first_partial', 'p50_ms'):>12.0f} {p('final_emit', 'p50_ms'):>10.0f} "
+              f"{p('final_emit', 'p95_ms'):>10.0f} {p('utterance_total', 'p95_ms'):>10.0f}")
+
+
+class _SlowModel:
+    """在每次generate后额外等待，模拟推理跟不上实时（如CPU被其他程序占用）"""
+
+    def __init__(self, model, delay):
+        self.model = model
+        self.delay = delay
+
+    def generate(self, *args, **kwargs):
+        result = self.model.generate(*args, **kwargs)
+        time.sleep(self.delay)
+        return result
+
+
+def bench_overload(args):
+    """
+    模拟ASR推理慢于实时，按实时回放音频，比较各过载策略下的积压（秒）、丢弃的音频和句末延迟
+    """
+    from FunASR import AudioBlockQueue, FastLoadASR
+    from replay_harness import ReplayHarness
+
+    asr = FastLoadASR(use_vad=True, use_punc=True, max_segment_duration_seconds=args.max_segment)
+    if not asr.ensure_models_loaded():
+        print(f"模型加载失败: {asr.model_load_errors}")
+        return
+    asr.warmup()
+    asr.audio_queue_max_seconds = args.max_queue
+    asr.asr_model = _SlowModel(asr.asr_model, args.asr_delay)
+    asr.adaptive_asr_chunks = not args.fixed_chunks
+
+    print(f"音频: {args.path}, 每次ASR推理额外 {args.asr_delay:.2f}s, 队列上限 {args.max_queue:.1f}s")
+    print(f"{'策略':>16} {'最高积压(s)':>11} {'丢弃(s)':>8} {'丢弃语音块':>10} {'合并块':>6} "
+          f"{'等待(s)':>8} {'句末 p95(ms)':>12} {'句数':>4} {'块切换':>6}")
+    for policy in args.policies:
+        asr.audio_queue_policy = policy
+        asr.reset_latency_stats()
+        result = ReplayHarness(asr, speed=1.0, block_size=args.block_size).run(args.path)
+        queue_stats = result["latency"]["audio_queue"]
+        final_p95 = result["latency"]["metrics"].get("final_emit", {}).get("p95_ms", 0.0)
+        print(f"{policy:>16} {queue_stats['high_water_seconds']:>11.2f} {queue_stats['dropped_seconds']:>8.2f} "
+              f"{queue_stats['dropped_speech_blocks']:>10} {queue_stats['merged_blocks']:>6} "
+              f"{queue_stats['blocked_seconds']:>8.2f} {final_p95:>12.0f} {len(result['segments']):>4} "
+              f"{result['latency']['asr_chunks']['switches']:>6}")
+        if args.verbose:
+            print("                 " + "".join(segment["text"] for segment in result["segments"]))
+
+
+def _normalize_text(text):
+    """去掉标点和空白，只保留用于计算字错误率的字符"""
+    return "".join(ch for ch in text if ch.isalnum())
+
+
+def _edit_distance(ref, hyp):
+    """字符级编辑距离"""
+    prev = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        cur = [i] + [0] * len(hyp)
+        for j, h in enumerate(hyp, 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (r != h))
+        prev = cur
+    return prev[-1]
+
+
+def _load_test_set(path):
+    """
+    读取测试集清单：每行"音频路径<TAB>参考文本"，相对路径相对于清单文件所在目录
+
+    返回:
+        [(音频路径, 参考文本), ...]
+    """
+    base_dir = os.path.dirname(os.path.abspath(path))
+    items = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            audio_path, reference = line.split("\t", 1)
+            items.append((os.path.join(base_dir, audio_path), reference))
+    return items
+
+
+def bench_quantize(args):
+    """在固定测试集上比较float32与int8动态量化的字错误率(CER)、RTF和峰值内存"""
+    items = _load_test_set(args.test_set)
+    paths = [audio_path for audio_path, _ in items]
+    print(f"测试集: {args.test_set} ({len(items)} 条)")
+    print(f"{'模式':>8} {'CER':>8} {'RTF':>8} {'ASR p50(ms)':>12} {'标点 p50(ms)':>12} {'峰值RSS(MB)':>12}")
+    for quantize in (None, "int8"):
+        label = quantize or "float32"
+        result = run_pipeline_isolated(paths, {"backend": args.backend, "quantize": quantize})
+        if "error" in result:
+            print(f"{label:>8} 失败: {result['error']}")
+            continue
+        errors = 0
+        ref_chars = 0
+        for audio_path, reference in items:
+            reference = _normalize_text(reference)
+            errors += _edit_distance(reference, _normalize_text(result["texts"][audio_path]))
+            ref_chars += len(reference)
+        cer = errors / ref_chars if ref_chars else 0.0
+        asr_p50 = result["latency"].get("asr_generate", {}).get("p50_ms", 0.0)
+        punc_p50 = result["latency"].get("punc", {}).get("p50_ms", 0.0)
+        print(f"{label:>8} {cer:>8.2%} {result['rtf']:>8.3f} {asr_p50:>12.1f} {punc_p50:>12.1f} "
+              f"{result['peak_rss_mb']:>12.0f}")
+
+
+def bench_threads(args):
+    """在不同核心数下比较默认线程预算与torch默认线程设置的RTF和尾延迟"""
+    from FunASR import default_thread_budget
+
+    if not hasattr(os, "sched_setaffinity"):
+        print("当前平台不支持限制CPU亲和性，各组结果使用全部核心")
+    print(f"音频: {args.path}")
+    print(f"{'核心':>4} {'线程设置':>18} {'RTF':>8} {'ASR p95(ms)':>12} {'标点 p95(ms)':>12} {'总延迟 p95(ms)':>14}")
+    for cores in args.cores:
+        budget = default_thread_budget(cores)
+        # 对照组：每个模型都使用全部可用核心（torch默认行为）
+        untuned = {"asr": cores, "vad": cores, "punc": cores, "interop": cores}
+        for label, thread_budget in (("预算", budget), ("未调优", untuned)):
+            result = run_pipeline_isolated([args.path], {"backend": args.backend, "thread_budget": thread_budget},
+                                           cores=cores)
+            if "error" in result:
+                print(f"{cores:>4} {label:>18} 失败: {result['error']}")
+                continue
+            setting = f"{label} {thread_budget['asr']}/{thread_budget['vad']}/{thread_budget['punc']}"
+            latency = result["latency"]
+            print(f"{cores:>4} {setting:>18} {result['rtf']:>8.3f} "
+                  f"{latency.get('asr_generate', {}).get('p95_ms', 0.0):>12.1f} "
+                  f"{latency.get('punc', {}).get('p95_ms', 0.0):>12.1f} "
+                  f"{latency.get('utterance_total', {}).get('p95_ms', 0.0):>14.1f}")
+
+
+# 无标点的示例句子（模拟强制分段后连续结束的多句话）
+SAMPLE_SENTENCES = [
+    "今天下午三点在三楼会议室开会",
+    "请大家提前准备好上周的工作总结",
+    "这个方案我们还需要再讨论一下",
+    "明天的天气预报说会有小雨",
+    "我觉得这个价格有点贵能不能便宜一点",
+    "会议结束以后请把纪要发给我",
+    "我们下周一再确认最终的时间",
+    "如果有问题可以随时联系我",
+]
+
+
+def bench_punc_batch(args):
+    """比较积压句子逐句标点恢复与合并成批处理的吞吐量（句/秒）"""
+    from FunASR import FastLoadASR
+
+    if args.texts:
+        with open(args.texts, "r", encoding="utf-8") as f:
+            sentences = [line.strip() for line in f if line.strip()]
+    else:
+        sentences = SAMPLE_SENTENCES
+    sentences = (sentences * (args.count // len(sentences) + 1))[:args.count]
+
+    asr = FastLoadASR(use_vad=False, use_punc=True, backend=args.backend)
+    if not asr.load_punc_model_if_needed():
+        print(f"标点模型加载失败: {asr.model_load_errors}")
+        return
+    asr.punc_model.generate(input=sentences[0])  # 预热
+
+    print(f"句子数: {len(sentences)}")
+    print(f"{'批大小':>6} {'调用次数':>8} {'句/秒':>10} {'加速比':>8} {'对齐失败':>8}")
+    baseline = None
+    for batch_size in args.batch_sizes:
+        fallbacks_before = asr.punc_batch_fallbacks
+        t0 = time.perf_counter()
+        calls = 0
+        for start in range(0, len(sentences), batch_size):
+            batch = sentences[start:start + batch_size]
+            asr._punctuate_batch(batch, [{} for _ in batch])
+            calls += 1
+        elapsed = time.perf_counter() - t0
+        throughput = len(sentences) / elapsed
+        baseline = baseline or throughput
+        print(f"{batch_size:>6} {calls:>8} {throughput:>10.1f} {throughput / baseline:>7.2f}x "
+              f"{asr.punc_batch_fallbacks - fallbacks_before:>8}")
+
+
+def _load_models_in_subprocess(result_queue, model_names, use_snapshot, hold_seconds=0.0):
+    """在独立进程中加载模型，返回各模型的加载耗时、常驻内存和私有内存"""
+    try:
+        import FunASR
+        from funasr import AutoModel
+
+        load_times = {}
+        models = []
+        for name in model_names:
+            t0 = time.perf_counter()
+            model = FunASR.load_model_snapshot(name) if use_snapshot else AutoModel(model=name)
+            if model is None:
+                raise RuntimeError(f"没有 {name} 的快照")
+            load_times[name] = time.perf_counter() - t0
+            models.append(model)
+        result = {"load_times": load_times, "peak_rss_mb": _peak_rss_mb()}
+        try:
+            import psutil
+            # 共享页缓存的mmap权重不计入私有内存（USS）
+            result["uss_mb"] = psutil.Process().memory_full_info().uss / (1024 * 1024)
+        except (ImportError, AttributeError):
+            pass
+        result_queue.put(result)
+        time.sleep(hold_seconds)  # 多进程测试时保持模型驻留，直到其他进程也加载完成
+    except Exception as e:
+        result_queue.put({"error": str(e)})
+
+
+def bench_snapshot(args):
+    """比较AutoModel正常加载与快照（mmap权重）加载的启动耗时和内存"""
+    import FunASR
+    from funasr import AutoModel
+
+    if not FunASR.model_snapshots_supported():
+        print("当前torch版本不支持mmap加载（需要torch>=2.1）")
+        return
+    for name in args.models:
+        if FunASR.load_model_snapshot(name) is None:
+            print(f"生成 {name} 的快照...")
+            FunASR.save_model_snapshot(AutoModel(model=name), name)
+
+    ctx = mp.get_context("spawn")
+    print(f"{'加载方式':>10} {'进程':>4} " + " ".join(f"{name:>24}" for name in args.models)
+          + f" {'峰值RSS(MB)':>12} {'私有(MB)':>10}")
+    for label, use_snapshot in (("AutoModel", False), ("快照", True)):
+        result_queue = ctx.Queue()
+        processes = [ctx.Process(target=_load_models_in_subprocess,
+                                 args=(result_queue, args.models, use_snapshot, 2.0 * args.processes))
+                     for _ in range(args.processes)]
+        for process in processes:
+            process.start()
+        results = [result_queue.get() for _ in processes]
+        for process in processes:
+            process.join()
+        for i, result in enumerate(results):
+            if "error" in result:
+                print(f"{label:>10} {i + 1:>4} 失败: {result['error']}")
+                continue
+            times = " ".join(f"{result['load_times'][name]:>23.2f}s" for name in args.models)
+            uss = f"{result['uss_mb']:>10.0f}" if "uss_mb" in result else f"{'-':>10}"
+            print(f"{label:>10} {i + 1:>4} {times} {result['peak_rss_mb']:>12.0f} {uss}")
+
+
+# 导入FunASR时不应加载的重型依赖（只在加载模型或打开音频流时导入）
+HEAVY_MODULES = ("torch", "torchaudio", "funasr", "sounddevice")
+IMPORT_BUDGET_MS = 300.0  # 导入FunASR的耗时预算（毫秒）
+
+
+def measure_import_time(module, repeat=3):
+    """
+    用python -X importtime在新进程中导入模块
+
+    返回:
+        (最快一次的总导入耗时（毫秒）, 该次导入的 {模块名: 累计耗时（毫秒）})
+    """
+    import subprocess
+
+    best_total, best_modules = None, None
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                              cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+        modules = {}
+        total = 0.0
+        for line in proc.stderr.splitlines():
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+            _, cumulative, name = line[len("import time:"):].split("|")
+            cumulative_ms = int(cumulative) / 1000
+            name = name[1:].rstrip()  # 保留缩进：嵌套导入的模块名前有空格
+            modules[name] = cumulative_ms
+            if not name.startswith(" "):  # 顶层导入的累计耗时之和即总耗时
+                total += cumulative_ms
+        if best_total is None or total < best_total:
+            best_total, best_modules = total, modules
+    return best_total, best_modules
+
+
+# 在新进程中按ONNX后端构造FastLoadASR并加载模型，输出此时已导入的重型依赖
+_ONNX_IMPORT_CHECK = """
+import sys
+from FunASR import FastLoadASR
+asr = FastLoadASR(backend="onnx", warmup=False)
+ok = asr.ensure_models_loaded()
+heavy = sorted({name.split(".")[0] for name in sys.modules} & set(sys.argv[1:]))
+print("ONNX_IMPORT_CHECK", int(ok), ",".join(heavy))
+"""
+
+
+def check_onnx_imports():
+    """
+    检查ONNX后端的构造和模型加载路径不导入funasr/torch
+
+    首次运行时需要用funasr导出ONNX模型，此时会导入torch，导出完成后再检查一次。
+
+    返回:
+        (模型是否加载成功, 已导入的重型依赖列表)
+    """
+    import subprocess
+
+    for _ in range(2):
+        proc = subprocess.run([sys.executable, "-c", _ONNX_IMPORT_CHECK, *HEAVY_MODULES],
+                              cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True)
+        lines = [line for line in proc.stdout.splitlines() if line.startswith("ONNX_IMPORT_CHECK")]
+        if not lines:
+            raise RuntimeError((proc.stderr.strip().splitlines() or ["ONNX后端检查进程异常退出"])[-1])
+        _, ok, heavy = lines[-1].split(" ", 2)  # 没有重型依赖时最后一项为空字符串
+        heavy = [name for name in heavy.strip().split(",") if name]
+        if "导出ONNX模型" not in proc.stdout:
+            break
+    return ok == "1", heavy
+
+
+def bench_import_time(args):
+    """检查导入FunASR的耗时预算，并确认重型依赖没有在导入时加载"""
+    total, modules = measure_import_time(args.module, repeat=args.repeat)
+    print(f"导入 {args.module}: {total:.1f}ms（预算 {args.budget_ms:.0f}ms）")
+    top_level = sorted(((ms, name) for name, ms in modules.items() if not name.startswith(" ")), reverse=True)
+    for ms, name in top_level[:args.top]:
+        print(f"{ms:>10.1f}ms  {name}")
+
+    failed = False
+    heavy = [name for name in modules if name.strip().split(".")[0] in HEAVY_MODULES]
+    if heavy:
+        print(f"失败: 导入时加载了重型依赖: {', '.join(sorted({n.strip().split('.')[0] for n in heavy}))}")
+        failed = True
+    if total > args.budget_ms:
+        print(f"失败: 导入耗时超出预算 {total - args.budget_ms:.1f}ms")
+        failed = True
+
+    if not args.skip_onnx:
+        try:
+            ok, heavy = check_onnx_imports()
+        except Exception as e:
+            ok, heavy = False, []
+            print(f"ONNX后端检查出错: {e}")
+        if not ok:
+            print("跳过ONNX后端检查: 模型加载失败（需要安装funasr_onnx和onnxruntime）")
+        elif heavy:
+            print(f"失败: ONNX后端加载模型时导入了重型依赖: {', '.join(heavy)}")
+            failed = True
+        else:
+            print("ONNX后端加载模型未导入重型依赖")
+    if failed:
+        sys.exit(1)
+    print("通过")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FunASR 性能基准测试")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    p = subparsers.add_parser("ring_buffer", help="音频暂存缓冲区吞吐量")
+    p.add_argument("--seconds", type=float, default=3600.0, help="模拟音频时长（秒），默认一小时的会话")
+    p.add_argument("--stall", type=float, nargs="+", default=[0.0, 2.0, 10.0, 20.0],
+                   help="处理线程两次消费之间的间隔（秒），模拟推理落后时的积压；可指定多个")
+    p.add_argument("--repeat", type=int, default=3, help="重复次数（取最好成绩）")
+    p.set_defaults(func=bench_ring_buffer)
+
+    p = subparsers.add_parser("silence", help="动态静音检测：最近100ms与逐帧向量化分析")
+    p.add_argument("--seconds", type=float, default=600.0, help="模拟音频时长（秒）")
+    p.add_argument("--stall", type=float, default=0.0,
+                   help="处理线程两次处理之间的间隔（秒），模拟音频块成批到达")
+    p.add_argument("--repeat", type=int, default=3, help="重复次数（取最好成绩）")
+    p.set_defaults(func=bench_silence)
+
+    p = subparsers.add_parser("capture_dtype", help="float32与int16采集的回调耗时和缓冲区内存")
+    p.add_argument("--seconds", type=float, default=600.0, help="模拟音频时长（秒）")
+    p.add_argument("--block-size", type=int, default=1024, help="每次回调的样本数")
+    p.set_defaults(func=bench_capture_dtype)
+
+    p = subparsers.add_parser("capture_profile", help="采集块大小对回调频率和端到端延迟的影响")
+    p.add_argument("path", help="测试音频文件")
+    p.add_argument("--speed", default="max", help="回放倍速：max（模拟时钟）或数字（1为实时）")
+    p.add_argument("--max-segment", type=float, default=5.0, help="最大片段时长（秒）")
+    p.add_argument("--portaudio-block", type=int, default=512,
+                   help="对照组块大小，模拟不指定blocksize时PortAudio选择的小块")
+    p.set_defaults(func=bench_capture_profile)
+
+    p = subparsers.add_parser("overload", help="推理慢于实时时各音频队列过载策略的积压、丢弃和延迟")
+    p.add_argument("path", help="测试音频文件")
+    p.add_argument("--asr-delay", type=float, default=0.8, help="每次ASR推理额外等待的时间（秒），大于0.6s时慢于实时")
+    p.add_argument("--max-queue", type=float, default=3.0, help="音频队列上限（秒）")
+    p.add_argument("--block-size", type=int, default=3200, help="每次回调的样本数")
+    p.add_argument("--max-segment", type=float, default=5.0, help="最大片段时长（秒）")
+    p.add_argument("--policies", nargs="+", default=["block", "drop_oldest", "drop_non_speech", "merge"],
+                   help="要比较的过载策略")
+    p.add_argument("--fixed-chunks", action="store_true", help="禁用自适应ASR块大小（固定600ms）")
+    p.add_argument("--verbose", action="store_true", help="输出识别文本")
+    p.set_defaults(func=bench_overload)
+
+    p = subparsers.add_parser("backends", help="torch/onnx推理后端的RTF和峰值内存")
+    p.add_argument("path", help="测试音频文件")
+    p.add_argument("--backends", nargs="+", default=["torch", "onnx"], help="要比较的后端")
+    p.add_argument("--verbose", action="store_true", help="输出识别文本")
+    p.set_defaults(func=bench_backends)
+
+    p = subparsers.add_parser("quantize", help="int8动态量化的准确率和RTF")
+    p.add_argument("test_set", help="测试集清单（每行：音频路径<TAB>参考文本）")
+    p.add_argument("--backend", default="torch", help="推理后端")
+    p.set_defaults(func=bench_quantize)
+
+    p = subparsers.add_parser("threads", help="不同核心数下线程预算的RTF和尾延迟")
+    p.add_argument("path", help="测试音频文件")
+    p.add_argument("--cores", nargs="+", type=int, default=[1, 2, 4, 8], help="要测试的核心数")
+    p.add_argument("--backend", default="torch", help="推理后端")
+    p.set_defaults(func=bench_threads)
+
+    p = subparsers.add_parser("punc_batch", help="积压句子合并标点恢复的吞吐量")
+    p.add_argument("--texts", help="每行一句无标点文本的文件，默认使用内置示例")
+    p.add_argument("--count", type=int, default=64, help="句子数")
+    p.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 2, 4, 8], help="要比较的批大小")
+    p.add_argument("--backend", default="torch", help="推理后端")
+    p.set_defaults(func=bench_punc_batch)
+
+    p = subparsers.add_parser("snapshot", help="模型快照（mmap权重）与AutoModel正常加载的启动耗时和内存")
+    p.add_argument("--models", nargs="+", default=["paraformer-zh-streaming", "fsmn-vad", "ct-punc"],
+                   help="要比较的模型")
+    p.add_argument("--processes", type=int, default=1, help="同时加载的进程数（观察页缓存共享）")
+    p.set_defaults(func=bench_snapshot)
+
+    p = subparsers.add_parser("import_time", help="导入FunASR的耗时预算和重型依赖检查（python -X importtime）")
+    p.add_argument("--module", default="FunASR", help="要检查的模块")
+    p.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS, help="导入耗时预算（毫秒），超出时退出码为1")
+    p.add_argument("--repeat", type=int, default=3, help="重复次数（取最快一次，排除磁盘缓存的影响）")
+    p.add_argument("--top", type=int, default=10, help="输出耗时最多的顶层导入数")
+    p.add_argument("--skip-onnx", action="store_true", help="不检查ONNX后端构造和加载模型时导入的依赖")
+    p.set_defaults(func=bench_import_time)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""
+多路实时语音识别 - FunASR
+----------------------------
+一台机器同时为多个会议室生成字幕：所有音频流共用一份已加载的模型
+（paraformer-zh-streaming、fsmn-vad、ct-punc），每一路是一个不加载模型的 FastLoadASR 会话，
+保存自己的 asr_cache/vad_cache、分段状态和延迟统计。
+
+调度方式：
+- 一个调度线程按节拍（tick）检查所有音频流，把本节拍内有新音频或截止时间已到的各路依次处理，
+  共享模型在同一个线程中串行调用，避免多路并发推理争抢CPU
+- 流式paraformer和fsmn-vad的缓存只支持单条音频，无法跨路合并成一次generate；
+  标点恢复没有流式状态，各路积压的句子合并成一次ct-punc调用
+- 音频流可以随时打开/关闭，每一路单独统计延迟
+
+使用方法:
+- python multi_stream.py 会议室1.wav 会议室2.wav 会议室3.wav [--speed 1]
+
+依赖库:
+- funasr
+- soundfile
+- numpy
+"""
+
+import argparse
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from FunASR import FastLoadASR
+
+
+class MultiStreamASR:
+    """共享一份模型的多路流式识别引擎"""
+
+    def __init__(self, use_vad=True, use_punc=True, max_segment_duration_seconds=3.0,
+                 backend="torch", quantize=None, thread_budget=None, warmup=True):
+        """
+        参数:
+            use_vad: 是否使用VAD
+            use_punc: 是否使用标点恢复
+            max_segment_duration_seconds: 每一路的最大片段时长（秒）
+            backend: 推理后端，"torch"或"onnx"
+            quantize: 为"int8"时对paraformer和ct-punc做动态量化
+            thread_budget: 线程预算，见FastLoadASR
+            warmup: 模型加载后是否预热
+        """
+        self.use_vad = use_vad
+        self.use_punc = use_punc
+        self.max_segment_duration_seconds = max_segment_duration_seconds
+        self.backend = backend
+        self.quantize = quantize
+        self.thread_budget = thread_budget
+        # 负责加载和预热共享模型的实例，本身不处理音频
+        self.model_owner = FastLoadASR(use_vad=use_vad, use_punc=use_punc, warmup=warmup,
+                                       backend=backend, quantize=quantize, thread_budget=thread_budget)
+
+        self.streams = {}  # 音频流ID -> FastLoadASR会话
+        self.lock = threading.Lock()  # 保护streams，调度线程处理时持有
+        self.wakeup = threading.Event()
+        self.tick_seconds = 0.05  # 没有新音频时的检查间隔（截止时间检查）
+        self.running = False
+        self.scheduler_thread = None
+        self._stream_ids = itertools.count(1)
+
+        # 各路共享的标点恢复线程和待处理队列
+        self.punc_executor = None
+        self.punc_pending = deque()
+
+        # 调度统计
+        self.tick_sizes = {}  # 一个节拍内处理的路数 -> 节拍数
+        self.tick_durations = deque(maxlen=1000)  # 最近的节拍耗时（秒）
+
+    def start(self):
+        """等待共享模型加载完成并启动调度线程，返回是否成功"""
+        if self.running:
+            return True
+        if not self.model_owner.ensure_models_loaded():
+            print("模型加载失败，无法启动多路识别。")
+            return False
+        if self.use_punc:
+            self.punc_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="punc")
+        self.running = True
+        self.scheduler_thread = threading.Thread(target=self._scheduler_loop)
+        self.scheduler_thread.daemon = True
+        self.scheduler_thread.start()
+        print("多路识别已启动。")
+        return True
+
+    def stop(self):
+        """关闭所有音频流、停止调度线程并释放共享模型"""
+        for stream_id in list(self.streams):
+            self.close_stream(stream_id)
+        self.running = False
+        self.wakeup.set()
+        if self.scheduler_thread is not None:
+            self.scheduler_thread.join(timeout=2)
+            self.scheduler_thread = None
+        if self.punc_executor is not None:
+            self.punc_executor.shutdown(wait=False)
+            self.punc_executor = None
+        self.model_owner.release_models()  # 再次start()时从model_registry重新获取
+        print("多路识别已停止。")
+
+    def _shared_models(self):
+        owner = self.model_owner
+        models = {"asr": owner.asr_model, "vad": owner.vad_model, "punc": owner.punc_model}
+        return {kind: model for kind, model in models.items() if model is not None}
+
+    def open_stream(self, text_output_callback=None, stream_id=None, capture_hub=None):
+        """
+        打开一路音频流
+
+        参数:
+            text_output_callback: 文本回调，参数为 (音频流ID, 片段, 完整句子, 是否句子结束)
+            stream_id: 音频流ID，默认自动编号
+            capture_hub: 该路的AudioCaptureHub（如会议室的麦克风）；None表示通过feed()送入音频
+
+        返回:
+            音频流ID，打开失败时返回None
+        """
+        if not self.running:
+            raise RuntimeError("多路识别尚未启动")
+        if stream_id is None:
+            stream_id = next(self._stream_ids)
+        if stream_id in self.streams:
+            raise ValueError(f"音频流已存在: {stream_id}")
+
+        callback = None
+        if text_output_callback is not None:
+            def callback(segment, full_sentence, is_sentence_end, **kwargs):
+                text_output_callback(stream_id, segment, full_sentence, is_sentence_end, **kwargs)
+
+        # 会话与共享模型使用相同的后端和线程设置（决定是否自适应ASR块大小、线程统计等）
+        session = FastLoadASR(use_vad=self.use_vad, use_punc=self.use_punc, text_output_callback=callback,
+                              max_segment_duration_seconds=self.max_segment_duration_seconds,
+                              backend=self.backend, quantize=self.quantize, thread_budget=self.thread_budget,
+                              capture_hub=capture_hub, models=self._shared_models())
+        session.start(open_stream=capture_hub is not None, background=False)
+        if not session.running:
+            return None
+        if self.punc_executor is not None:
+            session._start_punc_worker(self.punc_executor, self.punc_pending)
+        with self.lock:
+            self.streams[stream_id] = session
+        print(f"音频流 {stream_id} 已打开（共 {len(self.streams)} 路）")
+        return stream_id
+
+    def close_stream(self, stream_id):
+        """
+        关闭一路音频流，处理完剩余音频后返回该路的完整转写文本
+
+        剩余音频在self.lock内处理，与调度线程串行使用共享模型；
+        等待标点结果输出（stop）在锁外进行，不阻塞其他音频流。
+        """
+        with self.lock:
+            session = self.streams.pop(stream_id, None)
+            if session is None:
+                return None
+            session.process_queued_audio()
+            session.flush()
+        session.stop()
+        print(f"音频流 {stream_id} 已关闭（剩余 {len(self.streams)} 路）")
+        return session.complete_transcript
+
+    def feed(self, stream_id, chunk, capture_time=None):
+        """
+        向一路音频流送入16kHz单声道音频块
+
+        参数:
+            stream_id: 音频流ID
+            chunk: 音频数据（float32或int16）
+            capture_time: 采集时间，默认为当前时间
+        """
+        session = self.streams[stream_id]
+        if capture_time is None:
+            capture_time = session.clock()
+        session.audio_queue.offer((capture_time, chunk))
+        self.wakeup.set()
+
+    def _is_ready(self, session):
+        """该路在本节拍是否需要处理：有新音频，或静音超时/强制分段的截止时间已到"""
+        if not session.audio_queue.empty():
+            return True
+        deadline = session.next_deadline()
+        return deadline is not None and deadline <= session.clock()
+
+    def _scheduler_loop(self):
+        """调度线程：每个节拍把就绪的各路依次送入共享模型处理"""
+        while self.running:
+            self.wakeup.wait(timeout=self.tick_seconds)
+            self.wakeup.clear()
+            tick_start = time.perf_counter()
+            with self.lock:
+                ready = [session for session in self.streams.values() if self._is_ready(session)]
+                for session in ready:
+                    try:
+                        session.process_queued_audio()
+                    except Exception as e:
+                        print(f"多路识别处理错误: {e}")
+            if ready:
+                self.tick_sizes[len(ready)] = self.tick_sizes.get(len(ready), 0) + 1
+                self.tick_durations.append(time.perf_counter() - tick_start)
+
+    def get_stream_stats(self, stream_id):
+        """获取一路音频流的延迟统计（见FastLoadASR.get_latency_stats）"""
+        return self.streams[stream_id].get_latency_stats()
+
+    def get_stats(self):
+        """获取调度统计和每一路的延迟指标"""
+        durations = sorted(self.tick_durations)
+        stats = {
+            "streams": len(self.streams),
+            "tick_sizes": dict(sorted(self.tick_sizes.items())),
+            "tick_p50_ms": durations[len(durations) // 2] * 1000 if durations else 0.0,
+            "tick_max_ms": durations[-1] * 1000 if durations else 0.0,
+            "per_stream": {},
+        }
+        with self.lock:
+            for stream_id, session in self.streams.items():
+                stats["per_stream"][stream_id] = session.get_latency_stats()["metrics"]
+        return stats
+
+
+def _feed_file(engine, stream_id, path, speed, block_size):
+    """按倍速把一个音频文件送入一路音频流（模拟一个会议室的麦克风）"""
+    reader = engine.model_owner
+    for block in reader.read_audio_blocks(path, block_seconds=block_size / reader.sample_rate):
+        engine.feed(stream_id, block)
+        time.sleep(len(block) / reader.sample_rate / speed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多路实时语音识别（共享模型）")
+    parser.add_argument("files", nargs="+", help="每个音频文件模拟一路音频流")
+    parser.add_argument("--speed", type=float, default=1.0, help="回放倍速（1为实时）")
+    parser.add_argument("--block-size", type=int, default=3200, help="每次送入的样本数")
+    parser.add_argument("--max-segment", type=float, default=5.0, help="最大片段时长（秒）")
+    parser.add_argument("--no-punc", action="store_true", help="禁用标点恢复")
+    args = parser.parse_args()
+
+    def print_caption(stream_id, segment, full_sentence, is_sentence_end):
+        if is_sentence_end:
+            print(f"[{stream_id}] {full_sentence}")
+
+    engine = MultiStreamASR(use_punc=not args.no_punc, max_segment_duration_seconds=args.max_segment)
+    if not engine.start():
+        return
+
+    feeders = []
+    for path in args.files:
+        stream_id = engine.open_stream(print_caption)
+        print(f"音频流 {stream_id}: {path}")
+        thread = threading.Thread(target=_feed_file, args=(engine, stream_id, path, args.speed, args.block_size))
+        thread.start()
+        feeders.append(thread)
+    for thread in feeders:
+        thread.join()
+    time.sleep(1.0)  # 让最后一句的静音超时触发
+
+    stats = engine.get_stats()
+    print(f"\n节拍内处理的路数分布: {stats['tick_sizes']}, 节拍耗时 p50 {stats['tick_p50_ms']:.1f}ms, "
+          f"最大 {stats['tick_max_ms']:.1f}ms")
+    for stream_id, metrics in stats["per_stream"].items():
+        line = ", ".join(f"{name} p50 {metrics[name]['p50_ms']:.0f}ms/p95 {metrics[name]['p95_ms']:.0f}ms"
+                         for name in ("first_partial", "final_emit") if name in metrics)
+        print(f"[{stream_id}] {line}")
+    engine.stop()
+
+
+if __name__ == "__main__":
+    main()
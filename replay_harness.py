@@ -0,0 +1,227 @@
+"""
+确定性回放测试 - FunASR 实时语音识别
+----------------------------
+把录好的WAV文件按实时、加速或最快速度通过 FastLoadASR.audio_callback 送入识别流水线，
+并向 FastLoadASR 注入时钟，使静音检测、VAD分段和强制分段的结果可以复现。
+
+回放模式:
+- 最快速度（speed=None）：使用模拟时钟，在当前线程中同步驱动处理步骤，
+  静音超时/强制分段的截止时间按模拟时间精确触发，结果完全确定
+- 实时/加速（speed>0）：使用按倍速运行的时钟，后台处理线程与真实运行时一致
+
+使用方法:
+- python replay_harness.py 录音.wav [--speed max|1|4] [--output result.json]
+
+依赖库:
+- soundfile
+- numpy
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+
+class SimulatedClock:
+    """手动推进的模拟时钟（秒）"""
+
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def advance_to(self, t):
+        """推进到指定时间（时钟不会倒退）"""
+        self.now = max(self.now, t)
+
+
+class ScaledClock:
+    """相对真实时间按倍速运行的时钟，rate=1为实时"""
+
+    def __init__(self, rate=1.0):
+        self.rate = rate
+        self._origin = time.perf_counter()
+
+    def __call__(self):
+        return (time.perf_counter() - self._origin) * self.rate
+
+
+def _summarize(values):
+    """计算均值和分位数（毫秒）"""
+    if not values:
+        return {"count": 0}
+    arr = np.asarray(values) * 1000
+    return {
+        "count": len(values),
+        "mean_ms": round(float(arr.mean()), 3),
+        "p50_ms": round(float(np.percentile(arr, 50)), 3),
+        "p95_ms": round(float(np.percentile(arr, 95)), 3),
+        "max_ms": round(float(arr.max()), 3),
+    }
+
+
+class ReplayHarness:
+    """
+    把音频文件回放进 FastLoadASR 的测试工具
+
+    记录每次文本回调时的时钟、已处理的音频位置（分段边界）和延迟，
+    以及 audio_callback 和同步处理步骤的耗时。
+    """
+
+    def __init__(self, asr, speed=None, block_size=1024, tail_silence_seconds=1.0):
+        """
+        参数:
+            asr: FastLoadASR实例（模型可以尚未加载）
+            speed: 回放倍速，None表示最快速度（模拟时钟、同步处理）
+            block_size: 每次audio_callback送入的样本数，模拟PortAudio块大小
+            tail_silence_seconds: 文件结束后追加的静音时长，让静音检测自然结束最后一句
+        """
+        self.asr = asr
+        self.speed = speed
+        self.block_size = block_size
+        self.tail_silence_seconds = tail_silence_seconds
+
+    def _load_audio(self, path):
+        """读取整个文件为16kHz单声道float32，并追加尾部静音"""
+        audio = np.concatenate(list(self.asr.read_audio_blocks(path)))
+        tail = np.zeros(int(self.asr.sample_rate * self.tail_silence_seconds), dtype=np.float32)
+        return np.concatenate([audio, tail])
+
+    def run(self, path):
+        """
+        回放一个音频文件
+
+        返回:
+            dict: events(每次文本回调), segments(句子结束事件), callback/step耗时统计, 总耗时
+        """
+        asr = self.asr
+        sample_rate = asr.sample_rate
+        audio = self._load_audio(path)
+        deterministic = self.speed is None
+        clock = SimulatedClock() if deterministic else ScaledClock(self.speed)
+
+        # 每个块送入时的时钟时间，用于把已处理的样本位置换算成延迟
+        feed_positions = []
+        feed_times = []
+        events = []
+        original_clock = asr.clock
+        original_callback = asr.text_output_callback
+
+        def record_text(segment, full_sentence, is_sentence_end, **kwargs):
+            now = clock()
+            processed = asr.processed_samples
+            idx = int(np.searchsorted(feed_positions, processed, side="left"))
+            fed_at = feed_times[min(idx, len(feed_times) - 1)] if feed_times else now
+            events.append({
+                "clock": round(now, 4),
+                "audio_position": round(processed / sample_rate, 4),
+                "latency": round(now - fed_at, 4),
+                "text": full_sentence,
+                "is_final": is_sentence_end,
+            })
+            if original_callback:
+                original_callback(segment, full_sentence, is_sentence_end, **kwargs)
+
+        asr.clock = clock
+        asr.text_output_callback = record_text
+        callback_durations = []
+        step_durations = []
+        wall_start = time.perf_counter()
+        try:
+            asr.start(open_stream=False, background=not deterministic)
+            if not asr.running:
+                raise RuntimeError("FastLoadASR启动失败")
+
+            position = 0
+            while position < len(audio):
+                block = audio[position:position + self.block_size].reshape(-1, 1)
+                position += len(block)
+                block_time = position / sample_rate
+
+                if deterministic:
+                    # 先按模拟时间触发这一块到达前已到期的截止时间（静音超时/强制分段）
+                    while True:
+                        deadline = asr.next_deadline()
+                        if deadline is None or deadline <= clock() or deadline > block_time:
+                            break
+                        clock.advance_to(deadline + 1e-6)
+                        t0 = time.perf_counter()
+                        asr.process_queued_audio()
+                        step_durations.append(time.perf_counter() - t0)
+                    clock.advance_to(block_time)
+                else:
+                    # 按倍速等待到这一块应到达的时间
+                    delay = block_time / self.speed - (time.perf_counter() - wall_start)
+                    if delay > 0:
+                        time.sleep(delay)
+
+                feed_positions.append(position)
+                feed_times.append(clock())
+                t0 = time.perf_counter()
+                asr.audio_callback(block, len(block), None, None)
+                callback_durations.append(time.perf_counter() - t0)
+
+                if deterministic:
+                    t0 = time.perf_counter()
+                    asr.process_queued_audio()
+                    step_durations.append(time.perf_counter() - t0)
+
+            if not deterministic:
+                # 等待处理线程消化积压的音频
+                while not asr.audio_queue.empty():
+                    time.sleep(0.01)
+        finally:
+            if asr.running:
+                asr.stop()
+            asr.clock = original_clock
+            asr.text_output_callback = original_callback
+
+        wall_time = time.perf_counter() - wall_start
+        duration = len(audio) / sample_rate
+        return {
+            "path": path,
+            "mode": "max" if deterministic else f"{self.speed}x",
+            "duration": duration,
+            "wall_time": wall_time,
+            "rtf": wall_time / duration if duration > 0 else 0.0,
+            "events": events,
+            "segments": [e for e in events if e["is_final"]],
+            "audio_callback": _summarize(callback_durations),
+            "processing_step": _summarize(step_durations),
+            "latency": asr.get_latency_stats(),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FunASR 确定性回放测试")
+    parser.add_argument("path", help="WAV文件路径")
+    parser.add_argument("--speed", default="max", help="回放倍速：max（模拟时钟，确定性）或数字（1为实时）")
+    parser.add_argument("--block-size", type=int, default=1024, help="每次回调的样本数")
+    parser.add_argument("--max-segment", type=float, default=5.0, help="最大片段时长（秒）")
+    parser.add_argument("--output", help="结果输出文件（JSON）")
+    args = parser.parse_args()
+
+    from FunASR import FastLoadASR
+
+    speed = None if args.speed == "max" else float(args.speed)
+    asr = FastLoadASR(use_vad=True, use_punc=True, max_segment_duration_seconds=args.max_segment)
+    result = ReplayHarness(asr, speed=speed, block_size=args.block_size).run(args.path)
+
+    for segment in result["segments"]:
+        print(f"[{segment['audio_position']:8.2f}s +{segment['latency']:.3f}s] {segment['text']}")
+    print(f"模式 {result['mode']}, 音频 {result['duration']:.1f}s, 耗时 {result['wall_time']:.1f}s, "
+          f"RTF {result['rtf']:.3f}")
+    print(f"audio_callback: {result['audio_callback']}")
+    print(f"处理步骤: {result['processing_step']}")
+    for name, stats in result["latency"]["metrics"].items():
+        print(f"{name:>16}: p50 {stats['p50_ms']:8.1f}ms  p95 {stats['p95_ms']:8.1f}ms  p99 {stats['p99_ms']:8.1f}ms")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""AudioBlockQueue：有界音频块队列的过载策略"""
+
+import numpy as np
+
+from FunASR import AudioBlockQueue
+
+
+def _block(n, value=0.0):
+    return np.full(n, value, dtype=np.float32)
+
+
+def test_merge_appends_to_tail_when_full():
+    q = AudioBlockQueue(max_seconds=1.0, policy="merge", sample_rate=100, max_merge_seconds=0.5)
+    for i in range(5):
+        q.offer((i, _block(20)))
+    q.offer((5, _block(20)))
+    stats = q.get_stats()
+    assert stats["merged_blocks"] == 1
+    assert stats["dropped_blocks"] == 0
+    assert [len(chunk) for _, chunk in list(q.queue)] == [20, 20, 20, 20, 40]
+
+
+def test_merge_caps_block_size_then_drops_oldest():
+    q = AudioBlockQueue(max_seconds=1.0, policy="merge", sample_rate=100, max_merge_seconds=0.5)
+    for i in range(100):
+        q.offer((i, _block(20)))
+    sizes = [len(chunk) for _, chunk in list(q.queue)]
+    assert max(sizes) <= 50
+    assert q.queued_samples == sum(sizes) <= 100 + 50
+    stats = q.get_stats()
+    assert stats["merged_blocks"] > 0
+    assert stats["dropped_blocks"] > 0
+    assert list(q.queue)[0][0] > 0  # 最旧的块已被丢弃
+
+
+def test_drop_non_speech_uses_rms_from_offer_time():
+    q = AudioBlockQueue(max_blocks=3, policy="drop_non_speech", sample_rate=100)
+    q.speech_rms = 0.05
+    q.offer((0, _block(10, 0.5)))
+    q.offer((1, _block(10, 0.001)))
+    q.offer((2, _block(10, 0.5)))
+    assert q.offer((3, _block(10, 0.5)))
+    assert [t for t, _ in list(q.queue)] == [0, 2, 3]
+    assert q.get_stats()["dropped_speech_blocks"] == 0
+    assert q.offer((4, _block(10, 0.5)))  # 全是语音时丢弃最旧的块
+    assert [t for t, _ in list(q.queue)] == [2, 3, 4]
+    assert q.get_stats()["dropped_speech_blocks"] == 1
+    assert len(q.block_rms) == len(q.queue)
+    assert q.get()[0] == 2
+    assert len(q.block_rms) == len(q.queue) == 2
+
+
+def test_offer_reports_when_block_exceeds_capacity():
+    q = AudioBlockQueue(max_blocks=1, policy="drop_oldest", sample_rate=100)
+    q.put(None)  # 唤醒信号不能被丢弃
+    assert not q.offer((0, _block(10)))
+    assert q.qsize() == 2
+    assert q.get() is None
+    assert q.offer((1, _block(10)))
+    assert [t for t, _ in list(q.queue)] == [1]
+
+
+def test_offer_reports_closed_block_queue_over_capacity():
+    q = AudioBlockQueue(max_blocks=1, policy="block", sample_rate=100)
+    assert q.offer((0, _block(10)))
+    q.close()
+    assert not q.offer((1, _block(10)))
+    assert q.get_stats()["dropped_blocks"] == 0
@@ -0,0 +1,112 @@
+"""AudioRingBuffer：绕回、视图有效性、溢出和丢弃计数"""
+
+import numpy as np
+import pytest
+
+from FunASR import AudioRingBuffer
+
+
+def _ramp(start, n):
+    return np.arange(start, start + n, dtype=np.float32)
+
+
+def test_write_peek_consume_in_order():
+    buf = AudioRingBuffer(8)
+    assert buf.write(_ramp(0, 5)) == 5
+    assert len(buf) == 5 and buf.free == 3
+    np.testing.assert_array_equal(buf.peek(), _ramp(0, 5))
+    np.testing.assert_array_equal(buf.consume(2), _ramp(0, 2))
+    np.testing.assert_array_equal(buf.peek(), _ramp(2, 3))
+    np.testing.assert_array_equal(buf.peek_tail(2), _ramp(3, 2))
+    assert buf.dropped_samples == 0
+
+
+def test_wraparound_returns_contiguous_views():
+    buf = AudioRingBuffer(8)
+    buf.write(_ramp(0, 6))
+    buf.consume(5)
+    buf.write(_ramp(6, 6))  # 跨过存储末尾
+    assert len(buf) == 7
+    view = buf.peek()
+    assert view.base is not None  # 视图而非拷贝
+    np.testing.assert_array_equal(view, _ramp(5, 7))
+    np.testing.assert_array_equal(buf.consume(4), _ramp(5, 4))
+    np.testing.assert_array_equal(buf.consume(), _ramp(9, 3))
+    assert len(buf) == 0
+
+
+def test_random_operations_match_reference():
+    rng = np.random.default_rng(0)
+    buf = AudioRingBuffer(10)
+    reference = []
+    written = consumed = 0
+    for _ in range(500):
+        if rng.random() < 0.6:
+            n = int(rng.integers(0, 14))
+            buf.write(_ramp(written, n))
+            reference.extend(range(written, written + n))
+            written += n
+            reference = reference[-10:]
+        else:
+            n = int(rng.integers(0, 8))
+            np.testing.assert_array_equal(buf.consume(n), reference[:n])
+            consumed += min(n, len(reference))
+            reference = reference[n:]
+        assert len(buf) == len(reference)
+        np.testing.assert_array_equal(buf.peek(), reference)
+    assert buf.dropped_samples == written - consumed - len(reference)
+
+
+def test_peek_view_valid_after_non_overflowing_write():
+    buf = AudioRingBuffer(8)
+    buf.write(_ramp(0, 6))
+    buf.consume(4)
+    view = buf.peek()
+    buf.write(_ramp(6, 6))  # 绕回，但没有溢出
+    np.testing.assert_array_equal(view, _ramp(4, 2))
+
+
+def test_consume_view_valid_until_space_reused():
+    buf = AudioRingBuffer(8)
+    buf.write(_ramp(0, 6))
+    view = buf.consume(3)
+    # 取出后剩余3个样本，free=5；不超过 free - 3 = 2 个样本的写入不会覆盖视图
+    buf.write(_ramp(6, 2))
+    np.testing.assert_array_equal(view, _ramp(0, 3))
+    buf.write(_ramp(8, 3))  # 复用了视图所在的空间
+    assert not np.array_equal(view, _ramp(0, 3))
+
+
+def test_overflow_drops_oldest_and_counts():
+    buf = AudioRingBuffer(8)
+    buf.write(_ramp(0, 6))
+    buf.write(_ramp(6, 5))
+    assert len(buf) == 8
+    assert buf.dropped_samples == 3
+    np.testing.assert_array_equal(buf.peek(), _ramp(3, 8))
+
+
+def test_single_write_larger_than_capacity_keeps_newest():
+    buf = AudioRingBuffer(8)
+    buf.write(_ramp(0, 3))
+    buf.write(_ramp(3, 12))
+    assert len(buf) == 8
+    assert buf.dropped_samples == 3 + 12 - 8
+    np.testing.assert_array_equal(buf.peek(), _ramp(7, 8))
+
+
+def test_int16_and_2d_input():
+    buf = AudioRingBuffer(4, dtype=np.int16)
+    buf.write(np.array([[1], [2], [3]], dtype=np.int16))
+    assert buf.peek().dtype == np.int16
+    np.testing.assert_array_equal(buf.peek(), [1, 2, 3])
+    assert buf.nbytes == 4 * 2 * 2
+
+
+def test_clear_and_invalid_capacity():
+    buf = AudioRingBuffer(4)
+    buf.write(_ramp(0, 3))
+    buf.clear()
+    assert len(buf) == 0 and buf.free == 4
+    with pytest.raises(ValueError):
+        AudioRingBuffer(0)
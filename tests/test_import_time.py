@@ -0,0 +1,15 @@
+"""导入FunASR不加载重型依赖，且导入耗时在预算内"""
+
+from benchmark import HEAVY_MODULES, IMPORT_BUDGET_MS, measure_import_time
+
+
+def test_import_does_not_load_heavy_modules():
+    _, modules = measure_import_time("FunASR", repeat=1)
+    assert "FunASR" in modules
+    heavy = sorted({name.strip().split(".")[0] for name in modules} & set(HEAVY_MODULES))
+    assert heavy == []
+
+
+def test_import_within_budget():
+    total, _ = measure_import_time("FunASR", repeat=3)
+    assert total < IMPORT_BUDGET_MS
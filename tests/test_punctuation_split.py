@@ -0,0 +1,42 @@
+"""split_punctuated_text / normalize_sentence_end：合并标点恢复结果的切分"""
+
+from FunASR import normalize_sentence_end, split_punctuated_text
+
+
+def test_split_aligns_pieces_with_originals():
+    pieces = split_punctuated_text("你好。我很好，谢谢？", ["你好", "我很好谢谢"])
+    assert pieces == ["你好。", "我很好，谢谢？"]
+
+
+def test_split_ignores_whitespace_and_case():
+    pieces = split_punctuated_text("Hello world. How are you?", ["hello world", "how are you"])
+    assert pieces == ["Hello world.", "How are you?"]
+
+
+def test_boundary_mid_clause_gets_sentence_end():
+    pieces = split_punctuated_text("今天开会请准备，明天见。", ["今天开会", "请准备", "明天见"])
+    assert pieces == ["今天开会。", "请准备。", "明天见。"]
+
+
+def test_boundary_mid_clause_in_english_uses_period():
+    pieces = split_punctuated_text("we meet today, please prepare see you tomorrow.",
+                                   ["we meet today", "please prepare", "see you tomorrow"])
+    assert pieces == ["we meet today.", "please prepare.", "see you tomorrow."]
+
+
+def test_split_returns_none_when_characters_rewritten():
+    assert split_punctuated_text("今天开汇，明天见。", ["今天开会", "明天见"]) is None
+
+
+def test_split_returns_none_when_output_truncated():
+    assert split_punctuated_text("今天开会。", ["今天开会", "明天见"]) is None
+
+
+def test_normalize_sentence_end_by_script():
+    assert normalize_sentence_end("好的") == "好的。"
+    assert normalize_sentence_end("好的，") == "好的。"
+    assert normalize_sentence_end("ok") == "ok."
+    assert normalize_sentence_end("ok,") == "ok."
+    assert normalize_sentence_end("用GPU") == "用GPU."
+    assert normalize_sentence_end("真的吗？") == "真的吗？"
+    assert normalize_sentence_end("") == ""